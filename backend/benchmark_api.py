@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+API 종단 간 벤치마크
+
+FastAPI 앱을 ASGI 클라이언트로 프로세스 안에서 직접 구동하거나(기본값, 임시 DB 사용),
+--base-url로 실행 중인 uvicorn 서버에 요청을 보내 라우트별 처리량과
+p50/p95/p99 지연 시간을 측정한다. 결과는 JSON으로 저장하고, 기준선과 비교해
+허용 범위를 넘게 느려지면 종료 코드 1로 실패한다.
+
+    python benchmark_api.py --requests 200 --concurrency 16 --output result.json
+    python benchmark_api.py --baseline baseline.json           # 회귀 검사
+    python benchmark_api.py --save-baseline baseline.json      # 기준선 갱신
+    python benchmark_api.py --base-url http://localhost:8080   # 실행 중인 서버
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import secrets
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+import main
+
+
+def percentile(sorted_samples: list, fraction: float) -> float:
+    # nearest-rank 방식
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+class ScenarioStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        count = len(ordered)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "throughput_rps": round(count / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+            "max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+        }
+
+
+class Benchmark:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.stats = {}
+        self.run_id = secrets.token_hex(4)
+        self.mentors = []  # (user_id, headers)
+        self.mentees = []
+        self.emails = []
+
+    async def run(self, name: str, count: int, operation, expected=(200,), retry_busy=False):
+        """operation(i) -> 응답 코루틴을 count번, 최대 concurrency개씩 동시에 실행
+
+        retry_busy이면 503(부하 차단) 응답을 Retry-After만큼 기다렸다 다시 보낸다 (준비 단계용).
+        """
+        stats = self.stats.setdefault(name, ScenarioStats(name))
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        results = [None] * count
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await operation(i)
+                    while retry_busy and response.status_code == 503:
+                        await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+                        response = await operation(i)
+                except httpx.HTTPError:
+                    stats.errors += 1
+                    return
+                stats.samples.append(time.perf_counter() - started)
+                if response.status_code not in expected:
+                    stats.errors += 1
+                results[i] = response
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(count)))
+        stats.elapsed += time.perf_counter() - started
+        return results
+
+    def signup(self, email: str, role: str):
+        return self.client.post(
+            "/api/signup",
+            json={"email": email, "password": "bench-password", "name": "Bench user", "role": role},
+        )
+
+    def login(self, email: str):
+        return self.client.post(
+            "/api/login", json={"email": email, "password": "bench-password"}
+        )
+
+    async def create_users(self, count: int, role: str):
+        """준비 단계: 계정을 만들고 (user_id, headers) 목록 반환"""
+        emails = [f"bench-{self.run_id}-{role}-{i}@example.com" for i in range(count)]
+        self.emails.extend(emails)
+        await self.run(
+            f"setup.signup.{role}",
+            count,
+            lambda i: self.signup(emails[i], role),
+            (201,),
+            retry_busy=True,
+        )
+        responses = await self.run(
+            f"setup.login.{role}", count, lambda i: self.login(emails[i]), retry_busy=True
+        )
+        users = []
+        for response in responses:
+            if response is None or response.status_code != 200:
+                continue
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+            me = await self.client.get("/api/me", headers=headers)
+            users.append((me.json()["id"], headers))
+        return users
+
+    async def setup(self):
+        self.mentors = await self.create_users(self.args.mentors, "mentor")
+        self.mentees = await self.create_users(self.args.mentees, "mentee")
+        if not self.mentors or not self.mentees:
+            raise SystemExit("setup failed: could not create benchmark users")
+
+        image = base64.b64encode(make_image()).decode()
+        skills = ["Python", "React", "SQL", "Go", "Docker"]
+
+        def update_profile(i):
+            _, headers = self.mentors[i]
+            return self.client.put(
+                "/api/profile",
+                headers=headers,
+                json={
+                    "name": f"Bench mentor {i}",
+                    "bio": "benchmark mentor",
+                    "skills": [skills[i % len(skills)], skills[(i + 1) % len(skills)]],
+                    "image": image,
+                },
+            )
+
+        await self.run("profile.update", len(self.mentors), update_profile)
+
+    async def scenarios(self):
+        n = self.args.requests
+        mentor_ids = [user_id for user_id, _ in self.mentors]
+
+        def mentee(i):
+            return self.mentees[i % len(self.mentees)]
+
+        def mentor(i):
+            return self.mentors[i % len(self.mentors)]
+
+        # 인증 경로: 해시 풀이 가득 차면 503으로 차단되는 것도 그대로 측정한다
+        signups = min(n, self.args.signups)
+        await self.run(
+            "signup",
+            signups,
+            lambda i: self.signup(f"bench-{self.run_id}-signup-{i}@example.com", "mentee"),
+            (201,),
+        )
+        await self.run(
+            "login", signups, lambda i: self.login(self.emails[i % len(self.emails)])
+        )
+
+        await self.run("me", n, lambda i: self.client.get("/api/me", headers=mentee(i)[1]))
+        await self.run(
+            "mentors.list",
+            n,
+            lambda i: self.client.get("/api/mentors", headers=mentee(i)[1]),
+        )
+        await self.run(
+            "mentors.filter_skill",
+            n,
+            lambda i: self.client.get(
+                "/api/mentors", params={"skill": "python"}, headers=mentee(i)[1]
+            ),
+        )
+        await self.run(
+            "mentors.order_by_name",
+            n,
+            lambda i: self.client.get(
+                "/api/mentors", params={"order_by": "name"}, headers=mentee(i)[1]
+            ),
+        )
+        await self.run(
+            "mentors.search",
+            n,
+            lambda i: self.client.get(
+                "/api/mentors/search", params={"q": "bench"}, headers=mentee(i)[1]
+            ),
+        )
+
+        # 멘티당 pending 요청은 하나뿐이므로 생성 -> 수락/거절을 라운드로 반복
+        rounds = max(1, n // len(self.mentees))
+        for round_index in range(rounds):
+
+            def create(i):
+                return self.client.post(
+                    "/api/match-requests",
+                    headers=self.mentees[i][1],
+                    json={
+                        "mentorId": mentor_ids[(i + round_index) % len(mentor_ids)],
+                        "menteeId": self.mentees[i][0],
+                        "message": "benchmark request",
+                    },
+                )
+
+            created = await self.run("match_requests.create", len(self.mentees), create)
+            request_ids = [
+                (r.json()["id"], (i + round_index) % len(mentor_ids))
+                for i, r in enumerate(created)
+                if r is not None and r.status_code == 200
+            ]
+            action = "accept" if round_index % 2 else "reject"
+
+            def resolve(i):
+                request_id, mentor_index = request_ids[i]
+                return self.client.put(
+                    f"/api/match-requests/{request_id}/{action}",
+                    headers=self.mentors[mentor_index][1],
+                )
+
+            await self.run(f"match_requests.{action}", len(request_ids), resolve)
+
+        # 마지막 라운드는 멘토별로 한 번의 일괄 요청으로 모두 수락
+        created = await self.run("match_requests.create", len(self.mentees), create)
+        backlog = {}
+        for i, response in enumerate(created):
+            if response is not None and response.status_code == 200:
+                mentor_index = (i + round_index) % len(mentor_ids)
+                backlog.setdefault(mentor_index, []).append(response.json()["id"])
+        batches = list(backlog.items())
+        await self.run(
+            "match_requests.batch",
+            len(batches),
+            lambda i: self.client.post(
+                "/api/match-requests/batch",
+                headers=self.mentors[batches[i][0]][1],
+                json={
+                    "items": [
+                        {"id": request_id, "status": "accepted"} for request_id in batches[i][1]
+                    ]
+                },
+            ),
+        )
+
+        await self.run(
+            "match_requests.incoming",
+            n,
+            lambda i: self.client.get("/api/match-requests/incoming", headers=mentor(i)[1]),
+        )
+        await self.run(
+            "match_requests.outgoing",
+            n,
+            lambda i: self.client.get("/api/match-requests/outgoing", headers=mentee(i)[1]),
+        )
+        await self.run(
+            "match_requests.received",
+            n,
+            lambda i: self.client.get(
+                f"/api/match-requests/received/{mentor(i)[0]}", headers=mentor(i)[1]
+            ),
+        )
+
+        await self.run(
+            "images.original",
+            n,
+            lambda i: self.client.get(f"/images/mentor/{mentor(i)[0]}", headers=mentee(i)[1]),
+        )
+        await self.run(
+            "images.thumbnail",
+            n,
+            lambda i: self.client.get(
+                f"/images/mentor/{mentor(i)[0]}", params={"size": 64}, headers=mentee(i)[1]
+            ),
+        )
+        etags = {}
+        for user_id, headers in self.mentors:
+            response = await self.client.get(f"/images/mentor/{user_id}", headers=headers)
+            etags[user_id] = response.headers.get("etag", "")
+        await self.run(
+            "images.not_modified",
+            n,
+            lambda i: self.client.get(
+                f"/images/mentor/{mentor(i)[0]}",
+                headers={**mentee(i)[1], "If-None-Match": etags[mentor(i)[0]]},
+            ),
+            expected=(304,),
+        )
+
+
+def make_image() -> bytes:
+    if main.Image is None:
+        return base64.b64decode(
+            "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        )
+    buffer = io.BytesIO()
+    main.Image.new("RGB", (512, 512), (40, 120, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def run_in_process(args) -> dict:
+    """임시 DB/이미지 저장소로 앱을 직접 구동 (lifespan 이벤트도 직접 호출)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        main.DATABASE_PATH = os.path.join(workdir, "benchmark.db")
+        main.blob_store = main.BlobStore(os.path.join(workdir, "images"))
+        main.mentor_catalog = main.MentorCatalog()
+        await main.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                return await execute(client, args)
+        finally:
+            await main.shutdown_event()
+
+
+async def run_against_server(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        return await execute(client, args)
+
+
+async def execute(client: httpx.AsyncClient, args) -> dict:
+    benchmark = Benchmark(client, args)
+    started = time.perf_counter()
+    await benchmark.setup()
+    await benchmark.scenarios()
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "target": args.base_url or "in-process",
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mentors": args.mentors,
+            "mentees": args.mentees,
+        },
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "scenarios": {
+            name: stats.summary()
+            for name, stats in benchmark.stats.items()
+            if not name.startswith("setup.")
+        },
+    }
+
+
+def find_regressions(result: dict, baseline: dict, tolerance: float) -> list:
+    """p95 지연이 늘거나 처리량이 줄어 허용 범위를 넘은 시나리오 목록"""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = result["scenarios"].get(name)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms > baseline {base['p95_ms']:.1f}ms"
+            )
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']:.1f}/s "
+                f"< baseline {base['throughput_rps']:.1f}/s"
+            )
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {current['errors']} > baseline {base['errors']}")
+    return regressions
+
+
+def print_table(result: dict):
+    print(
+        f"{'scenario':<26} {'reqs':>6} {'err':>4} {'rps':>9} "
+        f"{'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}"
+    )
+    for name, stats in result["scenarios"].items():
+        print(
+            f"{name:<26} {stats['requests']:>6} {stats['errors']:>4} "
+            f"{stats['throughput_rps']:>9.1f} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="API 종단 간 벤치마크")
+    parser.add_argument("--base-url", help="실행 중인 서버 주소 (생략 시 프로세스 안에서 구동)")
+    parser.add_argument("--requests", type=int, default=200, help="시나리오별 요청 수")
+    parser.add_argument("--concurrency", type=int, default=16, help="동시 요청 수")
+    parser.add_argument("--mentors", type=int, default=10, help="준비 단계에서 만들 멘토 수")
+    parser.add_argument("--mentees", type=int, default=20, help="준비 단계에서 만들 멘티 수")
+    parser.add_argument("--signups", type=int, default=50, help="signup/login 시나리오 요청 수")
+    parser.add_argument("--timeout", type=float, default=30.0, help="서버 모드 요청 타임아웃(초)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="비교할 기준선 JSON")
+    parser.add_argument("--save-baseline", help="이번 결과를 기준선으로 저장할 경로")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="허용 회귀 비율 (0.2 = 20%%)"
+    )
+    return parser.parse_args(argv)
+
+
+def run(argv=None) -> int:
+    args = parse_args(argv)
+    runner = run_against_server if args.base_url else run_in_process
+    result = asyncio.run(runner(args))
+    print_table(result)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(result, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ 기준선 대비 성능 회귀:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n✅ 기준선 대비 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
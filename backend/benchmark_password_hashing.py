@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+비밀번호 해시 비용별 처리량 측정 스크립트
+
+각 scrypt 비용(N)마다 한 코어에서 verify_password를 반복 실행해
+코어당 초당 로그인 수를 보고, 프로세스 풀 전체 처리량도 함께 측정한다.
+
+    python benchmark_password_hashing.py --costs 8192 16384 32768 --iterations 50
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import PASSWORD_HASH_P, PASSWORD_HASH_R, hash_password, verify_password
+
+
+def time_single_core(hashed: str, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        verify_password("benchmark-password", hashed)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def time_pool(hashed: str, iterations: int, workers: int) -> float:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 워커 기동 비용은 측정에서 제외
+        list(executor.map(verify_password, ["warmup"] * workers, [hashed] * workers))
+        started = time.perf_counter()
+        list(
+            executor.map(
+                verify_password,
+                ["benchmark-password"] * iterations,
+                [hashed] * iterations,
+            )
+        )
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scrypt 비용별 로그인 처리량 측정")
+    parser.add_argument(
+        "--costs",
+        type=int,
+        nargs="+",
+        default=[2**13, 2**14, 2**15, 2**16],
+        help="측정할 scrypt N 값 (2의 거듭제곱)",
+    )
+    parser.add_argument("--iterations", type=int, default=20, help="비용별 반복 횟수")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="프로세스 풀 측정에 사용할 워커 수 (0이면 생략)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'N':>8} {'r':>3} {'p':>3} {'mem(MiB)':>9} {'p50(ms)':>9} "
+        f"{'logins/s/core':>14} {'pool logins/s':>14}"
+    )
+    for n in args.costs:
+        hashed = hash_password(
+            "benchmark-password", n=n, r=PASSWORD_HASH_R, p=PASSWORD_HASH_P
+        )
+        samples = time_single_core(hashed, args.iterations)
+        median = statistics.median(samples)
+        pool_rate = "-"
+        if args.workers > 0:
+            iterations = args.iterations * args.workers
+            elapsed = time_pool(hashed, iterations, args.workers)
+            pool_rate = f"{iterations / elapsed:.1f}"
+        memory = 128 * n * PASSWORD_HASH_R * PASSWORD_HASH_P / 2**20
+        print(
+            f"{n:>8} {PASSWORD_HASH_R:>3} {PASSWORD_HASH_P:>3} {memory:>9.0f} "
+            f"{median * 1000:>9.1f} {1 / median:>14.1f} {pool_rate:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+코호트 일괄 매칭 스크립트
+
+매칭되지 않은 멘티 전원을 남은 정원이 있는 멘토에게 배정하고 pending 요청을 한 트랜잭션으로
+생성한다. 서버의 POST /api/admin/cohort-match 와 같은 로직을 DB 파일에 직접 실행한다.
+
+    python cohort_match.py --database mentor_mentee.db --dry-run
+"""
+
+import argparse
+import json
+import sys
+
+import main
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="코호트 일괄 매칭")
+    parser.add_argument("--database", default=main.DATABASE_PATH, help="SQLite 파일 경로")
+    parser.add_argument(
+        "--top-k", type=int, default=main.COHORT_TOP_K, help="멘티/멘토별 후보 수"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="배정 결과만 계산하고 요청은 만들지 않음"
+    )
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    if main.np is None:
+        sys.exit("numpy/scipy가 설치되어 있지 않습니다 (pip install -r requirements.txt)")
+
+    main.init_db(args.database)
+    pool = main.ConnectionPool(args.database, 1)
+    try:
+        with pool.connection() as conn:
+            summary = main.run_cohort_match(conn, top_k=args.top_k, dry_run=args.dry_run)
+    finally:
+        pool.close()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    run()
@@ -1,20 +1,61 @@
 #!/usr/bin/env python3
 """
 테스트용 멘토와 멘티 계정을 생성하는 스크립트
+
+인자 없이 실행하면 로그인용 멘토/멘티 계정 하나씩을 만들고,
+--mentors/--mentees/--requests를 주면 성능 측정용 대량 데이터를 생성한다.
+
+    python create_test_accounts.py --mentors 10000 --mentees 100000 --requests 1000000 --seed 42
 """
 
+import argparse
+import io
+import random
 import sqlite3
-import hashlib
-from datetime import datetime
+import time
+
+import main
+from main import hash_password  # 서버와 같은 scrypt 해시
 
-def hash_password(password: str) -> str:
-    """main.py와 동일한 해싱 방법"""
-    return hashlib.sha256(password.encode()).hexdigest()
+# 대량 생성 데이터 풀 (앞쪽 항목일수록 자주 뽑히도록 Zipf 분포 가중치 사용)
+SKILLS = [
+    "Python", "JavaScript", "React", "TypeScript", "Java", "Node.js", "SQL",
+    "Spring", "FastAPI", "Django", "AWS", "Docker", "Kubernetes", "Go", "Kotlin",
+    "Swift", "C++", "Rust", "Vue", "Next.js", "Machine Learning", "Data Engineering",
+    "DevOps", "Android", "iOS", "GraphQL", "Redis", "PostgreSQL", "Figma", "Product Management",
+]
+INTERESTS = [
+    "Web Development", "Backend", "Frontend", "Career Guidance", "Interview Prep",
+    "Machine Learning", "Cloud", "Mobile", "System Design", "Startup", "Data Analysis",
+    "Open Source", "Game Development", "Security", "Algorithms",
+]
+KOREAN_SURNAMES = ["김", "이", "박", "최", "정", "강", "조", "윤", "장", "임", "한", "오", "서", "신", "권"]
+KOREAN_GIVEN_NAMES = [
+    "민준", "서연", "도윤", "서윤", "시우", "지우", "하준", "하은", "주원", "지민",
+    "지호", "수아", "예준", "지유", "유준", "채원", "건우", "다은", "현우", "예린",
+]
+ENGLISH_FIRST_NAMES = [
+    "James", "Olivia", "Liam", "Emma", "Noah", "Ava", "Ethan", "Mia", "Lucas", "Sophia",
+    "Mason", "Isabella", "Logan", "Amelia", "Daniel", "Harper", "Henry", "Ella", "Jack", "Grace",
+]
+ENGLISH_LAST_NAMES = [
+    "Smith", "Johnson", "Brown", "Lee", "Kim", "Park", "Garcia", "Miller", "Davis", "Wilson",
+    "Taylor", "Clark", "Walker", "Young", "Hall",
+]
+MESSAGES = [
+    "멘토링 부탁드립니다!",
+    "커리어 방향에 대해 조언을 듣고 싶습니다.",
+    "프로젝트 리뷰를 받고 싶어요.",
+    "I'd love to learn from your experience.",
+    "Could you help me prepare for interviews?",
+]
+BULK_PASSWORD = "password123"
 
 def create_test_accounts():
     """멘토와 멘티 테스트 계정 생성"""
     
-    # 데이터베이스 연결
+    # 데이터베이스 연결 (mentor_skills 등 최신 스키마 보장)
+    main.init_db('mentor_mentee.db')
     conn = sqlite3.connect('mentor_mentee.db')
     cursor = conn.cursor()
     
@@ -36,9 +77,17 @@ def create_test_accounts():
     }
     
     try:
-        # 기존 테스트 계정 삭제 (있다면)
-        cursor.execute("DELETE FROM users WHERE email IN (?, ?)", 
-                      (mentor_data['email'], mentee_data['email']))
+        # 기존 테스트 계정 삭제 (있다면). 외래 키 연쇄 삭제가 없으므로 프로필/스킬/요청도 함께 지운다
+        emails = (mentor_data['email'], mentee_data['email'])
+        users = "SELECT id FROM users WHERE email IN (?, ?)"
+        mentors = f"SELECT id FROM mentors WHERE user_id IN ({users})"
+        mentees = f"SELECT id FROM mentees WHERE user_id IN ({users})"
+        cursor.execute(f"DELETE FROM match_requests WHERE mentor_id IN ({mentors})", emails)
+        cursor.execute(f"DELETE FROM match_requests WHERE mentee_id IN ({mentees})", emails)
+        cursor.execute(f"DELETE FROM mentor_skills WHERE mentor_id IN ({mentors})", emails)
+        cursor.execute(f"DELETE FROM mentors WHERE user_id IN ({users})", emails)
+        cursor.execute(f"DELETE FROM mentees WHERE user_id IN ({users})", emails)
+        cursor.execute("DELETE FROM users WHERE email IN (?, ?)", emails)
         
         # 멘토 계정 생성
         mentor_password_hash = hash_password(mentor_data['password'])
@@ -56,16 +105,18 @@ def create_test_accounts():
         mentor_id = cursor.lastrowid
         print(f"✅ 멘토 계정 생성됨: {mentor_data['email']} (ID: {mentor_id})")
         
-        # 멘토 프로필 추가 정보 생성
+        # 멘토 프로필 추가 정보 생성 (스킬 필터가 쓰는 mentor_skills 역색인도 API와 같은 함수로 채움)
+        mentor_skills = 'Python,JavaScript,React,Node.js,FastAPI'
         cursor.execute("""
             INSERT INTO mentors (user_id, skills, experience_years, rating)
             VALUES (?, ?, ?, ?)
         """, (
             mentor_id,
-            'Python,JavaScript,React,Node.js,FastAPI',
+            mentor_skills,
             10,
             4.8
         ))
+        main.sync_mentor_skills(cursor, cursor.lastrowid, mentor_skills)
         
         # 멘티 계정 생성
         mentee_password_hash = hash_password(mentee_data['password'])
@@ -127,5 +178,253 @@ def create_test_accounts():
     finally:
         conn.close()
 
+def zipf_weights(count: int, exponent: float = 1.1) -> list:
+    weights, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank**exponent
+        weights.append(total)
+    return weights  # random.choices의 cum_weights로 사용
+
+
+def random_name(rng: random.Random, korean_ratio: float) -> str:
+    if rng.random() < korean_ratio:
+        return rng.choice(KOREAN_SURNAMES) + rng.choice(KOREAN_GIVEN_NAMES)
+    return f"{rng.choice(ENGLISH_FIRST_NAMES)} {rng.choice(ENGLISH_LAST_NAMES)}"
+
+
+def pick_many(rng: random.Random, pool: list, cum_weights: list, low: int, high: int) -> list:
+    picked = rng.choices(pool, cum_weights=cum_weights, k=rng.randint(low, high))
+    return list(dict.fromkeys(picked))
+
+
+def batched(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_image_blobs(rng: random.Random, count: int) -> list:
+    """단색 PNG 프로필 이미지를 blob_store에 저장하고 (digest, content_type) 목록 반환"""
+    if count <= 0:
+        return []
+    if main.Image is None:
+        print("⚠️  Pillow가 없어 이미지 생성을 건너뜁니다")
+        return []
+
+    blobs = []
+    for _ in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        main.Image.new("RGB", (256, 256), color).save(buffer, format="PNG")
+        digest = main.blob_store.put(buffer.getvalue())
+        main.generate_image_variants(main.blob_store, digest)
+        blobs.append((digest, "image/png"))
+    return blobs
+
+
+def generate_bulk_data(args):
+    """executemany + 큰 트랜잭션으로 멘토/멘티/매칭 요청을 대량 삽입"""
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+
+    main.init_db(args.database)  # 스키마와 마이그레이션 보장
+
+    conn = sqlite3.connect(args.database, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")  # 적재 중에는 내구성보다 속도
+    conn.execute("PRAGMA cache_size=-262144")
+    cursor = conn.cursor()
+
+    # 비밀번호 해시는 한 번만 계산해 모든 계정에 공유
+    password_hash = hash_password(BULK_PASSWORD)
+    images = make_image_blobs(rng, args.images)
+    skill_weights = zipf_weights(len(SKILLS))
+    interest_weights = zipf_weights(len(INTERESTS))
+    now = int(time.time())
+
+    # 기존 행과 겹치지 않도록 id를 직접 부여 (lastrowid 왕복 없이 관계 구성)
+    next_user_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    next_mentor_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM mentors").fetchone()[0]
+    next_mentee_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM mentees").fetchone()[0]
+    mentor_ids = list(range(next_mentor_id, next_mentor_id + args.mentors))
+    mentee_ids = list(range(next_mentee_id, next_mentee_id + args.mentees))
+
+    def created_at(max_days: int) -> int:
+        # 문자열 변환은 SQLite의 datetime(?, 'unixepoch')에 맡긴다
+        return now - int(rng.random() * max_days * 86400)
+
+    def user_row(user_id: int, role: str):
+        digest, content_type = (None, None)
+        if images and rng.random() < args.image_ratio:
+            digest, content_type = rng.choice(images)
+        return (
+            user_id,
+            f"{role}{user_id}@bulk.test",
+            password_hash,
+            random_name(rng, args.korean_ratio),
+            role,
+            f"{role} bio #{user_id}",
+            digest,
+            content_type,
+            created_at(730),
+        )
+
+    def insert_users(role: str, count: int, first_user_id: int):
+        for batch in batched(
+            (user_row(first_user_id + i, role) for i in range(count)), args.batch_size
+        ):
+            cursor.execute("BEGIN")
+            cursor.executemany(
+                """
+                INSERT INTO users (id, email, password_hash, name, role, bio,
+                                   profile_image_digest, profile_image_type, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+            """,
+                batch,
+            )
+            cursor.execute("COMMIT")
+
+    # 멘토
+    insert_users("mentor", args.mentors, next_user_id)
+    mentor_rows = []
+    skill_rows = []
+    for offset, mentor_id in enumerate(mentor_ids):
+        skills = ",".join(pick_many(rng, SKILLS, skill_weights, 1, 5))
+        mentor_rows.append(
+            (
+                mentor_id,
+                next_user_id + offset,
+                skills,
+                rng.randint(0, 30),
+                round(rng.uniform(3.0, 5.0), 1),
+            )
+        )
+        skill_rows.extend((mentor_id, skill) for skill in main.parse_skills(skills))
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO mentors (id, user_id, skills, experience_years, rating) VALUES (?, ?, ?, ?, ?)",
+        mentor_rows,
+    )
+    cursor.executemany(
+        "INSERT INTO mentor_skills (mentor_id, skill_normalized) VALUES (?, ?)", skill_rows
+    )
+    cursor.execute("COMMIT")
+    next_user_id += args.mentors
+    print(f"✅ 멘토 {args.mentors:,}명 ({time.perf_counter() - started:.1f}s)")
+
+    # 멘티
+    insert_users("mentee", args.mentees, next_user_id)
+    mentee_rows = (
+        (
+            mentee_id,
+            next_user_id + offset,
+            ",".join(pick_many(rng, INTERESTS, interest_weights, 1, 4)),
+            "Grow as a developer",
+        )
+        for offset, mentee_id in enumerate(mentee_ids)
+    )
+    for batch in batched(mentee_rows, args.batch_size):
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT INTO mentees (id, user_id, interests, goals) VALUES (?, ?, ?, ?)",
+            batch,
+        )
+        cursor.execute("COMMIT")
+    print(f"✅ 멘티 {args.mentees:,}명 ({time.perf_counter() - started:.1f}s)")
+
+    # 매칭 요청: 인기 멘토에 요청이 몰리도록 Zipf 가중치, 멘티당 pending은 하나만
+    if mentor_ids and mentee_ids and args.requests:
+        mentor_weights = zipf_weights(len(mentor_ids), exponent=0.8)
+        pending_mentees = set(
+            row[0]
+            for row in cursor.execute(
+                "SELECT mentee_id FROM match_requests WHERE status = 'pending'"
+            )
+        )
+        statuses = ["pending", "accepted", "rejected"]
+        status_weights = [args.pending_ratio, args.accepted_ratio, args.rejected_ratio]
+
+        def request_rows():
+            # 배치 단위로 한 번에 뽑아 행당 난수 호출 오버헤드를 줄인다
+            for batch_start in range(0, args.requests, args.batch_size):
+                count = min(args.batch_size, args.requests - batch_start)
+                mentors = rng.choices(mentor_ids, cum_weights=mentor_weights, k=count)
+                mentees = rng.choices(mentee_ids, k=count)
+                batch_statuses = rng.choices(statuses, weights=status_weights, k=count)
+                messages = rng.choices(MESSAGES, k=count)
+                for i in range(count):
+                    status = batch_statuses[i]
+                    if status == "pending":
+                        if mentees[i] in pending_mentees:
+                            status = "rejected"
+                        else:
+                            pending_mentees.add(mentees[i])
+                    yield (mentors[i], mentees[i], messages[i], status, created_at(365))
+
+        # 무작위 순서 삽입으로 보조 인덱스를 갱신하는 것보다 적재 후 한 번에 만드는 편이 훨씬 빠르다
+        # (변경 이력 테이블은 트리거가 채우므로 그 인덱스도 함께)
+        indexes = cursor.execute(
+            """
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL
+              AND tbl_name IN ('match_requests', 'match_request_events')
+        """
+        ).fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {name}")
+
+        # 적재가 중간에 실패해도 pending 유일 인덱스 등이 빠진 채로 남지 않도록 반드시 다시 만든다
+        try:
+            for batch in batched(request_rows(), args.batch_size):
+                cursor.execute("BEGIN")
+                cursor.executemany(
+                    """
+                    INSERT INTO match_requests (mentor_id, mentee_id, message, status, created_at)
+                    VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'))
+                """,
+                    batch,
+                )
+                cursor.execute("COMMIT")
+        finally:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            for _, sql in indexes:
+                cursor.execute(sql)
+        print(f"✅ 매칭 요청 {args.requests:,}건 ({time.perf_counter() - started:.1f}s)")
+
+    cursor.execute("PRAGMA optimize")
+    conn.close()
+
+    print(f"\n🎉 대량 데이터 생성 완료: {time.perf_counter() - started:.1f}s")
+    print(f"  모든 계정 비밀번호: {BULK_PASSWORD}")
+    print(f"  예) mentor{next_user_id - args.mentors}@bulk.test" if args.mentors else "")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="테스트 계정 / 대량 데이터 생성")
+    parser.add_argument("--database", default="mentor_mentee.db", help="SQLite 파일 경로")
+    parser.add_argument("--mentors", type=int, default=0, help="생성할 멘토 수")
+    parser.add_argument("--mentees", type=int, default=0, help="생성할 멘티 수")
+    parser.add_argument("--requests", type=int, default=0, help="생성할 매칭 요청 수")
+    parser.add_argument("--seed", type=int, default=42, help="난수 시드 (같은 시드 = 같은 데이터)")
+    parser.add_argument("--images", type=int, default=0, help="생성할 서로 다른 프로필 이미지 수")
+    parser.add_argument("--image-ratio", type=float, default=0.3, help="이미지를 가진 사용자 비율")
+    parser.add_argument("--korean-ratio", type=float, default=0.7, help="한국어 이름 비율")
+    parser.add_argument("--pending-ratio", type=float, default=0.2)
+    parser.add_argument("--accepted-ratio", type=float, default=0.3)
+    parser.add_argument("--rejected-ratio", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="트랜잭션당 행 수")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    create_test_accounts()
\ No newline at end of file
+    args = parse_args()
+    if args.mentors or args.mentees or args.requests:
+        generate_bulk_data(args)
+    else:
+        create_test_accounts()
\ No newline at end of file
@@ -1,22 +1,146 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, status
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Header, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 import uvicorn
 import jwt
 import hashlib
 import sqlite3
 import json
+import random
+import re
+import sys
+import os
+import queue
+import multiprocessing
+import threading
+import asyncio
+import bisect
+import contextvars
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional, List
 import secrets
+import time
+import io
+import logging
 import base64
+import binascii
 from pydantic import BaseModel, EmailStr
 
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+except ImportError:  # numpy/scipy가 없으면 멘토 추천 / 코호트 매칭 API 비활성화
+    np = None
+    sparse = None
+    min_weight_full_bipartite_matching = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow가 없으면 썸네일 없이 원본 이미지만 제공
+    Image = None
+
+logger = logging.getLogger("mentor_mentee")
+
 # JWT 설정
 SECRET_KEY = "your-secret-key-here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 1
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# 다른 워커에서 폐기(로그아웃)한 토큰을 revoked_tokens 테이블에서 가져오는 주기
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "1"))
+
+# 비밀번호 해시 설정 (scrypt 비용과 프로세스 풀 크기, 동시 처리 상한)
+PASSWORD_HASH_N = int(os.getenv("PASSWORD_HASH_N", str(2**14)))
+PASSWORD_HASH_R = int(os.getenv("PASSWORD_HASH_R", "8"))
+PASSWORD_HASH_P = int(os.getenv("PASSWORD_HASH_P", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_CONCURRENCY = int(
+    os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", str(PASSWORD_HASH_WORKERS * 4))
+)
+
+# 데이터베이스 설정 (환경 변수로 조정 가능)
+DATABASE_PATH = os.getenv("DATABASE_PATH", "mentor_mentee.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # 커넥션 대기 시간(초)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", str(DB_POOL_SIZE)))
+
+# 프로필 이미지 저장소 디렉토리 (내용 해시 기반)
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "image_store")
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "300"))
+IMAGE_CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+# 썸네일을 만들 원본의 최대 픽셀 수. 압축률이 높은 PNG는 5MB 안에 1억 픽셀 이상을 담을 수 있어
+# 디코딩하면 이미지 워커마다 수백 MB를 쓰므로 그보다 크면 원본만 제공한다
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(25_000_000)))
+
+# 업로드 시 미리 만들어 두는 아바타 썸네일 (정사각형, 픽셀)
+IMAGE_VARIANT_SIZES = (64, 128, 512)
+IMAGE_VARIANT_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_VARIANTS_DONE = "variants-done"  # 썸네일 생성을 마친(또는 포기한) 원본 옆에 남기는 표시
+
+# 목록 API 페이지 크기
+DEFAULT_PAGE_LIMIT = int(os.getenv("DEFAULT_PAGE_LIMIT", "50"))
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", "200"))
+
+# 실시간 이벤트 (SSE): 클라이언트별 큐 크기, 재연결용 이력 크기, 하트비트 간격(초)
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "1000"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_TICKET_SECONDS = int(os.getenv("EVENT_TICKET_SECONDS", "30"))  # 스트림 티켓 유효 시간
+
+# 매칭 요청 일괄 상태 변경 한 번에 처리할 최대 건수
+MAX_BATCH_TRANSITIONS = int(os.getenv("MAX_BATCH_TRANSITIONS", "500"))
+
+# 코호트 일괄 매칭 (멘토 기본/최대 정원, 멘티·멘토별 후보 수)
+DEFAULT_MENTOR_CAPACITY = int(os.getenv("DEFAULT_MENTOR_CAPACITY", "3"))
+MAX_MENTOR_CAPACITY = int(os.getenv("MAX_MENTOR_CAPACITY", "50"))
+COHORT_TOP_K = int(os.getenv("COHORT_TOP_K", "32"))
+
+# 멘토 목록 인메모리 캐시 (프로세스마다 따로 두며, 다른 워커/스크립트의 변경은
+# mentor_changes 로그를 MENTOR_CATALOG_SYNC_SECONDS마다 확인해 반영한다)
+MENTOR_CATALOG_ENABLED = os.getenv("MENTOR_CATALOG_ENABLED", "1") == "1"
+MENTOR_CATALOG_SYNC_SECONDS = float(os.getenv("MENTOR_CATALOG_SYNC_SECONDS", "1"))
+# mentor_changes에 남겨 두는 최근 변경 수. 이보다 뒤처진 캐시는 전체를 다시 읽는다
+MENTOR_CHANGE_RETENTION = int(os.getenv("MENTOR_CHANGE_RETENTION", "10000"))
+
+# 라우트별 요청 메트릭 (/metrics, Prometheus 텍스트 형식)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RESPONSE_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# 요청 프로파일링 (켜져 있을 때만 미들웨어 설치)
+# X-Profile 헤더에 관리자 키를 담은 요청과 PROFILE_SAMPLE_RATE 비율의 요청을 샘플링한다
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# 느린 SQL 추적 (켜면 임계값을 넘은 문장과 실행 계획을 기록)
+SQL_TRACE_ENABLED = os.getenv("SQL_TRACE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+SQL_TRACE_PROGRESS_STEPS = 1000
+
+# 관리자 API 키 (설정하지 않으면 관리자 엔드포인트 비활성화)
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Invalid DB_SYNCHRONOUS value: {DB_SYNCHRONOUS}")
 
 app = FastAPI(
     title="Mentor-Mentee Matching API",
@@ -24,172 +148,2927 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# CORS 설정
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",  # 프론트엔드 서버
-        "http://127.0.0.1:3000",
-    ],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type"],
+# CORS 설정
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",  # 프론트엔드 서버
+        "http://127.0.0.1:3000",
+    ],
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
+)
+
+security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+# 스키마 마이그레이션
+# 각 마이그레이션은 한 트랜잭션 안에서 한 번만 적용되며, 적용 이력은 schema_migrations에 기록된다.
+# 기존 DB에 다시 실행해도 안전하도록 IF NOT EXISTS 형태로 작성한다.
+def _migrate_initial_schema(cursor):
+    # Users 테이블
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            name TEXT,
+            role TEXT CHECK(role IN ('mentor', 'mentee')) NOT NULL,
+            bio TEXT,
+            profile_image BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+    # Mentors 테이블
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mentors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            skills TEXT,
+            experience_years INTEGER DEFAULT 0,
+            rating REAL DEFAULT 0.0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """
+    )
+
+    # Mentees 테이블
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mentees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            interests TEXT,
+            goals TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """
+    )
+
+    # Match Requests 테이블
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mentor_id INTEGER,
+            mentee_id INTEGER,
+            message TEXT,
+            status TEXT CHECK(status IN ('pending', 'accepted', 'rejected')) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (mentor_id) REFERENCES mentors (id),
+            FOREIGN KEY (mentee_id) REFERENCES mentees (id)
+        )
+    """
+    )
+
+
+def _migrate_match_request_indexes(cursor):
+    # 멘티당 pending 요청은 하나만 허용 (기존 중복은 가장 오래된 요청만 남기고 rejected 처리)
+    cursor.execute(
+        """
+        UPDATE match_requests SET status = 'rejected'
+        WHERE status = 'pending'
+          AND id NOT IN (
+              SELECT MIN(id) FROM match_requests
+              WHERE status = 'pending'
+              GROUP BY mentee_id
+          )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_match_requests_pending_mentee
+        ON match_requests (mentee_id) WHERE status = 'pending'
+    """
+    )
+
+    # 멘토/멘티별 요청 목록 (created_at 내림차순) 조회용
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_match_requests_mentor_created
+        ON match_requests (mentor_id, created_at DESC, id DESC)
+    """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_match_requests_mentee_created
+        ON match_requests (mentee_id, created_at DESC, id DESC)
+    """
+    )
+
+    # 멘토 목록 이름순 정렬용
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_users_role_name ON users (role, name, id)"
+    )
+
+
+def _migrate_mentor_skills(cursor):
+    # 멘토 스킬 역색인: skill_normalized로 바로 멘토를 찾을 수 있도록 (skill, mentor) 순서의 기본 키 사용
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mentor_skills (
+            mentor_id INTEGER NOT NULL,
+            skill_normalized TEXT NOT NULL,
+            PRIMARY KEY (skill_normalized, mentor_id),
+            FOREIGN KEY (mentor_id) REFERENCES mentors (id)
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_mentor_skills_mentor ON mentor_skills (mentor_id)"
+    )
+
+    # 기존 mentors.skills 문자열로 채우기
+    cursor.execute("SELECT id, skills FROM mentors WHERE skills IS NOT NULL")
+    for mentor_id, skills in cursor.fetchall():
+        sync_mentor_skills(cursor, mentor_id, skills)
+
+
+def _migrate_mentor_search(cursor):
+    # 멘토 전문 검색 색인 (rowid = users.id)
+    # unicode61 + 접두어 색인으로 한국어 어절도 "파이"* → "파이썬을" 처럼 앞부분으로 검색된다
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS mentor_search USING fts5(
+            name, bio, skills,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """
+    )
+
+    # users / mentors 변경 시 색인 동기화
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_search_mentor_insert
+        AFTER INSERT ON mentors BEGIN
+            INSERT INTO mentor_search (rowid, name, bio, skills)
+            SELECT u.id, u.name, u.bio, NEW.skills FROM users u WHERE u.id = NEW.user_id;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_search_mentor_update
+        AFTER UPDATE OF skills ON mentors BEGIN
+            UPDATE mentor_search SET skills = NEW.skills WHERE rowid = NEW.user_id;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_search_mentor_delete
+        AFTER DELETE ON mentors BEGIN
+            DELETE FROM mentor_search WHERE rowid = OLD.user_id;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_search_user_update
+        AFTER UPDATE OF name, bio ON users WHEN NEW.role = 'mentor' BEGIN
+            UPDATE mentor_search SET name = NEW.name, bio = NEW.bio WHERE rowid = NEW.id;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_search_user_delete
+        AFTER DELETE ON users BEGIN
+            DELETE FROM mentor_search WHERE rowid = OLD.id;
+        END
+    """
+    )
+
+    # 기존 멘토로 색인 채우기
+    cursor.execute("DELETE FROM mentor_search")
+    cursor.execute(
+        """
+        INSERT INTO mentor_search (rowid, name, bio, skills)
+        SELECT u.id, u.name, u.bio, m.skills
+        FROM users u
+        JOIN mentors m ON u.id = m.user_id
+        WHERE u.role = 'mentor'
+    """
+    )
+
+
+def _migrate_profile_images_to_blob_store(cursor):
+    # 이미지 본문은 blob_store로 옮기고 users에는 다이제스트와 형식만 남긴다
+    cursor.execute("PRAGMA table_info(users)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "profile_image_digest" not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN profile_image_digest TEXT")
+    if "profile_image_type" not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN profile_image_type TEXT")
+
+    if "profile_image" in columns:
+        cursor.execute("SELECT id, profile_image FROM users WHERE profile_image IS NOT NULL")
+        for user_id, image_data in cursor.fetchall():
+            cursor.execute(
+                """
+                UPDATE users SET profile_image_digest = ?, profile_image_type = ?
+                WHERE id = ?
+            """,
+                (blob_store.put(image_data), detect_image_type(image_data), user_id),
+            )
+        cursor.execute("ALTER TABLE users DROP COLUMN profile_image")
+
+
+def _migrate_refresh_tokens(cursor):
+    # 토큰 id로 조회하고, 같은 family(최초 로그인에서 이어진 토큰들)를 한 번에 폐기한다
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            family_id TEXT NOT NULL,
+            token_hash TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            revoked_at TIMESTAMP,
+            replaced_by TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family
+        ON refresh_tokens(family_id)
+    """
+    )
+
+
+def _migrate_mentor_capacity(cursor):
+    # 코호트 일괄 매칭에서 멘토 한 명이 맡을 수 있는 멘티 수 (pending + accepted 요청 기준)
+    cursor.execute("PRAGMA table_info(mentors)")
+    if "capacity" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(
+            f"ALTER TABLE mentors ADD COLUMN capacity INTEGER NOT NULL DEFAULT {DEFAULT_MENTOR_CAPACITY}"
+        )
+
+
+def _migrate_match_request_cancelled(cursor):
+    # CHECK 제약은 ALTER로 바꿀 수 없으므로 'cancelled'를 허용하는 테이블로 옮겨 담고 인덱스를 다시 만든다
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'match_requests'")
+    sequence = cursor.fetchone()
+    cursor.execute(
+        """
+        CREATE TABLE match_requests_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mentor_id INTEGER,
+            mentee_id INTEGER,
+            message TEXT,
+            status TEXT CHECK(status IN ('pending', 'accepted', 'rejected', 'cancelled')) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (mentor_id) REFERENCES mentors (id),
+            FOREIGN KEY (mentee_id) REFERENCES mentees (id)
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO match_requests_new (id, mentor_id, mentee_id, message, status, created_at)
+        SELECT id, mentor_id, mentee_id, message, status, created_at FROM match_requests
+    """
+    )
+    cursor.execute("DROP TABLE match_requests")
+    cursor.execute("ALTER TABLE match_requests_new RENAME TO match_requests")
+    if sequence:
+        # 삭제된 마지막 id가 재사용되지 않도록 AUTOINCREMENT 시퀀스를 이어받는다
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'match_requests'")
+        cursor.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('match_requests', ?)", (sequence[0],)
+        )
+    _migrate_match_request_indexes(cursor)
+
+
+def _migrate_match_request_events(cursor):
+    # 매칭 요청 변경 이력 (증분 동기화용). 트리거가 같은 트랜잭션 안에서 기록하므로 누락이 없다
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_request_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id INTEGER NOT NULL,
+            mentor_id INTEGER,
+            mentee_id INTEGER,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_match_request_events_mentor
+        ON match_request_events (mentor_id, seq)
+    """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_match_request_events_mentee
+        ON match_request_events (mentee_id, seq)
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_match_request_events_insert
+        AFTER INSERT ON match_requests BEGIN
+            INSERT INTO match_request_events (request_id, mentor_id, mentee_id, status)
+            VALUES (NEW.id, NEW.mentor_id, NEW.mentee_id, NEW.status);
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_match_request_events_update
+        AFTER UPDATE OF status ON match_requests WHEN NEW.status IS NOT OLD.status BEGIN
+            INSERT INTO match_request_events (request_id, mentor_id, mentee_id, status)
+            VALUES (NEW.id, NEW.mentor_id, NEW.mentee_id, NEW.status);
+        END
+    """
+    )
+    # 기존 요청은 현재 상태로 한 번씩 기록해 since=0 동기화가 전체 목록이 되게 한다
+    cursor.execute(
+        """
+        INSERT INTO match_request_events (request_id, mentor_id, mentee_id, status, created_at)
+        SELECT id, mentor_id, mentee_id, status, created_at FROM match_requests ORDER BY id
+    """
+    )
+
+
+def _migrate_mentor_changes(cursor):
+    # 멘토 변경 로그: 프로세스별 멘토 캐시가 다른 워커/스크립트의 변경을 따라잡는 데 쓴다
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mentor_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_changes_mentor_insert
+        AFTER INSERT ON mentors BEGIN
+            INSERT INTO mentor_changes (user_id) VALUES (NEW.user_id);
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_changes_mentor_update
+        AFTER UPDATE ON mentors BEGIN
+            INSERT INTO mentor_changes (user_id) VALUES (NEW.user_id);
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_changes_mentor_delete
+        AFTER DELETE ON mentors BEGIN
+            INSERT INTO mentor_changes (user_id) VALUES (OLD.user_id);
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_changes_user_update
+        AFTER UPDATE OF name, email, bio, role, profile_image_digest ON users
+        WHEN NEW.role = 'mentor' OR OLD.role = 'mentor' BEGIN
+            INSERT INTO mentor_changes (user_id) VALUES (NEW.id);
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mentor_changes_user_delete
+        AFTER DELETE ON users WHEN OLD.role = 'mentor' BEGIN
+            INSERT INTO mentor_changes (user_id) VALUES (OLD.id);
+        END
+    """
+    )
+
+
+def _migrate_event_tickets(cursor):
+    # SSE 연결용 일회용 티켓 (액세스 토큰을 URL에 싣지 않도록). 워커 어디서든 소비할 수 있게 DB에 둔다
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS event_tickets (
+            ticket_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            role TEXT,
+            mentor_id INTEGER,
+            mentee_id INTEGER,
+            jti TEXT,
+            token_exp REAL NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def _migrate_revoked_tokens(cursor):
+    # 로그아웃으로 폐기된 액세스 토큰 jti. 워커마다 TokenCache가 seq 이후 행을 따라 읽는다
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT NOT NULL UNIQUE,
+            expires_at REAL NOT NULL
+        )
+    """
+    )
+
+
+MIGRATIONS = [
+    (1, "initial schema", _migrate_initial_schema),
+    (2, "match request indexes", _migrate_match_request_indexes),
+    (3, "mentor skills index", _migrate_mentor_skills),
+    (4, "mentor full-text search", _migrate_mentor_search),
+    (5, "profile images in blob store", _migrate_profile_images_to_blob_store),
+    (6, "refresh tokens", _migrate_refresh_tokens),
+    (7, "mentor capacity", _migrate_mentor_capacity),
+    (8, "match request cancelled status", _migrate_match_request_cancelled),
+    (9, "match request change feed", _migrate_match_request_events),
+    (10, "mentor change log", _migrate_mentor_changes),
+    (11, "event stream tickets", _migrate_event_tickets),
+    (12, "revoked access tokens", _migrate_revoked_tokens),
+]
+
+
+# 데이터베이스 초기화
+def init_db(database_path: Optional[str] = None):
+    conn = sqlite3.connect(database_path or DATABASE_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.isolation_level = None  # 트랜잭션을 직접 관리
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+    try:
+        for version, name, migrate in MIGRATIONS:
+            # 여러 워커가 동시에 시작해도 한 번만 적용되도록 쓰기 잠금을 잡은 뒤 확인
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "SELECT 1 FROM schema_migrations WHERE version = ?", (version,)
+            )
+            if cursor.fetchone():
+                cursor.execute("COMMIT")
+                continue
+
+            try:
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                    (version, name),
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+        cursor.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+
+
+# Pydantic 모델들
+class UserCreate(BaseModel):
+    email: EmailStr
+    password: str
+    name: str
+    role: str
+
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+class ProfileUpdate(BaseModel):
+    name: Optional[str] = None
+    bio: Optional[str] = None
+    skills: Optional[str] = None
+    experience_years: Optional[int] = None
+    interests: Optional[str] = None
+    goals: Optional[str] = None
+
+
+class MatchRequestTransition(BaseModel):
+    id: int
+    status: str
+
+
+class MatchRequestBatch(BaseModel):
+    items: List[MatchRequestTransition]
+
+
+class MatchRequestCreate(BaseModel):
+    mentorId: int
+    menteeId: int
+    message: str  # 유틸리티 함수들
+
+
+def normalize_skill(skill: str) -> str:
+    return " ".join(skill.split()).lower()
+
+
+def parse_skills(skills: Optional[str]) -> List[str]:
+    """쉼표로 구분된 스킬 문자열을 중복 없는 정규화된 스킬 목록으로 변환"""
+    if not skills:
+        return []
+    normalized = (normalize_skill(skill) for skill in skills.split(","))
+    return list(dict.fromkeys(skill for skill in normalized if skill))
+
+
+def sync_mentor_skills(cursor, mentor_id: int, skills: Optional[str]):
+    """mentors.skills가 바뀔 때 mentor_skills 역색인을 다시 맞춘다"""
+    cursor.execute("DELETE FROM mentor_skills WHERE mentor_id = ?", (mentor_id,))
+    cursor.executemany(
+        "INSERT INTO mentor_skills (mentor_id, skill_normalized) VALUES (?, ?)",
+        [(mentor_id, skill) for skill in parse_skills(skills)],
+    )
+
+
+# 매직 바이트로 판별하는 이미지 형식
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class BlobStore:
+    """SHA-256 다이제스트를 키로 하는 디스크 저장소 (같은 내용은 한 번만 저장)"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str, variant: Optional[str] = None) -> str:
+        """원본 경로, 또는 같은 디렉토리에 놓이는 파생본(예: "128.webp") 경로"""
+        path = os.path.join(self.root, digest[:2], digest[2:4], digest)
+        return f"{path}.{variant}" if variant else path
+
+    def _tmp_path(self) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f"{secrets.token_hex(8)}.tmp")
+
+    def _commit(self, tmp_path: str, digest: str, variant: Optional[str] = None):
+        # 임시 파일에 다 쓴 뒤 교체해서 읽는 쪽이 쓰다 만 파일을 보지 않도록 한다
+        path = self.path(digest, variant)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.path(digest)):
+            tmp_path = self._tmp_path()
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            self._commit(tmp_path, digest)
+        return digest
+
+    def put_variant(self, digest: str, variant: str, data: bytes):
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._commit(tmp_path, digest, variant)
+
+    def put_stream(self, source, max_bytes: int) -> tuple:
+        """파일 객체를 청크 단위로 복사하면서 해시를 계산 (전체를 메모리에 올리지 않음)
+
+        첫 청크의 매직 바이트로 이미지 형식을 확인하고 (digest, content_type)을 반환한다.
+        """
+        tmp_path = self._tmp_path()
+        hasher = hashlib.sha256()
+        content_type = None
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while chunk := source.read(IMAGE_CHUNK_SIZE):
+                    if content_type is None:
+                        content_type = detect_image_type(chunk)
+                        if content_type is None:
+                            raise HTTPException(
+                                status_code=415, detail="Unsupported image type"
+                            )
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail="Image too large")
+                    hasher.update(chunk)
+                    f.write(chunk)
+
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Empty image")
+
+            digest = hasher.hexdigest()
+            self._commit(tmp_path, digest)
+            return digest, content_type
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def exists(self, digest: str, variant: Optional[str] = None) -> bool:
+        return os.path.exists(self.path(digest, variant))
+
+    def size(self, digest: str, variant: Optional[str] = None) -> int:
+        return os.path.getsize(self.path(digest, variant))
+
+    def iter_range(self, digest: str, start: int, end: int, variant: Optional[str] = None):
+        """[start, end] 구간을 IMAGE_CHUNK_SIZE 단위로 읽어 내보낸다"""
+        with open(self.path(digest, variant), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(IMAGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+blob_store = BlobStore(IMAGE_STORE_DIR)
+
+
+# 썸네일 파이프라인: 업로드 직후 작업 풀에서 크기/형식별 파생본을 만들어 원본 옆에 저장
+def generate_image_variants(store: BlobStore, digest: str):
+    try:
+        with Image.open(store.path(digest)) as original:
+            # 헤더만 읽은 상태에서 크기를 확인한다 (load() 전에는 픽셀을 디코딩하지 않음)
+            width, height = original.size
+            if width * height > MAX_IMAGE_PIXELS:
+                raise ValueError(f"image too large: {width}x{height}")
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # 디코딩할 수 없거나 너무 큰 이미지는 다시 시도해도 같으므로 완료로 기록하고 원본만 제공
+        logger.warning("Cannot decode image %s, serving original only", digest)
+        store.put_variant(digest, IMAGE_VARIANTS_DONE, b"")
+        return
+
+    for size in IMAGE_VARIANT_SIZES:
+        # 원본보다 큰 썸네일은 만들지 않는다 (요청 시 원본 제공)
+        if min(image.size) < size:
+            continue
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for fmt in IMAGE_VARIANT_FORMATS:
+            variant = f"{size}.{fmt}"
+            if store.exists(digest, variant):
+                continue
+            output = io.BytesIO()
+            if fmt == "jpeg":
+                thumbnail.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+            else:
+                thumbnail.save(output, "WEBP", quality=80, method=4)
+            store.put_variant(digest, variant, output.getvalue())
+    store.put_variant(digest, IMAGE_VARIANTS_DONE, b"")
+
+
+_image_executor: Optional[ThreadPoolExecutor] = None
+_image_jobs = set()
+_image_jobs_lock = threading.Lock()
+
+
+def schedule_image_variants(digest: str):
+    """digest의 썸네일 생성을 작업 풀에 맡긴다 (같은 digest는 동시에 한 번만, 끝난 digest는 다시 안 함)"""
+    global _image_executor
+    if Image is None or blob_store.exists(digest, IMAGE_VARIANTS_DONE):
+        return
+    with _image_jobs_lock:
+        if digest in _image_jobs:
+            return
+        _image_jobs.add(digest)
+        if _image_executor is None:
+            _image_executor = ThreadPoolExecutor(
+                max_workers=IMAGE_WORKERS, thread_name_prefix="image"
+            )
+
+    store = blob_store
+
+    def run():
+        try:
+            generate_image_variants(store, digest)
+        except Exception:
+            logger.exception("Failed to generate image variants for %s", digest)
+        finally:
+            with _image_jobs_lock:
+                _image_jobs.discard(digest)
+
+    _image_executor.submit(run)
+
+
+def stop_image_executor():
+    global _image_executor
+    with _image_jobs_lock:
+        executor, _image_executor = _image_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def select_image_variant(size: Optional[int], fmt: Optional[str], accept: Optional[str]):
+    """요청한 크기 이상인 가장 작은 썸네일 이름 (없으면 None = 원본)"""
+    if not size:
+        return None
+    if fmt is None:
+        fmt = "webp" if accept and "image/webp" in accept else "jpeg"
+    for variant_size in IMAGE_VARIANT_SIZES:
+        if variant_size >= size:
+            return f"{variant_size}.{fmt}"
+    return None
+
+
+def fallback_image_variant(store: BlobStore, digest: str, variant: str) -> Optional[str]:
+    """variant가 없을 때 대신 줄 이미 만들어진 더 큰 썸네일 (없으면 None = 원본)
+
+    썸네일은 원본보다 작은 크기만 만들므로, 더 큰 썸네일이 없으면 원본이 가장 큰 이미지다.
+    """
+    size, fmt = variant.split(".")
+    for variant_size in IMAGE_VARIANT_SIZES:
+        candidate = f"{variant_size}.{fmt}"
+        if variant_size > int(size) and store.exists(digest, candidate):
+            return candidate
+    return None
+
+
+# 비밀번호 해시: "scrypt$n$r$p$salt$hash" 형식 (이전 버전은 솔트 없는 SHA-256 hex)
+def hash_password(
+    password: str,
+    n: int = PASSWORD_HASH_N,
+    r: int = PASSWORD_HASH_R,
+    p: int = PASSWORD_HASH_P,
+) -> str:
+    salt = secrets.token_bytes(16)
+    derived = hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p
+    )
+    return "$".join(
+        [
+            "scrypt",
+            str(n),
+            str(r),
+            str(p),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(derived).decode(),
+        ]
+    )
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    if not hashed.startswith("scrypt$"):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return secrets.compare_digest(legacy, hashed)
+
+    try:
+        _, n, r, p, salt, expected = hashed.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+    except ValueError:
+        return False
+    derived = hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r * p,
+        dklen=len(expected),
+    )
+    return secrets.compare_digest(derived, expected)
+
+
+def password_needs_rehash(hashed: str) -> bool:
+    """레거시 SHA-256 해시이거나 현재 비용 설정과 다르면 재해시 대상"""
+    return not hashed.startswith(
+        f"scrypt${PASSWORD_HASH_N}${PASSWORD_HASH_R}${PASSWORD_HASH_P}$"
+    )
+
+
+# 해시 계산은 CPU를 오래 쓰므로 이벤트 루프와 GIL 밖의 프로세스 풀에서 실행한다.
+# 워커는 forkserver로 띄운다: 첫 로그인 시점에는 DB/이미지 스레드가 이미 돌고 있어
+# 멀티스레드 프로세스를 fork하면 자식이 잠금을 쥔 채 멈출 수 있다
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_semaphore: Optional[asyncio.Semaphore] = None
+# 없는 이메일로 로그인해도 같은 비용의 검증을 돌리기 위한 더미 해시 (계정 존재 여부 노출 방지)
+_dummy_password_hash: Optional[str] = None
+
+
+def start_password_hasher():
+    global _hash_executor, _hash_semaphore, _dummy_password_hash
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])  # 워커마다 이 모듈을 다시 import하지 않도록
+    _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=context)
+    _hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_MAX_CONCURRENCY)
+    _dummy_password_hash = hash_password(
+        secrets.token_urlsafe(16), PASSWORD_HASH_N, PASSWORD_HASH_R, PASSWORD_HASH_P
+    )
+
+
+def stop_password_hasher():
+    global _hash_executor, _hash_semaphore
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+    _hash_executor = None
+    _hash_semaphore = None
+
+
+@asynccontextmanager
+async def password_hash_slot():
+    """해시 작업 슬롯을 잡는다. 대기열이 가득 차면 기다리지 않고 503"""
+    if _hash_executor is None:
+        start_password_hasher()
+    if _hash_semaphore.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests",
+            headers={"Retry-After": "1"},
+        )
+    async with _hash_semaphore:
+        yield
+
+
+async def hash_in_executor(func, *args):
+    """슬롯을 이미 잡은 호출자가 해시 작업을 프로세스 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, func, *args)
+
+
+async def run_password_hash(func, *args):
+    """해시 작업을 프로세스 풀에서 실행. 대기열이 가득 차면 기다리지 않고 503"""
+    async with password_hash_slot():
+        return await hash_in_executor(func, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_hash(
+        hash_password, password, PASSWORD_HASH_N, PASSWORD_HASH_R, PASSWORD_HASH_P
+    )
+
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+
+    # RFC 7519 클레임 추가
+    to_encode.update(
+        {
+            "iss": "mentor-mentee-app",  # issuer
+            "sub": str(data.get("user_id")),  # subject
+            "aud": "mentor-mentee-frontend",  # audience
+            "exp": expire,  # expiration time
+            "nbf": datetime.utcnow(),  # not before
+            "iat": datetime.utcnow(),  # issued at
+            "jti": secrets.token_hex(16),  # JWT ID
+        }
+    )
+
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def access_token_claims(row) -> dict:
+    """users + mentors/mentees 조인 결과에서 액세스 토큰 클레임 구성"""
+    return {
+        "user_id": row["id"],
+        "email": row["email"],
+        "name": row["name"],
+        "role": row["role"],
+        "mentor_id": row["mentor_id"],
+        "mentee_id": row["mentee_id"],
+    }
+
+
+def issue_refresh_token(cursor, user_id: int, family_id: Optional[str] = None) -> str:
+    """리프레시 토큰 발급 ("<id>.<secret>" 형식, DB에는 secret의 해시만 저장)"""
+    token_id = secrets.token_hex(16)
+    secret = secrets.token_urlsafe(32)
+    cursor.execute(
+        """
+        INSERT INTO refresh_tokens (id, user_id, family_id, token_hash, expires_at)
+        VALUES (?, ?, ?, ?, datetime('now', ?))
+    """,
+        (
+            token_id,
+            user_id,
+            family_id or token_id,
+            hashlib.sha256(secret.encode()).hexdigest(),
+            f"+{REFRESH_TOKEN_EXPIRE_DAYS} days",
+        ),
+    )
+    return f"{token_id}.{secret}"
+
+
+def split_refresh_token(token: str) -> tuple:
+    token_id, _, secret = token.partition(".")
+    if not token_id or not secret:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return token_id, hashlib.sha256(secret.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class Principal:
+    """검증된 액세스 토큰의 주체 (로그인 시 토큰에 담긴 클레임)"""
+
+    user_id: int
+    role: str
+    mentor_id: Optional[int]
+    mentee_id: Optional[int]
+    jti: Optional[str]
+    exp: float
+
+
+class TokenCache:
+    """검증이 끝난 토큰 -> Principal LRU 캐시 (토큰 만료 시각까지만 유효)
+
+    폐기된 jti는 만료 시각까지 기억해 두고 캐시 적중 시에도 거절한다. 폐기는 revoked_tokens
+    테이블에 기록되고, 각 워커는 TOKEN_REVOCATION_SYNC_SECONDS마다 seq 이후 행을 가져온다.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._revoked = {}  # jti -> exp
+        self.seq = 0  # 반영한 마지막 revoked_tokens.seq
+        self._synced_at = 0.0
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._entries.get(token)
+            if principal is None:
+                return None
+            if principal.exp <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal):
+        with self._lock:
+            self._entries[token] = principal
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _remember(self, revoked: dict):
+        now = time.time()
+        # 이미 만료된 jti는 더 기억할 필요가 없다
+        for expired in [j for j, e in self._revoked.items() if e <= now]:
+            del self._revoked[expired]
+        self._revoked.update(revoked)
+
+    def revoke(self, conn, jti: str, exp: float):
+        """jti를 폐기 목록(DB)에 올리고 이 워커에는 바로 반영"""
+        conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, exp)
+        )
+        conn.commit()
+        with self._lock:
+            self._remember({jti: exp})
+
+    def sync(self, conn):
+        """다른 워커가 폐기한 jti를 가져온다"""
+        rows = conn.execute(
+            "SELECT seq, jti, expires_at FROM revoked_tokens WHERE seq > ? ORDER BY seq",
+            (self.seq,),
+        ).fetchall()
+        with self._lock:
+            self._synced_at = time.monotonic()
+            if rows and rows[-1]["seq"] > self.seq:
+                self._remember({row["jti"]: row["expires_at"] for row in rows})
+                self.seq = rows[-1]["seq"]
+
+    async def refresh(self):
+        if time.monotonic() - self._synced_at >= TOKEN_REVOCATION_SYNC_SECONDS:
+            # 동시에 들어온 요청이 모두 sync()를 예약하지 않도록 먼저 표시
+            self._synced_at = time.monotonic()
+            await run_db(self.sync)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        with self._lock:
+            return jti in self._revoked
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+async def verify_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> Principal:
+    return await authenticate(credentials.credentials)
+
+
+async def verify_stream_token(
+    ticket: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Principal:
+    # 브라우저 EventSource는 헤더를 붙일 수 없으므로 POST /api/events/ticket으로 받은
+    # 일회용 티켓을 ?ticket=으로 보낸다 (액세스 토큰이 접근 로그/프록시에 남지 않도록)
+    if credentials is not None:
+        return await authenticate(credentials.credentials)
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    row = await run_db(redeem_event_ticket, ticket)
+    if row is None:
+        raise HTTPException(status_code=401, detail="Invalid ticket")
+    principal = Principal(
+        user_id=row["user_id"],
+        role=row["role"],
+        mentor_id=row["mentor_id"],
+        mentee_id=row["mentee_id"],
+        jti=row["jti"],
+        exp=row["token_exp"],
+    )
+    await token_cache.refresh()
+    if token_cache.is_revoked(principal.jti):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return principal
+
+
+def issue_event_ticket(conn, principal: Principal) -> str:
+    """SSE 연결용 티켓 발급 (DB에는 해시만 저장, 만료된 티켓은 이때 정리)"""
+    ticket = secrets.token_urlsafe(32)
+    now = time.time()
+    conn.execute("DELETE FROM event_tickets WHERE expires_at <= ?", (now,))
+    conn.execute(
+        """
+        INSERT INTO event_tickets
+            (ticket_hash, user_id, role, mentor_id, mentee_id, jti, token_exp, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            hashlib.sha256(ticket.encode()).hexdigest(),
+            principal.user_id,
+            principal.role,
+            principal.mentor_id,
+            principal.mentee_id,
+            principal.jti,
+            principal.exp,
+            now + EVENT_TICKET_SECONDS,
+        ),
+    )
+    conn.commit()
+    return ticket
+
+
+def redeem_event_ticket(conn, ticket: str):
+    """티켓을 소비하고 발급 시점의 Principal 정보를 반환 (없거나 만료/재사용이면 None)"""
+    rows = conn.execute(
+        """
+        DELETE FROM event_tickets WHERE ticket_hash = ?
+        RETURNING user_id, role, mentor_id, mentee_id, jti, token_exp, expires_at
+    """,
+        (hashlib.sha256(ticket.encode()).hexdigest(),),
+    ).fetchall()
+    conn.commit()
+    if not rows or rows[0]["expires_at"] <= time.time():
+        return None
+    return rows[0]
+
+
+async def authenticate(token: str) -> Principal:
+    """액세스 토큰 -> Principal (캐시 우선, 폐기된 토큰은 401)"""
+    principal = token_cache.get(token)
+
+    if principal is None:
+        try:
+            payload = jwt.decode(
+                token,
+                SECRET_KEY,
+                algorithms=[ALGORITHM],
+                options={"verify_aud": False},  # audience 검증 비활성화
+            )
+            user_id = int(payload["sub"])
+        except (jwt.PyJWTError, KeyError, ValueError):
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        if "mentor_id" in payload or "mentee_id" in payload:
+            mentor_id, mentee_id = payload.get("mentor_id"), payload.get("mentee_id")
+        else:
+            # 클레임 추가 이전에 발급된 토큰은 한 번만 조회해서 캐시
+            mentor_id, mentee_id = await run_db(fetch_profile_ids, user_id)
+
+        principal = Principal(
+            user_id=user_id,
+            role=payload.get("role"),
+            mentor_id=mentor_id,
+            mentee_id=mentee_id,
+            jti=payload.get("jti"),
+            exp=payload["exp"],
+        )
+        token_cache.put(token, principal)
+
+    await token_cache.refresh()
+    if token_cache.is_revoked(principal.jti):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return principal
+
+
+def fetch_profile_ids(conn, user_id: int) -> tuple:
+    row = conn.execute(
+        """
+        SELECT m.id AS mentor_id, me.id AS mentee_id
+        FROM users u
+        LEFT JOIN mentors m ON u.id = m.user_id
+        LEFT JOIN mentees me ON u.id = me.user_id
+        WHERE u.id = ?
+    """,
+        (user_id,),
+    ).fetchone()
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return row["mentor_id"], row["mentee_id"]
+
+
+class SqlStats:
+    """요청 하나에서 실행된 SQL 문 수와 실행 + fetch 시간 합계"""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# 현재 요청의 SqlStats (메트릭 미들웨어가 설정, run_db가 DB 스레드로 전달)
+_sql_stats: contextvars.ContextVar[Optional[SqlStats]] = contextvars.ContextVar(
+    "sql_stats", default=None
+)
+
+
+def redact_params(parameters) -> list:
+    """로그에는 바인딩 값 대신 자료형과 길이만 남긴다"""
+    if isinstance(parameters, dict):
+        return {key: redact_params([value])[0] for key, value in parameters.items()}
+    redacted = []
+    for value in parameters:
+        if value is None:
+            redacted.append("NULL")
+        elif isinstance(value, (str, bytes)):
+            redacted.append(f"<{type(value).__name__} len={len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+class SlowQueryLog:
+    """임계값을 넘은 SQL 문의 최근 기록(링 버퍼)과 문장별 EXPLAIN QUERY PLAN 캐시"""
+
+    def __init__(self, size: int, plan_cache_size: int = 512):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+        self._plans = {}  # 정규화한 SQL -> (plan, full_scan)
+        self._plan_cache_size = plan_cache_size
+
+    def _explain(self, conn, sql: str, parameters) -> tuple:
+        with self._lock:
+            cached = self._plans.get(sql)
+        if cached is not None:
+            return cached
+        try:
+            # 계측 래퍼를 거치지 않도록 기본 구현으로 실행
+            rows = sqlite3.Connection.execute(
+                conn, f"EXPLAIN QUERY PLAN {sql}", parameters
+            ).fetchall()
+        except (sqlite3.Error, ValueError):
+            plan, full_scan = [], False
+        else:
+            plan = [row[3] for row in rows]
+            full_scan = any(
+                detail.startswith("SCAN ")
+                and "USING" not in detail
+                and "VIRTUAL TABLE" not in detail
+                for detail in plan
+            )
+        with self._lock:
+            if len(self._plans) < self._plan_cache_size:
+                self._plans[sql] = (plan, full_scan)
+        return plan, full_scan
+
+    def record(self, conn, sql: str, parameters, seconds: float, vm_steps: int, many: bool):
+        sql = " ".join(sql.split())
+        plan, full_scan = self._explain(conn, sql, () if many else parameters)
+        entry = {
+            "sql": sql,
+            "params": f"<{len(parameters)} rows>" if many else redact_params(parameters),
+            "duration_ms": round(seconds * 1000, 3),
+            "vm_steps": vm_steps,
+            "plan": plan,
+            "full_scan": full_scan,
+            "at": datetime.utcnow().isoformat() + "Z",
+        }
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(
+            "slow query %.1fms%s: %s params=%s plan=%s",
+            entry["duration_ms"],
+            " [FULL SCAN]" if full_scan else "",
+            sql,
+            entry["params"],
+            plan,
+        )
+
+    def recent(self) -> list:
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def scans(self) -> list:
+        with self._lock:
+            return [sql for sql, (_, full_scan) in self._plans.items() if full_scan]
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_LOG_SIZE)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """SQL 통계를 쌓고, SQL_TRACE가 켜져 있으면 느린 문장을 slow_query_log에 남긴다
+
+    execute는 첫 단계까지만 실행하므로 fetch 시간도 같은 문장에 합산한다.
+    """
+
+    _trace = None  # [sql, parameters, 누적 시간, 시작 시 progress 카운터, executemany 여부]
+
+    def _run(self, method, sql, parameters, many):
+        stats = _sql_stats.get()
+        if stats is None and not SQL_TRACE_ENABLED:
+            return method(sql, parameters)
+        conn = self.connection
+        ticks = getattr(conn, "progress_ticks", 0)
+        started = time.perf_counter()
+        try:
+            return method(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            if stats is not None:
+                stats.queries += 1
+                stats.seconds += elapsed
+            if SQL_TRACE_ENABLED:
+                self._trace = [sql, parameters, elapsed, ticks, many]
+                self._check_slow()
+
+    def _check_slow(self):
+        sql, parameters, elapsed, ticks, many = self._trace
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            conn = self.connection
+            vm_steps = (getattr(conn, "progress_ticks", 0) - ticks) * SQL_TRACE_PROGRESS_STEPS
+            self._trace = None  # 문장당 한 번만 기록
+            slow_query_log.record(conn, sql, parameters, elapsed, vm_steps, many)
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        if SQL_TRACE_ENABLED:
+            seq_of_parameters = list(seq_of_parameters)
+        return self._run(super().executemany, sql, seq_of_parameters, True)
+
+    def _timed_fetch(self, fetch, *args):
+        stats = _sql_stats.get()
+        trace = self._trace
+        if stats is None and trace is None:
+            return fetch(*args)
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            if stats is not None:
+                stats.seconds += elapsed
+            if trace is not None:
+                trace[2] += elapsed
+                self._check_slow()
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """모든 문장이 InstrumentedCursor를 거치도록 하는 커넥션 (get_db()가 반환)"""
+
+    progress_ticks = 0
+
+    def enable_tracing(self):
+        # progress 핸들러는 N개 VM 명령마다 호출되므로 호출 횟수로 문장의 작업량을 가늠한다
+        self.set_progress_handler(self._on_progress, SQL_TRACE_PROGRESS_STEPS)
+
+    def _on_progress(self):
+        self.progress_ticks += 1
+        return 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """시작 시 한 번 열어 두고 재사용하는 SQLite 커넥션 풀"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._connections = [self._connect() for _ in range(size)]
+        for conn in self._connections:
+            self._idle.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # 빌려 간 스레드만 사용하므로 안전
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+            factory=InstrumentedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if SQL_TRACE_ENABLED:
+            conn.enable_tracing()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """커넥션을 빌려 주고, 블록이 정상 종료되면 커밋 / 예외 시 롤백 후 반환한다"""
+        try:
+            conn = self._idle.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise HTTPException(status_code=503, detail="Database is busy")
+
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+
+
+_db_pool: Optional[ConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+
+def open_db_pool() -> ConnectionPool:
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE)
+        return _db_pool
+
+
+def close_db_pool():
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.close()
+            _db_pool = None
+
+
+def get_db():
+    """풀에서 커넥션을 빌린다. `with get_db() as conn:` 형태로 사용"""
+    pool = _db_pool or open_db_pool()
+    return pool.connection()
+
+
+# 비동기 데이터 접근 계층: 동기 sqlite3 호출을 이벤트 루프 밖의 전용 스레드 풀에서 실행
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def start_db_executor():
+    global _db_executor, _db_semaphore
+    _db_executor = ThreadPoolExecutor(
+        max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="db"
+    )
+    _db_semaphore = asyncio.Semaphore(DB_MAX_CONCURRENCY)
+
+
+def stop_db_executor():
+    global _db_executor, _db_semaphore
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+    _db_executor = None
+    _db_semaphore = None
+
+
+def _run_with_connection(func, args):
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.threads.add(threading.get_ident())
+    try:
+        with get_db() as conn:
+            return func(conn, *args)
+    finally:
+        if profile is not None:
+            profile.threads.discard(threading.get_ident())
+
+
+async def run_db(func, *args):
+    """func(conn, *args)를 DB 스레드 풀에서 실행하고 결과를 기다린다"""
+    if _db_executor is None:
+        start_db_executor()
+    async with _db_semaphore:
+        loop = asyncio.get_running_loop()
+        # 요청별 contextvar(SQL 통계 등)가 DB 스레드에서도 보이도록 컨텍스트를 복사해 실행
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _db_executor, context.run, _run_with_connection, func, args
+        )
+
+
+def verify_admin(x_admin_key: Optional[str] = Header(None)):
+    if not (
+        ADMIN_API_KEY
+        and x_admin_key
+        and secrets.compare_digest(x_admin_key, ADMIN_API_KEY)
+    ):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+class RouteMetrics:
+    """(method, route) 하나의 카운터와 미리 할당한 히스토그램 버킷
+
+    이벤트 루프 스레드에서만 갱신하므로 잠금이 필요 없다.
+    """
+
+    __slots__ = (
+        "statuses",
+        "in_flight",
+        "latency_buckets",
+        "latency_sum",
+        "size_buckets",
+        "size_sum",
+        "sql_queries",
+        "sql_seconds",
+    )
+
+    def __init__(self):
+        self.statuses = {}
+        self.in_flight = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.size_buckets = [0] * (len(RESPONSE_SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+    def observe(self, status: int, seconds: float, size: int, sql: SqlStats):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+        self.size_buckets[bisect.bisect_left(RESPONSE_SIZE_BUCKETS, size)] += 1
+        self.size_sum += size
+        self.sql_queries += sql.queries
+        self.sql_seconds += sql.seconds
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}  # (method, route 템플릿) -> RouteMetrics
+
+    def route(self, method: str, route: str) -> RouteMetrics:
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        return metrics
+
+    @staticmethod
+    def _histogram(lines, name, labels, bounds, buckets, total):
+        cumulative = 0
+        for bound, count in zip(bounds, buckets):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        count = cumulative + buckets[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+
+    def render(self) -> str:
+        routes = sorted(self.routes.items())
+        sections = {
+            "http_requests_total": ("counter", "요청 수 (라우트, 상태 코드별)", []),
+            "http_requests_in_flight": ("gauge", "처리 중인 요청 수", []),
+            "http_request_duration_seconds": ("histogram", "요청 처리 시간", []),
+            "http_response_size_bytes": ("histogram", "응답 본문 크기", []),
+            "http_request_sql_queries_total": ("counter", "요청 처리 중 실행한 SQL 문 수", []),
+            "http_request_sql_seconds_total": ("counter", "요청 처리 중 SQL 실행 + fetch 시간", []),
+        }
+        for (method, route), metrics in routes:
+            labels = f'method="{_label(method)}",route="{_label(route)}"'
+            for status, count in sorted(metrics.statuses.items()):
+                sections["http_requests_total"][2].append(
+                    f'http_requests_total{{{labels},status="{status}"}} {count}'
+                )
+            sections["http_requests_in_flight"][2].append(
+                f"http_requests_in_flight{{{labels}}} {metrics.in_flight}"
+            )
+            self._histogram(
+                sections["http_request_duration_seconds"][2],
+                "http_request_duration_seconds",
+                labels,
+                LATENCY_BUCKETS,
+                metrics.latency_buckets,
+                metrics.latency_sum,
+            )
+            self._histogram(
+                sections["http_response_size_bytes"][2],
+                "http_response_size_bytes",
+                labels,
+                RESPONSE_SIZE_BUCKETS,
+                metrics.size_buckets,
+                metrics.size_sum,
+            )
+            sections["http_request_sql_queries_total"][2].append(
+                f"http_request_sql_queries_total{{{labels}}} {metrics.sql_queries}"
+            )
+            sections["http_request_sql_seconds_total"][2].append(
+                f"http_request_sql_seconds_total{{{labels}}} {metrics.sql_seconds}"
+            )
+
+        lines = []
+        for name, (kind, help_text, samples) in sections.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+_route_table: Optional[list] = None
+
+
+def route_template(scope) -> str:
+    """요청 경로 대신 라우트 템플릿(/api/match-requests/{request_id})을 레이블로 사용"""
+    global _route_table
+    if _route_table is None:
+        # Route.matches()는 요청마다 child scope를 만들므로 정규식과 메서드만 미리 뽑아 둔다
+        _route_table = [
+            (route.path_regex, getattr(route, "methods", None), route.path)
+            for route in scope["app"].router.routes
+            if hasattr(route, "path_regex")
+        ]
+    path = scope["path"]
+    partial = None
+    for regex, methods, template in _route_table:
+        if regex.match(path):
+            if methods is None or scope["method"] in methods:
+                return template
+            if partial is None:
+                partial = template
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """라우트별 요청 수/상태 코드/지연/응답 크기/SQL 사용량을 기록하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = metrics_registry.route(scope["method"], route_template(scope))
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        sql = SqlStats()
+        token = _sql_stats.set(sql)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            metrics.in_flight -= 1
+            _sql_stats.reset(token)
+            metrics.observe(status, time.perf_counter() - started, size, sql)
+
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+def request_body_limit(path: str) -> Optional[int]:
+    """경로별 요청 본문 최대 바이트 (None = 제한 없음)"""
+    if path == "/api/profile/image":
+        return MAX_IMAGE_BYTES + IMAGE_CHUNK_SIZE  # multipart 오버헤드 감안
+    return None
+
+
+class BodySizeLimitMiddleware:
+    """요청 본문을 읽는 도중 크기 상한을 넘으면 413 (multipart 파서가 디스크에 전부 받기 전에)
+
+    Content-Length가 상한을 넘으면 바로, 없는 chunked 요청은 받은 바이트를 세다가 거절한다.
+    예외는 라우트 안(폼 파싱)에서 올라오므로 다른 HTTPException과 같은 경로로 응답된다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = request_body_limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Content-Length가 상한을 넘으면 본문을 읽기 전에 거절
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        received = int(content_length) if content_length.isdigit() else 0
+        if received <= limit:
+            received = 0
+
+        async def limited_receive():
+            nonlocal received
+            if received > limit:
+                raise HTTPException(status_code=413, detail="Image too large")
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Image too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(BodySizeLimitMiddleware)
+
+
+class RequestProfile:
+    """요청 하나를 처리하는 스레드(이벤트 루프 + DB 스레드)의 스택을 주기적으로 샘플링
+
+    결과는 flamegraph.pl / speedscope가 읽는 collapsed stack 형식
+    ("thread;module:function;... count")으로 저장한다. 이벤트 루프 스레드는
+    공유되므로 같은 시간에 처리 중인 다른 요청의 스택도 섞일 수 있다.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.threads = {threading.get_ident()}
+        self.loop_thread = threading.get_ident()
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    names.append(f"{module}:{code.co_name}")
+                    frame = frame.f_back
+                names.append("loop" if thread_id == self.loop_thread else "db")
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def write(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.collapsed")
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        prune_profiles(directory, PROFILE_MAX_BYTES)
+        return path
+
+
+def prune_profiles(directory: str, max_bytes: int):
+    """디렉토리 전체 크기가 max_bytes 이하가 될 때까지 오래된 프로파일부터 삭제"""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".collapsed"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+_active_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "active_profile", default=None
 )
 
-security = HTTPBearer()
 
+class ProfilingMiddleware:
+    """X-Profile 헤더(관리자 키) 또는 샘플링으로 선택된 요청을 프로파일링"""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        if not ADMIN_API_KEY:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return secrets.compare_digest(value, ADMIN_API_KEY.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            self._requested(scope)
+            or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        route = re.sub(r"[^A-Za-z0-9]+", "_", route_template(scope)).strip("_") or "root"
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{route}"
+        profile = RequestProfile(name)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", name.encode())]
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop()
+            _active_profile.reset(token)
+            await asyncio.to_thread(profile.write, PROFILE_DIR)
 
-# 데이터베이스 초기화
-def init_db():
-    conn = sqlite3.connect("mentor_mentee.db")
-    cursor = conn.cursor()
 
-    # Users 테이블
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT,
-            role TEXT CHECK(role IN ('mentor', 'mentee')) NOT NULL,
-            bio TEXT,
-            profile_image BLOB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
     )
 
-    # Mentors 테이블
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS mentors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            skills TEXT,
-            experience_years INTEGER DEFAULT 0,
-            rating REAL DEFAULT 0.0,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
+
+# keyset 페이지네이션
+def encode_cursor(kind: str, values) -> str:
+    raw = json.dumps([kind, *values], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str, types: tuple) -> tuple:
+    """encode_cursor로 만든 커서를 정렬 키 튜플로 복원 (형식이 다르면 400)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if (
+        not isinstance(data, list)
+        or len(data) != len(types) + 1
+        or data[0] != kind
+        or not all(isinstance(value, t) for value, t in zip(data[1:], types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(data[1:])
+
+
+class Page:
+    """목록 API 공통 페이지 파라미터
+
+    기본 응답은 {"items": [...], "next_cursor": ...} 형태이며,
+    legacy=true를 주면 기존처럼 전체 목록을 배열로 반환한다.
     """
-    )
 
-    # Mentees 테이블
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS mentees (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            interests TEXT,
-            goals TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+        cursor: Optional[str] = None,
+        legacy: bool = False,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.legacy = legacy
+
+    def after(self, kind: str, types: tuple) -> Optional[tuple]:
+        if self.legacy or not self.cursor:
+            return None
+        return decode_cursor(self.cursor, kind, types)
+
+    def split(self, rows: list, key) -> tuple:
+        """limit + 1개로 조회한 결과를 현재 페이지와 다음 커서로 나눈다"""
+        if self.legacy or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[: self.limit]
+        kind, values = key(rows[-1])
+        return rows, encode_cursor(kind, values)
+
+    def wrap(self, items: list, next_cursor: Optional[str]):
+        if self.legacy:
+            return items
+        return {"items": items, "next_cursor": next_cursor}
+
+
+class RequestPage(Page):
+    """매칭 요청 목록용 페이지 파라미터 (+ since=<seq> 증분 동기화)
+
+    첫 페이지를 읽을 때 변경 이력의 최고 seq를 커서에 고정해 모든 페이지가 같은 시점을
+    기준으로 하고, 마지막 페이지에만 그 값을 next_since로 담는다. 다음 새로고침에
+    since=next_since를 주면 그 이후 바뀐 요청만 같은 방식으로 페이지를 나눠 돌려준다.
     """
-    )
 
-    # Match Requests 테이블
-    cursor.execute(
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+        cursor: Optional[str] = None,
+        legacy: bool = False,
+        since: Optional[int] = Query(None, ge=0),
+    ):
+        # since가 오래되면 전체 이력이 되므로 legacy여도 항상 페이지로 나눈다
+        super().__init__(limit, cursor, legacy and since is None)
+        self.since = since
+        self.upto = None  # 이 목록이 반영하는 변경 이력의 마지막 seq
+
+    @property
+    def table_hint(self) -> str:
+        """since 조회에서 match_requests에 붙일 힌트
+
+        통계가 없으면 플래너가 멘토/멘티 인덱스로 전체 이력을 훑으므로, 변경 id 목록에서
+        기본 키로 찾아가도록 보조 인덱스 사용을 막는다 (NOT INDEXED여도 rowid 조회는 가능).
         """
-        CREATE TABLE IF NOT EXISTS match_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            mentor_id INTEGER,
-            mentee_id INTEGER,
-            message TEXT,
-            status TEXT CHECK(status IN ('pending', 'accepted', 'rejected')) DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (mentor_id) REFERENCES mentors (id),
-            FOREIGN KEY (mentee_id) REFERENCES mentees (id)
-        )
+        return "NOT INDEXED" if self.since is not None else ""
+
+    def cursor_key(self, row) -> tuple:
+        return "requests", (row["created_at"], row["id"], self.upto)
+
+    def wrap(self, items: list, next_cursor: Optional[str]):
+        if self.legacy:
+            return items
+        # 중간 페이지의 seq로 동기화하면 뒤 페이지의 변경을 놓치므로 마지막 페이지에만 준다
+        next_since = None if next_cursor else self.upto
+        return {"items": items, "next_cursor": next_cursor, "next_since": next_since}
+
+
+def fetch_request_rows(cursor, query: str, params: list, page: RequestPage, owner: tuple):
+    """WHERE 절까지 작성된 매칭 요청 목록 쿼리에 keyset 조건, 정렬, LIMIT을 붙여 실행
+
+    owner = (match_request_events 컬럼, 프로필 id). since가 있으면 그 뒤 이력에 나온 요청만
+    조회하므로 비용이 전체 이력이 아니라 변경 건수에 비례한다. 이때 쿼리는
+    match_requests mr 뒤에 page.table_hint를 붙여 작성해야 한다.
     """
-    )
+    after = page.after("requests", (str, int, int))
+    if after:
+        created_at, request_id, page.upto = after
+    else:
+        # 목록보다 먼저 읽어야 그 사이 변경이 다음 동기화에서 빠지지 않는다
+        page.upto = cursor.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM match_request_events"
+        ).fetchone()[0]
+
+    if page.since is not None:
+        owner_column, owner_id = owner
+        query += f"""
+            AND mr.id IN (
+                SELECT request_id FROM match_request_events
+                WHERE {owner_column} = ? AND seq > ? AND seq <= ?
+            )"""
+        params = [*params, owner_id, page.since, page.upto]
+
+    if after:
+        query += " AND (mr.created_at, mr.id) < (?, ?)"
+        params = [*params, created_at, request_id]
+
+    query += " ORDER BY mr.created_at DESC, mr.id DESC"
+    if not page.legacy:
+        query += " LIMIT ?"
+        params = [*params, page.limit + 1]
 
-    conn.commit()
-    conn.close()
+    cursor.execute(query, params)
+    return cursor.fetchall()
 
 
-# Pydantic 모델들
-class UserCreate(BaseModel):
-    email: EmailStr
-    password: str
-    name: str
-    role: str
+def ensure_mentee(principal: Principal):
+    if principal.role != "mentee":
+        raise HTTPException(
+            status_code=401, detail="Only mentees can access mentor list"
+        )
 
 
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
+def build_search_query(q: str) -> str:
+    """검색어를 FTS5 MATCH 식으로 변환 (각 단어를 접두어 검색, AND 결합)"""
+    terms = re.findall(r"\w+", q)
+    return " ".join(f'"{term}"*' for term in terms[:10])
 
 
-class ProfileUpdate(BaseModel):
-    name: Optional[str] = None
-    bio: Optional[str] = None
-    skills: Optional[str] = None
-    experience_years: Optional[int] = None
-    interests: Optional[str] = None
-    goals: Optional[str] = None
+# 멘토 목록 조회
+MENTOR_QUERY = """
+    SELECT u.id, u.name, u.email, u.bio, u.profile_image_digest,
+           m.skills, m.experience_years, m.rating
+    FROM users u
+    JOIN mentors m ON u.id = m.user_id
+    WHERE u.role = 'mentor'
+"""
 
 
-class MatchRequestCreate(BaseModel):
-    mentorId: int
-    menteeId: int
-    message: str  # 유틸리티 함수들
+def query_mentors(
+    cursor,
+    skills: List[str],
+    match_all: bool,
+    ordering: str,
+    after: Optional[tuple] = None,
+    limit: Optional[int] = None,
+):
+    """mentor_skills 역색인으로 필터링해 DB에서 직접 멘토 목록을 조회"""
+    query = MENTOR_QUERY
+    params = []
 
+    # 스킬 필터: skill_match=any(OR) / all(AND)
+    if skills:
+        placeholders = ", ".join("?" for _ in skills)
+        if match_all:
+            query += f"""
+                AND m.id IN (
+                    SELECT mentor_id FROM mentor_skills
+                    WHERE skill_normalized IN ({placeholders})
+                    GROUP BY mentor_id HAVING COUNT(*) = ?
+                )
+            """
+            params.extend(skills)
+            params.append(len(skills))
+        else:
+            query += f"""
+                AND m.id IN (
+                    SELECT mentor_id FROM mentor_skills
+                    WHERE skill_normalized IN ({placeholders})
+                )
+            """
+            params.extend(skills)
+
+    # 정렬 키는 _mentor_sort_key와 동일 (NULL은 빈 문자열로 취급, 동률은 id 순)
+    if ordering == "skill":
+        sort_columns = "IFNULL(m.skills, ''), u.id"
+    elif ordering == "name":
+        sort_columns = "IFNULL(u.name, ''), u.id"
+    else:
+        sort_columns = "u.id"
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    if after:
+        query += f" AND ({sort_columns}) > ({', '.join('?' for _ in after)})"
+        params.extend(after)
 
+    query += f" ORDER BY {sort_columns}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+    cursor.execute(query, params)
+    return cursor.fetchall()
 
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+def image_version(digest: str) -> str:
+    return digest[:16]
 
-    # RFC 7519 클레임 추가
-    to_encode.update(
-        {
-            "iss": "mentor-mentee-app",  # issuer
-            "sub": str(data.get("user_id")),  # subject
-            "aud": "mentor-mentee-frontend",  # audience
-            "exp": expire,  # expiration time
-            "nbf": datetime.utcnow(),  # not before
-            "iat": datetime.utcnow(),  # issued at
-            "jti": secrets.token_hex(16),  # JWT ID
+
+def profile_image_url(role: str, user_id: int, digest: Optional[str]) -> str:
+    # 다이제스트를 버전으로 붙여 두면 이미지가 바뀔 때만 URL이 바뀌므로 오래 캐시할 수 있다
+    url = f"/images/{role}/{user_id}"
+    return f"{url}?v={image_version(digest)}" if digest else url
+
+
+def parse_byte_range(range_header: str, size: int) -> Optional[tuple]:
+    """단일 "bytes=start-end" Range 헤더를 [start, end] 구간으로 변환 (지원하지 않는 형식은 None)"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # bytes=-N: 마지막 N바이트
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in tags)
+
+
+def mentor_payload(mentor) -> dict:
+    return {
+        "id": mentor["id"],
+        "email": mentor["email"],
+        "role": "mentor",
+        "profile": {
+            "name": mentor["name"],
+            "bio": mentor["bio"],
+            "imageUrl": profile_image_url(
+                "mentor", mentor["id"], mentor["profile_image_digest"]
+            ),
+            "skills": mentor["skills"].split(",") if mentor["skills"] else [],
+        },
+    }
+
+
+MENTOR_ORDERINGS = ("id", "name", "skill")
+MENTOR_CURSOR_TYPES = {"id": (int,), "name": (str, int), "skill": (str, int)}
+
+
+def _mentor_sort_key(ordering: str, mentor) -> tuple:
+    if ordering == "name":
+        return (mentor["name"] or "", mentor["id"])
+    if ordering == "skill":
+        return (mentor["skills"] or "", mentor["id"])
+    return (mentor["id"],)
+
+
+MENTOR_CHANGE_CHUNK = 500  # 바뀐 멘토를 다시 읽을 때 IN (...) 한 번에 넣는 id 수
+
+
+def current_mentor_change_seq(conn) -> int:
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM mentor_changes").fetchone()[0]
+
+
+def prune_mentor_changes(conn):
+    """최근 MENTOR_CHANGE_RETENTION개만 남기고 오래된 mentor_changes를 지운다
+
+    워커마다 커서가 달라 모두가 읽었는지 알 수 없으므로 개수로 자른다. 잘린 구간보다 뒤처진
+    캐시는 fetch_mentor_changes가 알려 주고 전체를 다시 읽는다.
+    """
+    oldest, newest = conn.execute("SELECT MIN(seq), MAX(seq) FROM mentor_changes").fetchone()
+    if oldest is not None and oldest <= newest - MENTOR_CHANGE_RETENTION:
+        conn.execute(
+            "DELETE FROM mentor_changes WHERE seq <= ?", (newest - MENTOR_CHANGE_RETENTION,)
+        )
+        conn.commit()
+
+
+def fetch_mentor_changes(conn, since: int):
+    """since 이후 mentor_changes -> (마지막 seq, {user_id: 현재 멘토 행 또는 None(삭제)})
+
+    since 다음 변경이 이미 정리되어 이어 읽을 수 없으면 None (호출자가 전체를 다시 읽는다).
+    """
+    oldest = conn.execute("SELECT MIN(seq) FROM mentor_changes").fetchone()[0]
+    if oldest is not None and oldest > since + 1:
+        return None
+    changes = conn.execute(
+        "SELECT seq, user_id FROM mentor_changes WHERE seq > ? ORDER BY seq", (since,)
+    ).fetchall()
+    if not changes:
+        return since, {}
+
+    user_ids = sorted({change["user_id"] for change in changes})
+    rows = dict.fromkeys(user_ids)
+    for start in range(0, len(user_ids), MENTOR_CHANGE_CHUNK):
+        chunk = user_ids[start : start + MENTOR_CHANGE_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row in conn.execute(MENTOR_QUERY + f" AND u.id IN ({placeholders})", chunk):
+            rows[row["id"]] = row
+    return changes[-1]["seq"], rows
+
+
+class MentorCatalog:
+    """GET /api/mentors를 DB 없이 응답하기 위한 인메모리 멘토 카탈로그
+
+    처음 조회할 때 전체를 읽어 들이고, 이후에는 mentor_changes 로그에서 바뀐 멘토만
+    sync()로 갱신한다. 로그는 트리거가 채우므로 다른 워커 프로세스의 변경도 반영된다.
+    DB 조회는 잠금 밖에서 하고, 잠금은 메모리 색인을 바꾸거나 읽을 때만 잡는다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.seq = 0  # 반영한 마지막 mentor_changes.seq
+        self._synced_at = 0.0
+        self._mentors = {}  # user_id -> 멘토 레코드
+        self._skill_index = {}  # 정규화된 스킬 -> user_id 집합
+        self._orderings = {ordering: [] for ordering in MENTOR_ORDERINGS}
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def _build(self, row) -> dict:
+        mentor = dict(row)
+        mentor["skill_set"] = frozenset(parse_skills(mentor["skills"]))
+        mentor["payload"] = mentor_payload(row)
+        return mentor
+
+    def _index(self, mentor: dict):
+        self._mentors[mentor["id"]] = mentor
+        for skill in mentor["skill_set"]:
+            self._skill_index.setdefault(skill, set()).add(mentor["id"])
+
+    def _unindex(self, mentor: dict):
+        del self._mentors[mentor["id"]]
+        for skill in mentor["skill_set"]:
+            mentor_ids = self._skill_index[skill]
+            mentor_ids.discard(mentor["id"])
+            if not mentor_ids:
+                del self._skill_index[skill]
+        for ordering, keys in self._orderings.items():
+            key = _mentor_sort_key(ordering, mentor)
+            del keys[bisect.bisect_left(keys, key)]
+
+    def load(self, conn, reload: bool = False):
+        # seq를 먼저 읽으므로 전체를 읽는 동안 커밋된 변경은 다음 sync()가 다시 반영한다
+        seq = current_mentor_change_seq(conn)
+        mentors = [self._build(row) for row in conn.execute(MENTOR_QUERY).fetchall()]
+        orderings = {
+            ordering: sorted(_mentor_sort_key(ordering, mentor) for mentor in mentors)
+            for ordering in MENTOR_ORDERINGS
+        }
+
+        with self._lock:
+            if self.loaded and not reload:
+                return
+            self._mentors = {}
+            self._skill_index = {}
+            for mentor in mentors:
+                self._index(mentor)
+            self._orderings = orderings
+            self.seq = seq
+            self._synced_at = time.monotonic()
+            self.loaded = True
+
+    def sync(self, conn):
+        """mentor_changes에 쌓인 변경을 반영 (아직 로드 전이면 아무것도 하지 않음)"""
+        if not self.loaded:
+            return
+        prune_mentor_changes(conn)
+        changes = fetch_mentor_changes(conn, self.seq)
+        if changes is None:
+            self.load(conn, reload=True)
+            return
+        seq, rows = changes
+        mentors = {
+            user_id: self._build(row) if row else None for user_id, row in rows.items()
+        }
+
+        with self._lock:
+            self._synced_at = time.monotonic()
+            # 그사이 더 최신 변경까지 반영한 sync()가 있었으면 이 결과는 버린다
+            if seq <= self.seq:
+                return
+            for user_id, mentor in mentors.items():
+                if user_id in self._mentors:
+                    self._unindex(self._mentors[user_id])
+                if mentor:
+                    self._index(mentor)
+                    for ordering, keys in self._orderings.items():
+                        bisect.insort(keys, _mentor_sort_key(ordering, mentor))
+            self.seq = seq
+            self.updates += len(mentors)
+
+    async def lookup(
+        self,
+        skills: List[str],
+        match_all: bool,
+        ordering: str,
+        after: Optional[tuple] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """정렬 키가 after보다 큰 멘토 레코드를 최대 limit개 반환"""
+        if not self.loaded:
+            self.misses += 1
+            await run_db(self.load)
+        else:
+            self.hits += 1
+            if time.monotonic() - self._synced_at >= MENTOR_CATALOG_SYNC_SECONDS:
+                # 동시에 들어온 조회가 모두 sync()를 예약하지 않도록 먼저 표시
+                self._synced_at = time.monotonic()
+                await run_db(self.sync)
+
+        with self._lock:
+            keys = self._orderings[ordering]
+            start = bisect.bisect_right(keys, after) if after else 0
+            mentor_ids = (key[-1] for key in itertools.islice(keys, start, None))
+
+            if skills:
+                matches = [self._skill_index.get(skill, set()) for skill in skills]
+                if match_all:
+                    selected = set.intersection(*matches)
+                else:
+                    selected = set().union(*matches)
+                mentor_ids = (mentor_id for mentor_id in mentor_ids if mentor_id in selected)
+
+            return [
+                self._mentors[mentor_id]
+                for mentor_id in itertools.islice(mentor_ids, limit)
+            ]
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "size": len(self._mentors),
+            "seq": self.seq,
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+        }
+
+
+mentor_catalog = MentorCatalog()
+
+
+def interest_terms(text: Optional[str]) -> dict:
+    """스킬/관심사 문자열 -> {용어: 가중치}
+
+    정규화한 항목 전체(가중치 1)와 여러 단어 항목의 각 단어(가중치 0.5)를 용어로 쓴다.
+    ("Python Programming" 관심사도 "Python" 스킬과 부분적으로 맞도록)
+    """
+    terms = {}
+    for phrase in parse_skills(text):
+        terms[phrase] = 1.0
+        words = phrase.split()
+        if len(words) > 1:
+            for word in words:
+                terms[word] = max(terms.get(word, 0.0), 0.5)
+    return terms
+
+
+def _tiebreak_key(mentor) -> int:
+    # 같은 점수면 평점, 그다음 경력 순 (점수 뒤 자릿수에 붙여 정수 하나로 비교)
+    rating = int(round((mentor["rating"] or 0.0) * 10))
+    experience = min(max(mentor["experience_years"] or 0, 0), 999)
+    return rating * 1000 + experience
+
+
+class MentorRecommender:
+    """멘티 관심사와 멘토 스킬의 TF-IDF 코사인 유사도로 멘토를 추천하는 희소 행렬 인덱스
+
+    처음 조회할 때 멘토 × 용어 CSR 행렬(base)을 만들고, 이후 sync()는 mentor_changes
+    로그에서 바뀐 멘토의 기존 행을 alive 마스크로 가린 뒤 새 행을 delta에 덧붙인다.
+    delta가 커지면 base로 합친다. IDF는 용어별 문서 빈도(df)를 증분 유지해 조회 시 계산한다.
+    DB 조회는 잠금 밖에서 하며, 점수 계산(recommend)은 이벤트 루프 밖 스레드에서 호출한다.
+    """
+
+    COMPACT_MIN_ROWS = 1024
+    COMPACT_RATIO = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.seq = 0  # 반영한 마지막 mentor_changes.seq
+        self._synced_at = 0.0
+        self._vocab = {}  # 용어 -> 열 번호
+        self._df = None
+        self._base = None
+        self._delta_rows = []  # (열 번호 배열, 가중치 배열)
+        self._delta = None  # delta_rows로 만든 CSR (변경 시 무효화)
+        self._row_of = {}  # user_id -> 행 번호
+        self._payloads = []
+        self._alive = None
+        self._tiebreak = None
+        self._rows = 0
+        self._base_squared = None  # base 원소 제곱 (노름 재계산용, 합칠 때만 바뀜)
+        self._norms = None  # 행별 TF-IDF 노름 (df가 바뀌면 무효화)
+
+    def _vectorize(self, text: Optional[str], grow: bool, vocab: Optional[dict] = None) -> tuple:
+        vocab = self._vocab if vocab is None else vocab
+        columns, weights = [], []
+        for term, weight in interest_terms(text).items():
+            column = vocab.get(term)
+            if column is None:
+                if not grow:
+                    continue
+                column = vocab[term] = len(vocab)
+            columns.append(column)
+            weights.append(weight)
+        return np.array(columns, dtype=np.int64), np.array(weights, dtype=np.float64)
+
+    def _ensure_capacity(self):
+        if len(self._vocab) > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(len(self._vocab) - len(self._df))])
+        if self._rows >= len(self._alive):
+            extra = max(1024, len(self._alive))
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+            self._tiebreak = np.concatenate([self._tiebreak, np.zeros(extra, dtype=np.int64)])
+
+    def load(self, conn, reload: bool = False):
+        # 카탈로그와 같이 seq를 먼저 읽고, 행렬은 잠금 밖에서 만든 뒤 교체만 잠금 안에서 한다
+        seq = current_mentor_change_seq(conn)
+        rows = conn.execute(MENTOR_QUERY).fetchall()
+        vocab = {}
+        vectors = [self._vectorize(row["skills"], grow=True, vocab=vocab) for row in rows]
+
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns, _ in vectors])
+        indices = np.concatenate([c for c, _ in vectors] or [np.zeros(0, np.int64)])
+        data = np.concatenate([w for _, w in vectors] or [np.zeros(0)])
+        base = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(vocab)))
+        df = np.bincount(indices, minlength=len(vocab)).astype(np.float64)
+        alive = np.ones(max(len(rows), 1), dtype=bool)
+        alive[len(rows) :] = False
+        tiebreak = np.zeros(len(alive), dtype=np.int64)
+        tiebreak[: len(rows)] = [_tiebreak_key(row) for row in rows]
+        payloads = [mentor_payload(row) for row in rows]
+        base_squared = base.multiply(base).tocsr()
+
+        with self._lock:
+            if self.loaded and not reload:
+                return
+            self._vocab = vocab
+            self._base = base
+            self._df = df
+            self._rows = len(rows)
+            self._row_of = {row["id"]: index for index, row in enumerate(rows)}
+            self._payloads = payloads
+            self._alive = alive
+            self._tiebreak = tiebreak
+            self._base_squared = base_squared
+            self._delta_rows = []
+            self._delta = None
+            self._norms = None
+            self.seq = seq
+            self._synced_at = time.monotonic()
+            self.loaded = True
+
+    def _row_columns(self, row: int) -> np.ndarray:
+        base_rows = self._base.shape[0]
+        if row < base_rows:
+            return self._base.indices[self._base.indptr[row] : self._base.indptr[row + 1]]
+        return self._delta_rows[row - base_rows][0]
+
+    def sync(self, conn):
+        """mentor_changes에 쌓인 변경을 반영 (아직 로드 전이면 아무것도 하지 않음)"""
+        if not self.loaded:
+            return
+        changes = fetch_mentor_changes(conn, self.seq)
+        if changes is None:
+            self.load(conn, reload=True)
+            return
+        seq, rows = changes
+
+        with self._lock:
+            self._synced_at = time.monotonic()
+            if seq <= self.seq:
+                return
+            for user_id, row in rows.items():
+                old = self._row_of.pop(user_id, None)
+                if old is not None:
+                    self._alive[old] = False
+                    self._df[self._row_columns(old)] -= 1
+                if row:
+                    columns, weights = self._vectorize(row["skills"], grow=True)
+                    self._ensure_capacity()
+                    self._delta_rows.append((columns, weights))
+                    self._df[columns] += 1
+                    self._alive[self._rows] = True
+                    self._tiebreak[self._rows] = _tiebreak_key(row)
+                    self._row_of[user_id] = self._rows
+                    self._payloads.append(mentor_payload(row))
+                    self._rows += 1
+            self.seq = seq
+            self._delta = None
+            self._norms = None
+            if len(self._delta_rows) > max(
+                self.COMPACT_MIN_ROWS, self.COMPACT_RATIO * self._base.shape[0]
+            ):
+                self._compact()
+
+    def _delta_matrix(self):
+        if self._delta is None:
+            lengths = [len(columns) for columns, _ in self._delta_rows]
+            indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum(lengths)
+            indices = np.concatenate([c for c, _ in self._delta_rows] or [np.zeros(0, np.int64)])
+            data = np.concatenate([w for _, w in self._delta_rows] or [np.zeros(0)])
+            self._delta = sparse.csr_matrix(
+                (data, indices, indptr), shape=(len(lengths), len(self._vocab))
+            )
+        return self._delta
+
+    def _compact(self):
+        """base와 delta를 합치고 가려진 행을 버린다"""
+        base = self._base
+        if base.shape[1] < len(self._vocab):
+            base = sparse.csr_matrix(
+                (base.data, base.indices, base.indptr), shape=(base.shape[0], len(self._vocab))
+            )
+        alive = np.flatnonzero(self._alive[: self._rows])
+        self._base = sparse.vstack([base, self._delta_matrix()], format="csr")[alive]
+        self._base_squared = self._base.multiply(self._base).tocsr()
+        remap = np.full(self._rows, -1, dtype=np.int64)
+        remap[alive] = np.arange(len(alive))
+        self._row_of = {user_id: int(remap[row]) for user_id, row in self._row_of.items()}
+        self._payloads = [self._payloads[row] for row in alive]
+        self._tiebreak = self._tiebreak[alive]
+        self._rows = len(alive)
+        self._alive = np.ones(max(self._rows, 1), dtype=bool)
+        self._alive[self._rows :] = False
+        self._tiebreak = np.concatenate(
+            [self._tiebreak, np.zeros(len(self._alive) - self._rows, dtype=np.int64)]
+        )
+        self._delta_rows = []
+        self._delta = None
+
+    def _matvec(self, vector: np.ndarray) -> np.ndarray:
+        base = self._base @ vector[: self._base.shape[1]]
+        if not self._delta_rows:
+            return base
+        return np.concatenate([base, self._delta_matrix() @ vector])
+
+    def recommend(self, interests: Optional[str], k: int) -> list:
+        """관심사와 가장 비슷한 멘토 k명의 (payload, 점수) 목록"""
+        with self._lock:
+            alive = self._alive[: self._rows]
+            k = min(k, int(alive.sum()))
+            if k == 0:
+                return []
+
+            idf = np.log((1 + len(self._row_of)) / (1 + self._df)) + 1
+            columns, weights = self._vectorize(interests, grow=False)
+            scores = np.zeros(self._rows)
+            if len(columns):
+                if self._norms is None:
+                    squared = self._base_squared
+                    norms = squared @ (idf[: squared.shape[1]] ** 2)
+                    if self._delta_rows:
+                        delta = self._delta_matrix()
+                        norms = np.concatenate([norms, delta.multiply(delta) @ idf**2])
+                    self._norms = np.sqrt(norms)
+                query = np.zeros(len(self._vocab))
+                query[columns] = weights * idf[columns] ** 2
+                # 코사인 유사도: 멘토 노름과 관심사 노름으로 나눈다
+                numerator = self._matvec(query) / np.linalg.norm(weights * idf[columns])
+                np.divide(numerator, self._norms, out=scores, where=self._norms > 0)
+
+            # 점수(소수 6자리) 뒤에 평점/경력 키를 붙여 정수 하나로 top-k 선택
+            keys = np.rint(scores * 1e6).astype(np.int64) * 1_000_000 + self._tiebreak[: self._rows]
+            keys[~alive] = -1
+            top = np.argpartition(-keys, k - 1)[:k]
+            top = top[np.argsort(-keys[top], kind="stable")]
+            return [(self._payloads[row], float(scores[row])) for row in top]
+
+    async def lookup(self, interests: Optional[str], k: int) -> list:
+        """필요하면 로드/동기화한 뒤 recommend()를 스레드에서 실행 (CPU 작업이 이벤트 루프를 막지 않도록)"""
+        if not self.loaded:
+            await run_db(self.load)
+        elif time.monotonic() - self._synced_at >= MENTOR_CATALOG_SYNC_SECONDS:
+            self._synced_at = time.monotonic()
+            await run_db(self.sync)
+        return await asyncio.to_thread(self.recommend, interests, k)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "seq": self.seq,
+            "mentors": len(self._row_of),
+            "terms": len(self._vocab),
+            "delta_rows": len(self._delta_rows),
         }
+
+
+mentor_recommender = MentorRecommender()
+
+
+def term_matrix(texts: list, vocab: dict):
+    """스킬/관심사 문자열 목록 -> 행별 interest_terms 가중치의 CSR 행렬 (vocab은 갱신됨)"""
+    indptr, indices, data = [0], [], []
+    for text in texts:
+        for term, weight in interest_terms(text).items():
+            indices.append(vocab.setdefault(term, len(vocab)))
+            data.append(weight)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), indptr),
+        shape=(len(texts), len(vocab)),
     )
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
 
+def cohort_edges(mentee_terms, mentor_terms, bonus, top_k: int, chunk: int = 2048, seed: int = 0):
+    """배정 후보 간선 (멘티 인덱스, 멘토 인덱스, 점수)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(
-            credentials.credentials,
-            SECRET_KEY,
-            algorithms=[ALGORITHM],
-            options={"verify_aud": False},  # audience 검증 비활성화
-        )
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user_id
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    점수 = 관심사-스킬 TF-IDF 코사인 유사도 + 멘토 보너스(평점/경력).
+    멘티별 상위 top_k 멘토와 멘토별 상위 top_k 멘티를 합친다. 멘티 쪽만 보면 인기 멘토에게
+    후보가 몰려 나머지 멘토의 정원을 쓸 수 없기 때문이다. 동점은 난수로 흩뜨려 고르고,
+    (chunk × 상대편) 밀집 블록만 만든다.
+    """
+    mentees, mentors = mentee_terms.shape[0], mentor_terms.shape[0]
+    vocab_size = max(mentee_terms.shape[1], mentor_terms.shape[1])
+    mentee_terms = sparse.csr_matrix(mentee_terms, shape=(mentees, vocab_size))
+    mentor_terms = sparse.csr_matrix(mentor_terms, shape=(mentors, vocab_size))
+
+    df = np.bincount(mentor_terms.indices, minlength=vocab_size)
+    idf = (np.log((1 + mentors) / (1 + df)) + 1).astype(np.float32)
+
+    def normalized(matrix):
+        weighted = matrix @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return (sparse.diags(1 / norms) @ weighted).astype(np.float32).tocsr()
+
+    mentee_weighted = normalized(mentee_terms)
+    mentor_weighted = normalized(mentor_terms)
+    bonus = np.asarray(bonus, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    def top_of(block, k):
+        # 동점 분산용 난수: 한 벡터를 행마다 한 칸씩 밀어 쓰므로 (복사 없는 view)
+        # 같은 점수의 행들도 서로 다른 열을 고른다
+        height, width = block.shape
+        noise = rng.random(height + width, dtype=np.float32) * 1e-6
+        jittered = block + np.lib.stride_tricks.sliding_window_view(noise, width)[:height]
+        top = np.argpartition(np.negative(jittered, out=jittered), k - 1, axis=1)[:, :k]
+        return top, np.take_along_axis(block, top, axis=1)
+
+    rows, cols, values = [], [], []
+    k = min(top_k, mentors)
+    mentor_dense = mentor_weighted.T.toarray()  # 용어 × 멘토
+    for start in range(0, mentees, chunk):
+        block = np.asarray(mentee_weighted[start : start + chunk] @ mentor_dense)
+        block += bonus
+        top, value = top_of(block, k)
+        rows.append(np.repeat(np.arange(start, start + len(block)), k))
+        cols.append(top.ravel())
+        values.append(value.ravel())
+
+    k = min(top_k, mentees)
+    mentee_dense = mentee_weighted.T.toarray()  # 용어 × 멘티
+    for start in range(0, mentors, chunk):
+        block = np.asarray(mentor_weighted[start : start + chunk] @ mentee_dense)
+        block += bonus[start : start + chunk, None]
+        top, value = top_of(block, k)
+        rows.append(top.ravel())
+        cols.append(np.repeat(np.arange(start, start + len(block)), k))
+        values.append(value.ravel())
+
+    rows, cols, values = (np.concatenate(part) for part in (rows, cols, values))
+    _, first = np.unique(rows.astype(np.int64) * mentors + cols, return_index=True)
+    return rows[first], cols[first], values[first]
+
+
+def assign_cohort(mentees: int, rows, cols, values, capacity):
+    """정원이 있는 최대 점수 배정을 희소 그래프 최소 비용 완전 매칭으로 푼다
+
+    멘토를 정원 수만큼 슬롯으로 펼치고, 슬롯마다 점수 0의 가상 멘티를 하나씩 붙여
+    모든 슬롯이 매칭되게 만든다 (가상 멘티와 매칭 = 빈 자리). 비용 = 상수 - 점수 이므로
+    총 비용 최소 = 총 점수 최대. 결과는 멘티별 멘토 인덱스 (-1 = 미배정).
+    """
+    capacity = np.asarray(capacity, dtype=np.int64)
+    assigned = np.full(mentees, -1, dtype=np.int64)
+    positive = values > 0
+    rows, cols, values = rows[positive], cols[positive].astype(np.int64), values[positive]
+    slots = int(capacity.sum())
+    if not slots or not len(rows):
+        return assigned
+
+    slot_start = np.cumsum(capacity) - capacity
+    repeats = capacity[cols]
+    offset = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    slot_cols = np.repeat(slot_start[cols], repeats) + offset
+    cost = float(values.max()) + 1
+    graph = sparse.csr_matrix(
+        (
+            np.concatenate([cost - np.repeat(values.astype(np.float64), repeats), np.full(slots, cost)]),
+            (
+                np.concatenate([np.repeat(rows, repeats), mentees + np.arange(slots)]),
+                np.concatenate([slot_cols, np.arange(slots)]),
+            ),
+        ),
+        shape=(mentees + slots, slots),
+    )
+    matched_rows, matched_slots = min_weight_full_bipartite_matching(graph)
+    real = matched_rows < mentees
+    assigned[matched_rows[real]] = np.repeat(np.arange(len(capacity)), capacity)[matched_slots[real]]
+    return assigned
 
 
-def get_db():
-    conn = sqlite3.connect("mentor_mentee.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+def insert_cohort_requests(conn, pairs: list) -> int:
+    """배정된 (멘토 id, 멘티 id) 쌍으로 pending 요청을 만들고 만든 개수를 반환
+
+    배정 계산은 잠금 없이 오래 걸리므로, 쓰기 잠금(BEGIN IMMEDIATE)을 잡은 뒤 남은 정원과
+    멘티의 진행 중 요청을 다시 읽는다. 그사이 정원이 찬 멘토나 직접 요청을 만든 멘티의 쌍은 건너뛴다.
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(
+        """
+        SELECT m.id, m.capacity - COUNT(mr.id) AS remaining
+        FROM mentors m
+        LEFT JOIN match_requests mr
+            ON mr.mentor_id = m.id AND mr.status IN ('pending', 'accepted')
+        WHERE m.id IN (SELECT value FROM json_each(?))
+        GROUP BY m.id
+    """,
+        (json.dumps(sorted({mentor_id for mentor_id, _ in pairs})),),
+    )
+    remaining = {row["id"]: row["remaining"] for row in cursor.fetchall()}
+    cursor.execute(
+        """
+        SELECT DISTINCT mentee_id FROM match_requests
+        WHERE mentee_id IN (SELECT value FROM json_each(?))
+          AND status IN ('pending', 'accepted')
+    """,
+        (json.dumps([mentee_id for _, mentee_id in pairs]),),
+    )
+    busy = {row["mentee_id"] for row in cursor.fetchall()}
+
+    rows = []
+    for mentor_id, mentee_id in pairs:
+        if mentee_id in busy or remaining.get(mentor_id, 0) <= 0:
+            continue
+        remaining[mentor_id] -= 1
+        rows.append((mentor_id, mentee_id, "코호트 자동 매칭"))
+    cursor.executemany(
+        """
+        INSERT INTO match_requests (mentor_id, mentee_id, message)
+        VALUES (?, ?, ?)
+    """,
+        rows,
+    )
+    conn.commit()
+    return len(rows)
+
+
+def load_cohort_inputs(conn) -> tuple:
+    """정원이 남은 멘토와 진행 중 요청이 없는 멘티 -> (멘토 행 목록, 멘티 행 목록)"""
+    mentors = conn.execute(
+        """
+        SELECT m.id, m.skills, m.experience_years, m.rating,
+               m.capacity - COUNT(mr.id) AS remaining
+        FROM mentors m
+        LEFT JOIN match_requests mr
+            ON mr.mentor_id = m.id AND mr.status IN ('pending', 'accepted')
+        GROUP BY m.id
+        HAVING remaining > 0
+    """
+    ).fetchall()
+    mentees = conn.execute(
+        """
+        SELECT me.id, me.interests
+        FROM mentees me
+        WHERE NOT EXISTS (
+            SELECT 1 FROM match_requests mr
+            WHERE mr.mentee_id = me.id AND mr.status IN ('pending', 'accepted')
+        )
+    """
+    ).fetchall()
+    return mentors, mentees
+
+
+def solve_cohort(mentors: list, mentees: list, top_k: int = COHORT_TOP_K) -> tuple:
+    """배정을 계산한다 (DB를 쓰지 않음) -> (요약, 배정된 (멘토 id, 멘티 id) 목록)"""
+    summary = {
+        "mentees": len(mentees),
+        "mentors": len(mentors),
+        "capacity": sum(row["remaining"] for row in mentors),
+        "assigned": 0,
+        "inserted": 0,
+        "average_score": 0.0,
+    }
+    if not mentors or not mentees:
+        return summary, []
+
+    vocab = {}
+    mentor_terms = term_matrix([row["skills"] for row in mentors], vocab)
+    mentee_terms = term_matrix([row["interests"] for row in mentees], vocab)
+    # 유사도가 같으면 평점/경력이 높은 멘토를 약간 더 선호
+    bonus = np.array(
+        [
+            0.1 * (row["rating"] or 0) / 5 + 0.05 * min(row["experience_years"] or 0, 20) / 20
+            for row in mentors
+        ],
+        dtype=np.float32,
+    )
+    rows, cols, values = cohort_edges(mentee_terms, mentor_terms, bonus, top_k)
+    assigned = assign_cohort(len(mentees), rows, cols, values, [row["remaining"] for row in mentors])
+
+    matched = np.flatnonzero(assigned >= 0)
+    summary["assigned"] = int(len(matched))
+    if len(matched):
+        # 간선은 (멘티, 멘토) 순으로 정렬되어 있다
+        keys = rows.astype(np.int64) * len(mentors) + cols
+        scores = values[np.searchsorted(keys, matched * len(mentors) + assigned[matched])]
+        summary["average_score"] = round(float(scores.mean()), 4)
+    return summary, [(mentors[assigned[i]]["id"], mentees[i]["id"]) for i in matched]
+
+
+def run_cohort_match(conn, top_k: int = COHORT_TOP_K, dry_run: bool = False) -> dict:
+    """매칭되지 않은 멘티 전원을 남은 정원이 있는 멘토에게 배정하고 pending 요청을 일괄 생성"""
+    started = time.perf_counter()
+    summary, pairs = solve_cohort(*load_cohort_inputs(conn), top_k)
+    if not dry_run and pairs:
+        summary["inserted"] = insert_cohort_requests(conn, pairs)
+    summary["dry_run"] = dry_run
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+class EventSubscription:
+    """구독자 한 명의 이벤트 큐 (가득 차면 가장 오래된 이벤트를 버린다)"""
+
+    def __init__(self, size: int):
+        self.events = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event: tuple):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self.ready.set()
+
+    async def next_batch(self, timeout: float) -> list:
+        """쌓인 이벤트를 모두 꺼낸다. timeout 동안 없으면 빈 목록 (하트비트 시점)"""
+        if not self.events:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.ready.clear()
+        batch = list(self.events)
+        self.events.clear()
+        return batch
+
+
+class EventBus:
+    """사용자 id별 매칭 요청 이벤트 팬아웃 (프로세스 내부)
+
+    발행은 이벤트 루프에서만 하므로 잠금이 필요 없다. 최근 이벤트를 이력으로 남겨
+    재연결한 클라이언트가 Last-Event-ID 이후 놓친 이벤트를 받게 한다. 이벤트 id는
+    재시작 후에도 줄어들지 않도록 기동 시각(ms)에서 시작한다.
+    """
+
+    def __init__(self, queue_size: int, history_size: int):
+        self.queue_size = queue_size
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._history = deque(maxlen=history_size)  # (event_id, user_ids, event)
+        # 이 id까지의 이벤트는 이력에 없다 (기동 전 또는 이력에서 밀려남)
+        self._floor = next(self._ids)
+        self._subscribers = {}  # user_id -> {EventSubscription}
+        self.published = 0
+
+    def publish(self, user_ids, event_type: str, data: dict):
+        event = (next(self._ids), event_type, json.dumps(data, ensure_ascii=False))
+        user_ids = frozenset(user_id for user_id in user_ids if user_id is not None)
+        if len(self._history) == self._history.maxlen:
+            self._floor = self._history[0][0]
+        self._history.append((event[0], user_ids, event))
+        self.published += 1
+        for user_id in user_ids:
+            for subscription in self._subscribers.get(user_id, ()):
+                subscription.push(event)
+
+    def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> EventSubscription:
+        subscription = EventSubscription(self.queue_size)
+        if last_event_id is not None:
+            missed = [
+                event
+                for event_id, user_ids, event in self._history
+                if event_id > last_event_id and user_id in user_ids
+            ]
+            if last_event_id < self._floor or len(missed) > self.queue_size:
+                # 놓친 이벤트가 이력에 없거나 큐에 다 담기지 않으면 목록 전체를 다시 불러오라고 알린다
+                subscription.push((missed[-1][0] if missed else self._floor, "resync", "{}"))
+            else:
+                for event in missed:
+                    subscription.push(event)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: int, subscription: EventSubscription):
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def stats(self) -> dict:
+        subscriptions = [s for group in self._subscribers.values() for s in group]
+        return {
+            "published": self.published,
+            "subscribers": len(subscriptions),
+            "users": len(self._subscribers),
+            "queued": sum(len(s.events) for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+            "history": len(self._history),
+        }
+
+
+event_bus = EventBus(EVENT_QUEUE_SIZE, EVENT_HISTORY_SIZE)
+
+
+def publish_request_changes(changes: list):
+    """transition_request(s)가 돌려준 변경 행마다 양쪽 사용자에게 이벤트 발행"""
+    for change in changes:
+        event_bus.publish(
+            (change["mentor_user_id"], change["mentee_user_id"]),
+            f"match_request.{change['status']}",
+            request_response(change),
+        )
 
 
 # API 엔드포인트들
 @app.on_event("startup")
 async def startup_event():
+    # 해시 워커 풀을 다른 스레드 풀보다 먼저 만든다
+    start_password_hasher()
     init_db()
+    open_db_pool()
+    start_db_executor()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_image_executor()
+    stop_password_hasher()
+    stop_db_executor()
+    close_db_pool()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -275,85 +3154,199 @@ async def root():
 
 @app.post("/api/signup", status_code=201)
 async def signup(user: UserCreate):
-    conn = get_db()
-    cursor = conn.cursor()
+    password_hash = await hash_password_async(user.password)
 
-    # 이메일 중복 확인
-    cursor.execute("SELECT id FROM users WHERE email = ?", (user.email,))
-    if cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Email already registered")
+    def create_user(conn):
+        cursor = conn.cursor()
 
-    # 사용자 생성
-    password_hash = hash_password(user.password)
-    cursor.execute(
-        "INSERT INTO users (email, password_hash, name, role) VALUES (?, ?, ?, ?)",
-        (user.email, password_hash, user.name, user.role),
-    )
-    user_id = cursor.lastrowid
+        # 이메일 중복 확인
+        cursor.execute("SELECT id FROM users WHERE email = ?", (user.email,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Email already registered")
 
-    # 역할별 프로필 생성
-    if user.role == "mentor":
-        cursor.execute("INSERT INTO mentors (user_id) VALUES (?)", (user_id,))
-    else:
-        cursor.execute("INSERT INTO mentees (user_id) VALUES (?)", (user_id,))
+        # 사용자 생성
+        cursor.execute(
+            "INSERT INTO users (email, password_hash, name, role) VALUES (?, ?, ?, ?)",
+            (user.email, password_hash, user.name, user.role),
+        )
+        user_id = cursor.lastrowid
 
-    conn.commit()
-    conn.close()
+        # 역할별 프로필 생성
+        if user.role == "mentor":
+            cursor.execute("INSERT INTO mentors (user_id) VALUES (?)", (user_id,))
+        else:
+            cursor.execute("INSERT INTO mentees (user_id) VALUES (?)", (user_id,))
+
+        conn.commit()
+
+        if user.role == "mentor":
+            mentor_catalog.sync(conn)
+            if np is not None:
+                mentor_recommender.sync(conn)
+
+    await run_db(create_user)
 
     return {"message": "User created successfully"}
 
 
 @app.post("/api/login")
 async def login(user: UserLogin):
-    conn = get_db()
-    cursor = conn.cursor()
+    def fetch_user(conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT u.id, u.email, u.password_hash, u.name, u.role,
+                   m.id AS mentor_id, me.id AS mentee_id
+            FROM users u
+            LEFT JOIN mentors m ON u.id = m.user_id
+            LEFT JOIN mentees me ON u.id = me.user_id
+            WHERE u.email = ?
+        """,
+            (user.email,),
+        )
+        return cursor.fetchone()
+
+    # 슬롯을 조회 전에 잡고, 없는 이메일도 더미 해시로 같은 검증을 돌린다.
+    # 응답 시간이나 503 여부로 가입된 이메일을 가려낼 수 없게 하기 위함
+    async with password_hash_slot():
+        db_user = await run_db(fetch_user)
+        stored_hash = db_user["password_hash"] if db_user else _dummy_password_hash
+        valid = await hash_in_executor(verify_password, user.password, stored_hash)
+        if not db_user or not valid:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        # 레거시 SHA-256 또는 이전 비용의 해시는 로그인 성공 시 새 설정으로 교체
+        new_hash = None
+        if password_needs_rehash(db_user["password_hash"]):
+            new_hash = await hash_in_executor(
+                hash_password, user.password, PASSWORD_HASH_N, PASSWORD_HASH_R, PASSWORD_HASH_P
+            )
+
+    def issue_tokens(conn):
+        cursor = conn.cursor()
+        if new_hash is not None:
+            cursor.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                (new_hash, db_user["id"], db_user["password_hash"]),
+            )
+        refresh_token = issue_refresh_token(cursor, db_user["id"])
+        return create_access_token(access_token_claims(db_user)), refresh_token
+
+    access_token, refresh_token = await run_db(issue_tokens)
+
+    return {"token": access_token, "refresh_token": refresh_token}
+
+
+@app.post("/api/token/refresh")
+async def refresh_access_token(body: TokenRefresh):
+    token_id, token_hash = split_refresh_token(body.refresh_token)
+
+    def rotate(conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT rt.family_id, rt.token_hash, rt.revoked_at,
+                   rt.expires_at > CURRENT_TIMESTAMP AS active,
+                   u.id, u.email, u.name, u.role,
+                   m.id AS mentor_id, me.id AS mentee_id
+            FROM refresh_tokens rt
+            JOIN users u ON u.id = rt.user_id
+            LEFT JOIN mentors m ON u.id = m.user_id
+            LEFT JOIN mentees me ON u.id = me.user_id
+            WHERE rt.id = ?
+        """,
+            (token_id,),
+        )
+        row = cursor.fetchone()
+        if not row or not secrets.compare_digest(row["token_hash"], token_hash):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        if not row["active"]:
+            raise HTTPException(status_code=401, detail="Refresh token expired")
+
+        # 조건부 UPDATE로 회전: 동시에 같은 토큰을 써도 한 요청만 성공한다
+        new_token = issue_refresh_token(cursor, row["id"], row["family_id"])
+        cursor.execute(
+            """
+            UPDATE refresh_tokens
+            SET revoked_at = CURRENT_TIMESTAMP, replaced_by = ?
+            WHERE id = ? AND revoked_at IS NULL
+        """,
+            (new_token.partition(".")[0], token_id),
+        )
+        if cursor.rowcount == 0:
+            # 이미 회전된 토큰의 재사용 -> 유출로 보고 family 전체를 폐기
+            conn.rollback()
+            cursor.execute(
+                """
+                UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                WHERE family_id = ? AND revoked_at IS NULL
+            """,
+                (row["family_id"],),
+            )
+            conn.commit()
+            logger.warning("refresh token reuse detected for user %s", row["id"])
+            raise HTTPException(status_code=401, detail="Refresh token reused")
+
+        return create_access_token(access_token_claims(row)), new_token
+
+    access_token, refresh_token = await run_db(rotate)
+
+    return {"token": access_token, "refresh_token": refresh_token}
 
-    cursor.execute(
-        "SELECT id, password_hash, name, role FROM users WHERE email = ?", (user.email,)
-    )
-    db_user = cursor.fetchone()
 
-    if not db_user or not verify_password(user.password, db_user["password_hash"]):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+@app.post("/api/logout")
+async def logout(
+    body: Optional[TokenRefresh] = None, principal: Principal = Depends(verify_token)
+):
+    # 토큰은 만료 전까지 유효하므로 jti를 폐기 목록에 올려 둔다 (다른 워커도 DB에서 읽어 간다)
+    if principal.jti is not None:
+        await run_db(token_cache.revoke, principal.jti, principal.exp)
+
+    if body is not None:
+        token_id, _ = split_refresh_token(body.refresh_token)
+
+        def revoke_family(conn):
+            conn.execute(
+                """
+                UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                WHERE family_id = (
+                    SELECT family_id FROM refresh_tokens WHERE id = ? AND user_id = ?
+                ) AND revoked_at IS NULL
+            """,
+                (token_id, principal.user_id),
+            )
 
-    access_token = create_access_token(
-        {
-            "user_id": db_user["id"],
-            "email": user.email,
-            "name": db_user["name"],
-            "role": db_user["role"],
-        }
-    )
+        await run_db(revoke_family)
 
-    conn.close()
-    return {"token": access_token}
+    return {"message": "Logged out"}
 
 
 @app.get("/api/me")
-async def get_current_user(current_user_id: int = Depends(verify_token)):
-    conn = get_db()
-    cursor = conn.cursor()
+async def get_current_user(principal: Principal = Depends(verify_token)):
+    def fetch_user(conn):
+        cursor = conn.cursor()
 
-    cursor.execute(
-        """
-        SELECT u.id, u.email, u.name, u.role, u.bio, u.profile_image,
-               m.skills, m.experience_years, m.rating,
-               me.interests, me.goals
-        FROM users u
-        LEFT JOIN mentors m ON u.id = m.user_id
-        LEFT JOIN mentees me ON u.id = me.user_id
-        WHERE u.id = ?
-    """,
-        (current_user_id,),
-    )
+        cursor.execute(
+            """
+            SELECT u.id, u.email, u.name, u.role, u.bio, u.profile_image_digest,
+                   m.skills, m.experience_years, m.rating, m.capacity,
+                   me.interests, me.goals
+            FROM users u
+            LEFT JOIN mentors m ON u.id = m.user_id
+            LEFT JOIN mentees me ON u.id = me.user_id
+            WHERE u.id = ?
+        """,
+            (principal.user_id,),
+        )
 
-    user = cursor.fetchone()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        user = cursor.fetchone()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
 
-    conn.close()
+    user = await run_db(fetch_user)
 
-    profile_image_url = f"/images/{user['role']}/{user['id']}"
+    image_url = profile_image_url(user["role"], user["id"], user["profile_image_digest"])
 
     if user["role"] == "mentor":
         return {
@@ -363,8 +3356,9 @@ async def get_current_user(current_user_id: int = Depends(verify_token)):
             "profile": {
                 "name": user["name"],
                 "bio": user["bio"],
-                "imageUrl": profile_image_url,
+                "imageUrl": image_url,
                 "skills": user["skills"].split(",") if user["skills"] else [],
+                "capacity": user["capacity"],
             },
         }
     else:
@@ -375,7 +3369,7 @@ async def get_current_user(current_user_id: int = Depends(verify_token)):
             "profile": {
                 "name": user["name"],
                 "bio": user["bio"],
-                "imageUrl": profile_image_url,
+                "imageUrl": image_url,
             },
         }
 
@@ -383,107 +3377,198 @@ async def get_current_user(current_user_id: int = Depends(verify_token)):
 @app.get("/api/mentors")
 async def get_mentors(
     skill: Optional[str] = None,
+    skill_match: str = "any",
     order_by: Optional[str] = None,
-    current_user_id: int = Depends(verify_token),
+    page: Page = Depends(),
+    principal: Principal = Depends(verify_token),
 ):
-    conn = get_db()
-    cursor = conn.cursor()
+    if skill_match not in ("any", "all"):
+        raise HTTPException(status_code=400, detail="Invalid skill_match")
+
+    skills = parse_skills(skill)
+    match_all = skill_match == "all"
+    ordering = order_by if order_by in MENTOR_ORDERINGS else "id"
+    after = page.after(f"mentors:{ordering}", MENTOR_CURSOR_TYPES[ordering])
+    limit = None if page.legacy else page.limit + 1
+    ensure_mentee(principal)
+
+    def fetch_mentors(conn):
+        return [
+            {**mentor, "payload": mentor_payload(mentor)}
+            for mentor in query_mentors(
+                conn.cursor(), skills, match_all, ordering, after, limit
+            )
+        ]
 
-    # 멘티 권한 확인
-    cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-    user = cursor.fetchone()
-    if not user or user["role"] != "mentee":
-        raise HTTPException(
-            status_code=401, detail="Only mentees can access mentor list"
-        )
+    if MENTOR_CATALOG_ENABLED:
+        mentors = await mentor_catalog.lookup(skills, match_all, ordering, after, limit)
+    else:
+        mentors = await run_db(fetch_mentors)
 
-    query = """
-        SELECT u.id, u.name, u.email, u.bio, m.skills, m.experience_years, m.rating
-        FROM users u
-        JOIN mentors m ON u.id = m.user_id
-        WHERE u.role = 'mentor'
-    """
-    params = []
+    mentors, next_cursor = page.split(
+        mentors,
+        lambda mentor: (f"mentors:{ordering}", _mentor_sort_key(ordering, mentor)),
+    )
+    return page.wrap([mentor["payload"] for mentor in mentors], next_cursor)
 
-    if skill:
-        query += " AND m.skills LIKE ?"
-        params.append(f"%{skill}%")
 
-    if order_by == "skill":
-        query += " ORDER BY m.skills ASC"
-    elif order_by == "name":
-        query += " ORDER BY u.name ASC"
-    else:
-        query += " ORDER BY u.id ASC"
+@app.get("/api/mentors/search")
+async def search_mentors(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_LIMIT),
+    principal: Principal = Depends(verify_token),
+):
+    ensure_mentee(principal)
+    match_query = build_search_query(q)
+    if not match_query:
+        raise HTTPException(status_code=400, detail="Invalid search query")
 
-    cursor.execute(query, params)
-    mentors = cursor.fetchall()
+    def search(conn):
+        cursor = conn.cursor()
+
+        # 순위(BM25, 이름 > 스킬 > 소개 가중치)와 스니펫 모두 FTS 색인 안에서 계산
+        cursor.execute(
+            """
+            SELECT u.id, u.name, u.email, u.bio, u.profile_image_digest, m.skills,
+                   bm25(mentor_search, 10.0, 1.0, 5.0) AS rank,
+                   snippet(mentor_search, -1, '<mark>', '</mark>', '…', 12) AS snippet
+            FROM mentor_search
+            JOIN users u ON u.id = mentor_search.rowid
+            JOIN mentors m ON u.id = m.user_id
+            WHERE mentor_search MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """,
+            (match_query, limit),
+        )
+        return cursor.fetchall()
 
-    conn.close()
+    mentors = await run_db(search)
 
     return [
         {
-            "id": mentor["id"],
-            "email": mentor["email"],
-            "role": "mentor",
-            "profile": {
-                "name": mentor["name"],
-                "bio": mentor["bio"],
-                "imageUrl": f"/images/mentor/{mentor['id']}",
-                "skills": mentor["skills"].split(",") if mentor["skills"] else [],
-            },
+            **mentor_payload(mentor),
+            "score": round(-mentor["rank"], 4),
+            "snippet": mentor["snippet"],
         }
         for mentor in mentors
     ]
 
 
+@app.get("/api/mentors/recommended")
+async def recommend_mentors(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_LIMIT),
+    interests: Optional[str] = Query(None, max_length=500),
+    principal: Principal = Depends(verify_token),
+):
+    ensure_mentee(principal)
+    if np is None:
+        raise HTTPException(status_code=503, detail="Recommendations are unavailable")
+
+    # 관심사를 직접 넘기지 않으면 멘티 프로필의 관심사 사용
+    if interests is None:
+
+        def fetch_interests(conn):
+            row = conn.execute(
+                "SELECT interests FROM mentees WHERE id = ?", (principal.mentee_id,)
+            ).fetchone()
+            return row["interests"] if row else None
+
+        interests = await run_db(fetch_interests)
+
+    return [
+        {**payload, "score": round(score, 4)}
+        for payload, score in await mentor_recommender.lookup(interests, limit)
+    ]
+
+
+@app.get("/api/admin/cache-stats")
+async def get_cache_stats(_: None = Depends(verify_admin)):
+    return {
+        "mentor_catalog": mentor_catalog.stats(),
+        "mentor_recommender": mentor_recommender.stats(),
+        "event_bus": event_bus.stats(),
+    }
+
+
+@app.get("/api/admin/slow-queries")
+async def get_slow_queries(_: None = Depends(verify_admin)):
+    return {
+        "enabled": SQL_TRACE_ENABLED,
+        "threshold_ms": SLOW_QUERY_MS,
+        "full_scan_statements": slow_query_log.scans(),
+        "queries": slow_query_log.recent(),
+    }
+
+
+@app.post("/api/admin/cohort-match")
+async def cohort_match(
+    dry_run: bool = False,
+    top_k: int = Query(COHORT_TOP_K, ge=1, le=256),
+    _: None = Depends(verify_admin),
+):
+    if np is None:
+        raise HTTPException(status_code=503, detail="Cohort matching unavailable")
+    # 배정 계산(수 초)은 DB 커넥션/세마포어를 잡지 않도록 일반 스레드에서 돌린다
+    started = time.perf_counter()
+    mentors, mentees = await run_db(load_cohort_inputs)
+    summary, pairs = await asyncio.to_thread(solve_cohort, mentors, mentees, top_k)
+    if not dry_run and pairs:
+        summary["inserted"] = await run_db(insert_cohort_requests, pairs)
+    summary["dry_run"] = dry_run
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
 @app.post("/api/match-requests")
 async def create_match_request(
-    request: MatchRequestCreate, current_user_id: int = Depends(verify_token)
+    request: MatchRequestCreate, principal: Principal = Depends(verify_token)
 ):
-    conn = get_db()
-    cursor = conn.cursor()
-
     # 멘티 확인
-    cursor.execute("SELECT id FROM mentees WHERE user_id = ?", (current_user_id,))
-    mentee = cursor.fetchone()
-    if not mentee:
+    if principal.mentee_id is None:
         raise HTTPException(status_code=401, detail="Only mentees can create requests")
 
-    # 중복 요청 확인 (pending 상태인 요청이 있는지 확인)
-    cursor.execute(
-        """
-        SELECT id FROM match_requests 
-        WHERE mentee_id = ? AND status = 'pending'
-    """,
-        (mentee["id"],),
-    )
-    if cursor.fetchone():
-        raise HTTPException(
-            status_code=400, detail="You already have a pending request"
-        )
+    def insert_request(conn):
+        cursor = conn.cursor()
 
-    # 멘토 확인
-    cursor.execute("SELECT id FROM mentors WHERE user_id = ?", (request.mentorId,))
-    mentor = cursor.fetchone()
-    if not mentor:
-        raise HTTPException(status_code=400, detail="Mentor not found")
+        # 멘토 확인
+        cursor.execute("SELECT id FROM mentors WHERE user_id = ?", (request.mentorId,))
+        mentor = cursor.fetchone()
+        if not mentor:
+            raise HTTPException(status_code=400, detail="Mentor not found")
 
-    # 요청 생성
-    cursor.execute(
-        """
-        INSERT INTO match_requests (mentor_id, mentee_id, message)
-        VALUES (?, ?, ?)
-    """,
-        (mentor["id"], mentee["id"], request.message),
-    )
+        # 요청 생성 (pending 요청 중복은 ux_match_requests_pending_mentee 인덱스가 막는다)
+        try:
+            cursor.execute(
+                """
+                INSERT INTO match_requests (mentor_id, mentee_id, message)
+                VALUES (?, ?, ?)
+            """,
+                (mentor["id"], principal.mentee_id, request.message),
+            )
+        except sqlite3.IntegrityError:
+            raise HTTPException(
+                status_code=400, detail="You already have a pending request"
+            )
 
-    request_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+        cursor.execute(
+            f"SELECT {REQUEST_CHANGE_COLUMNS} FROM match_requests WHERE id = ?",
+            (cursor.lastrowid,),
+        )
+        row = cursor.fetchone()
+        conn.commit()
+        return row
+
+    row = await run_db(insert_request)
 
+    # 이벤트는 상태 변경 이벤트와 같은 스키마 (저장된 mentors.id / mentees.id)
+    event_bus.publish(
+        (row["mentor_user_id"], row["mentee_user_id"]),
+        "match_request.created",
+        request_response(row),
+    )
     return {
-        "id": request_id,
+        "id": row["id"],
         "mentorId": request.mentorId,
         "menteeId": request.menteeId,
         "message": request.message,
@@ -493,397 +3578,651 @@ async def create_match_request(
 
 @app.get("/api/match-requests/received/{user_id}")
 async def get_received_requests(
-    user_id: int, current_user_id: int = Depends(verify_token)
+    user_id: int,
+    page: RequestPage = Depends(),
+    principal: Principal = Depends(verify_token),
 ):
-    if current_user_id != user_id:
+    if principal.user_id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    conn = get_db()
-    cursor = conn.cursor()
+    def fetch_requests(conn):
+        cursor = conn.cursor()
+
+        return fetch_request_rows(
+            cursor,
+            f"""
+            SELECT mr.id, mr.message, mr.status, mr.created_at,
+                   mu.name as mentee_name, mu.email as mentee_email,
+                   me.interests
+            FROM match_requests mr {page.table_hint}
+            JOIN mentors m ON mr.mentor_id = m.id
+            JOIN mentees me ON mr.mentee_id = me.id
+            JOIN users mu ON me.user_id = mu.id
+            WHERE m.user_id = ?
+        """,
+            [user_id],
+            page,
+            ("mentor_id", principal.mentor_id),
+        )
 
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, mr.status, mr.created_at,
-               mu.name as mentee_name, mu.email as mentee_email,
-               me.interests
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN mentees me ON mr.mentee_id = me.id
-        JOIN users mu ON me.user_id = mu.id
-        WHERE m.user_id = ?
-        ORDER BY mr.created_at DESC
-    """,
-        (user_id,),
+    requests = await run_db(fetch_requests)
+    requests, next_cursor = page.split(requests, page.cursor_key)
+
+    return page.wrap(
+        [
+            {
+                "id": req["id"],
+                "message": req["message"],
+                "status": req["status"],
+                "created_at": req["created_at"],
+                "mentee": {
+                    "user": {"name": req["mentee_name"], "email": req["mentee_email"]},
+                    "interests": req["interests"],
+                },
+            }
+            for req in requests
+        ],
+        next_cursor,
     )
 
-    requests = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": req["id"],
-            "message": req["message"],
-            "status": req["status"],
-            "created_at": req["created_at"],
-            "mentee": {
-                "user": {"name": req["mentee_name"], "email": req["mentee_email"]},
-                "interests": req["interests"],
-            },
-        }
-        for req in requests
-    ]
-
 
 @app.get("/api/match-requests/sent/{user_id}")
-async def get_sent_requests(user_id: int, current_user_id: int = Depends(verify_token)):
-    if current_user_id != user_id:
+async def get_sent_requests(
+    user_id: int,
+    page: RequestPage = Depends(),
+    principal: Principal = Depends(verify_token),
+):
+    if principal.user_id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    conn = get_db()
-    cursor = conn.cursor()
+    def fetch_requests(conn):
+        cursor = conn.cursor()
+
+        return fetch_request_rows(
+            cursor,
+            f"""
+            SELECT mr.id, mr.message, mr.status, mr.created_at,
+                   mu.name as mentor_name, mu.email as mentor_email,
+                   m.skills, m.experience_years
+            FROM match_requests mr {page.table_hint}
+            JOIN mentees me ON mr.mentee_id = me.id
+            JOIN mentors m ON mr.mentor_id = m.id
+            JOIN users mu ON m.user_id = mu.id
+            WHERE me.user_id = ?
+        """,
+            [user_id],
+            page,
+            ("mentee_id", principal.mentee_id),
+        )
 
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, mr.status, mr.created_at,
-               mu.name as mentor_name, mu.email as mentor_email,
-               m.skills, m.experience_years
-        FROM match_requests mr
-        JOIN mentees me ON mr.mentee_id = me.id
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN users mu ON m.user_id = mu.id
-        WHERE me.user_id = ?
-        ORDER BY mr.created_at DESC
-    """,
-        (user_id,),
+    requests = await run_db(fetch_requests)
+    requests, next_cursor = page.split(requests, page.cursor_key)
+
+    return page.wrap(
+        [
+            {
+                "id": req["id"],
+                "message": req["message"],
+                "status": req["status"],
+                "created_at": req["created_at"],
+                "mentor": {
+                    "user": {"name": req["mentor_name"], "email": req["mentor_email"]},
+                    "skills": req["skills"],
+                    "experience_years": req["experience_years"],
+                },
+            }
+            for req in requests
+        ],
+        next_cursor,
     )
 
-    requests = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": req["id"],
-            "message": req["message"],
-            "status": req["status"],
-            "created_at": req["created_at"],
-            "mentor": {
-                "user": {"name": req["mentor_name"], "email": req["mentor_email"]},
-                "skills": req["skills"],
-                "experience_years": req["experience_years"],
-            },
-        }
-        for req in requests
-    ]
-
 
 # 이 함수는 이제 사용하지 않음, accept와 reject로 대체됨
 @app.put("/api/match-requests/{request_id}/status")
 async def update_request_status(
-    request_id: int, status: str, current_user_id: int = Depends(verify_token)
+    request_id: int, status: str, principal: Principal = Depends(verify_token)
 ):
-    if status not in ["accepted", "rejected"]:
+    actions = {"accepted": "accept", "rejected": "reject"}
+    if status not in actions:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    # 요청 확인 및 멘토 권한 확인
-    cursor.execute(
-        """
-        SELECT mr.id, m.user_id
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        WHERE mr.id = ?
-    """,
-        (request_id,),
-    )
-
-    request_data = cursor.fetchone()
-    if not request_data:
-        raise HTTPException(status_code=404, detail="Request not found")
-
-    if request_data["user_id"] != current_user_id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # 상태 업데이트
-    cursor.execute(
-        """
-        UPDATE match_requests SET status = ? WHERE id = ?
-    """,
-        (status, request_id),
-    )
-
-    conn.commit()
-    conn.close()
+    _, changes = await run_db(transition_request, request_id, principal, actions[status])
+    publish_request_changes(changes)
 
     return {"message": f"Request {status} successfully"}
 
 
 @app.get("/images/{role}/{user_id}")
 async def get_profile_image(
-    role: str, user_id: int, current_user_id: int = Depends(verify_token)
+    role: str,
+    user_id: int,
+    v: Optional[str] = None,
+    size: Optional[int] = Query(None, ge=1),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    principal: Principal = Depends(verify_token),
 ):
-    conn = get_db()
-    cursor = conn.cursor()
+    if format is not None and format not in IMAGE_VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid image format")
 
-    cursor.execute(
-        "SELECT profile_image FROM users WHERE id = ? AND role = ?", (user_id, role)
-    )
-    user = cursor.fetchone()
+    def fetch_image(conn):
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT profile_image_digest, profile_image_type FROM users
+            WHERE id = ? AND role = ?
+        """,
+            (user_id, role),
+        )
+        return cursor.fetchone()
 
-    if not user:
+    user = await run_db(fetch_image)
+
+    if not user or not user["profile_image_digest"]:
         # 기본 이미지 반환
         if role == "mentor":
             return {"url": "https://placehold.co/500x500.jpg?text=MENTOR"}
         else:
             return {"url": "https://placehold.co/500x500.jpg?text=MENTEE"}
 
-    if user["profile_image"]:
-        return {
-            "url": f"data:image/jpeg;base64,{base64.b64encode(user['profile_image']).decode()}"
-        }
+    digest = user["profile_image_digest"]
+    media_type = user["profile_image_type"] or "application/octet-stream"
+
+    # 썸네일이 아직 없으면 (이전 업로드, 생성 중) 있는 것 중 큰 것이나 원본을 주고 생성을 예약한다.
+    # 원본이 작거나 디코딩할 수 없어 만들 수 없는 썸네일은 다시 예약하지 않는다
+    variant = select_image_variant(size, format, accept)
+    if variant and not blob_store.exists(digest, variant):
+        schedule_image_variants(digest)
+        variant = fallback_image_variant(blob_store, digest, variant)
+    if variant:
+        media_type = IMAGE_VARIANT_FORMATS[variant.split(".")[1]]
+
+    etag = f'"{digest}.{variant}"' if variant else f'"{digest}"'
+    if v == image_version(digest):
+        # 현재 버전이 붙은 URL은 내용이 바뀌지 않으므로 1년간 캐시 (짧거나 옛 버전은 재검증)
+        cache_control = "private, max-age=31536000, immutable"
     else:
-        # 기본 이미지 반환
-        if role == "mentor":
-            return {"url": "https://placehold.co/500x500.jpg?text=MENTOR"}
-        else:
-            return {"url": "https://placehold.co/500x500.jpg?text=MENTEE"}
+        cache_control = f"private, max-age={IMAGE_CACHE_MAX_AGE}"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    if size and format is None:
+        headers["Vary"] = "Accept"
+
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        length = blob_store.size(digest, variant)
+    except FileNotFoundError:
+        # 행은 있는데 파일이 없는 경우 (수동 삭제, 다른 서버의 저장소 등)
+        raise HTTPException(status_code=404, detail="Image not found")
+    byte_range = parse_byte_range(range_header, length) if range_header else None
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    else:
+        start, end = 0, length - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        blob_store.iter_range(digest, start, end, variant),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @app.put("/api/profile")
 async def update_profile(
-    profile_data: dict, current_user_id: int = Depends(verify_token)
+    profile_data: dict, principal: Principal = Depends(verify_token)
 ):
-    conn = get_db()
-    cursor = conn.cursor()
+    def apply_update(conn):
+        cursor = conn.cursor()
 
-    # 사용자 확인
-    cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-    user = cursor.fetchone()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # 기본 정보 업데이트
-    cursor.execute(
-        """
-        UPDATE users SET name = ?, bio = ? WHERE id = ?
-    """,
-        (profile_data.get("name"), profile_data.get("bio"), current_user_id),
-    )
+        # 기본 정보 업데이트
+        cursor.execute(
+            """
+            UPDATE users SET name = ?, bio = ? WHERE id = ?
+        """,
+            (profile_data.get("name"), profile_data.get("bio"), principal.user_id),
+        )
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # 이미지 업데이트 (있는 경우, 큰 파일은 POST /api/profile/image 사용)
+        if "image" in profile_data and profile_data["image"]:
+            try:
+                image_data = base64.b64decode(profile_data["image"], validate=True)
+            except (binascii.Error, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid image encoding")
+
+            content_type = detect_image_type(image_data)
+            if content_type is None:
+                raise HTTPException(status_code=415, detail="Unsupported image type")
+            if len(image_data) > MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=413, detail="Image too large")
+
+            digest = blob_store.put(image_data)
+            cursor.execute(
+                """
+                UPDATE users SET profile_image_digest = ?, profile_image_type = ?
+                WHERE id = ?
+            """,
+                (digest, content_type, principal.user_id),
+            )
+            schedule_image_variants(digest)
+
+        # 역할별 정보 업데이트
+        if principal.mentor_id is not None and "skills" in profile_data:
+            skills_str = (
+                ",".join(profile_data["skills"])
+                if isinstance(profile_data["skills"], list)
+                else profile_data["skills"]
+            )
+            cursor.execute(
+                "UPDATE mentors SET skills = ? WHERE id = ?",
+                (skills_str, principal.mentor_id),
+            )
+            sync_mentor_skills(cursor, principal.mentor_id, skills_str)
+
+        if principal.mentor_id is not None and "capacity" in profile_data:
+            capacity = profile_data["capacity"]
+            if (
+                not isinstance(capacity, int)
+                or isinstance(capacity, bool)
+                or not 0 <= capacity <= MAX_MENTOR_CAPACITY
+            ):
+                raise HTTPException(status_code=400, detail="Invalid capacity")
+            cursor.execute(
+                "UPDATE mentors SET capacity = ? WHERE id = ?",
+                (capacity, principal.mentor_id),
+            )
 
-    # 이미지 업데이트 (있는 경우)
-    if "image" in profile_data and profile_data["image"]:
-        try:
-            image_data = base64.b64decode(profile_data["image"])
+        if principal.mentee_id is not None and "interests" in profile_data:
+            interests = profile_data["interests"]
+            if isinstance(interests, list):
+                interests = ",".join(interests)
             cursor.execute(
-                "UPDATE users SET profile_image = ? WHERE id = ?",
-                (image_data, current_user_id),
+                "UPDATE mentees SET interests = ? WHERE id = ?",
+                (interests, principal.mentee_id),
             )
-        except:
-            pass
 
-    # 역할별 정보 업데이트
-    if user["role"] == "mentor" and "skills" in profile_data:
-        skills_str = (
-            ",".join(profile_data["skills"])
-            if isinstance(profile_data["skills"], list)
-            else profile_data["skills"]
+        conn.commit()
+
+        if principal.role == "mentor":
+            mentor_catalog.sync(conn)
+            if np is not None:
+                mentor_recommender.sync(conn)
+
+    await run_db(apply_update)
+
+    # 업데이트된 정보 반환
+    return await get_current_user(principal)
+
+
+@app.post("/api/profile/image")
+async def upload_profile_image(
+    image: UploadFile = File(...),
+    principal: Principal = Depends(verify_token),
+):
+    # 요청 본문 크기는 BodySizeLimitMiddleware가 파싱 중에 제한한다
+    try:
+        digest, content_type = await asyncio.to_thread(
+            blob_store.put_stream, image.file, MAX_IMAGE_BYTES
         )
+    finally:
+        await image.close()
+
+    def save_image(conn):
+        cursor = conn.cursor()
         cursor.execute(
-            "UPDATE mentors SET skills = ? WHERE user_id = ?",
-            (skills_str, current_user_id),
+            """
+            UPDATE users SET profile_image_digest = ?, profile_image_type = ?
+            WHERE id = ?
+        """,
+            (digest, content_type, principal.user_id),
         )
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
-    # 업데이트된 정보 반환
-    return await get_current_user(current_user_id)
+        if principal.role == "mentor":
+            mentor_catalog.sync(conn)
+            if np is not None:
+                mentor_recommender.sync(conn)
 
+    await run_db(save_image)
+    schedule_image_variants(digest)
 
-@app.get("/api/match-requests/incoming")
-async def get_incoming_requests(current_user_id: int = Depends(verify_token)):
-    conn = get_db()
-    cursor = conn.cursor()
+    return await get_current_user(principal)
 
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, mr.status, mr.created_at,
-               m.id as mentor_id, me.id as mentee_id
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN mentees me ON mr.mentee_id = me.id
-        WHERE m.user_id = ?
-        ORDER BY mr.created_at DESC
-    """,
-        (current_user_id,),
-    )
 
-    requests = cursor.fetchall()
-    conn.close()
+@app.get("/api/match-requests/incoming")
+async def get_incoming_requests(
+    page: RequestPage = Depends(), principal: Principal = Depends(verify_token)
+):
+    def fetch_requests(conn):
+        cursor = conn.cursor()
+
+        return fetch_request_rows(
+            cursor,
+            f"""
+            SELECT mr.id, mr.message, mr.status, mr.created_at,
+                   m.id as mentor_id, me.id as mentee_id
+            FROM match_requests mr {page.table_hint}
+            JOIN mentors m ON mr.mentor_id = m.id
+            JOIN mentees me ON mr.mentee_id = me.id
+            WHERE m.user_id = ?
+        """,
+            [principal.user_id],
+            page,
+            ("mentor_id", principal.mentor_id),
+        )
 
-    return [
-        {
-            "id": req["id"],
-            "mentorId": req["mentor_id"],
-            "menteeId": req["mentee_id"],
-            "message": req["message"],
-            "status": req["status"],
-        }
-        for req in requests
-    ]
+    requests = await run_db(fetch_requests)
+    requests, next_cursor = page.split(requests, page.cursor_key)
+
+    return page.wrap(
+        [
+            {
+                "id": req["id"],
+                "mentorId": req["mentor_id"],
+                "menteeId": req["mentee_id"],
+                "message": req["message"],
+                "status": req["status"],
+            }
+            for req in requests
+        ],
+        next_cursor,
+    )
 
 
 @app.get("/api/match-requests/outgoing")
-async def get_outgoing_requests(current_user_id: int = Depends(verify_token)):
-    conn = get_db()
-    cursor = conn.cursor()
+async def get_outgoing_requests(
+    page: RequestPage = Depends(), principal: Principal = Depends(verify_token)
+):
+    def fetch_requests(conn):
+        cursor = conn.cursor()
+
+        return fetch_request_rows(
+            cursor,
+            f"""
+            SELECT mr.id, mr.message, mr.status, mr.created_at,
+                   m.id as mentor_id, me.id as mentee_id
+            FROM match_requests mr {page.table_hint}
+            JOIN mentees me ON mr.mentee_id = me.id
+            JOIN mentors m ON mr.mentor_id = m.id
+            WHERE me.user_id = ?
+        """,
+            [principal.user_id],
+            page,
+            ("mentee_id", principal.mentee_id),
+        )
 
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, mr.status, mr.created_at,
-               m.id as mentor_id, me.id as mentee_id
-        FROM match_requests mr
-        JOIN mentees me ON mr.mentee_id = me.id
-        JOIN mentors m ON mr.mentor_id = m.id
-        WHERE me.user_id = ?
-        ORDER BY mr.created_at DESC
-    """,
-        (current_user_id,),
+    requests = await run_db(fetch_requests)
+    requests, next_cursor = page.split(requests, page.cursor_key)
+
+    return page.wrap(
+        [
+            {
+                "id": req["id"],
+                "mentorId": req["mentor_id"],
+                "menteeId": req["mentee_id"],
+                "status": req["status"],
+            }
+            for req in requests
+        ],
+        next_cursor,
     )
 
-    requests = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": req["id"],
-            "mentorId": req["mentor_id"],
-            "menteeId": req["mentee_id"],
-            "status": req["status"],
-        }
-        for req in requests
-    ]
 
+# 매칭 요청 상태 전이: 동작 -> (요청을 소유한 쪽 컬럼, 목표 상태). pending 요청만 전이할 수 있다
+REQUEST_TRANSITIONS = {
+    "accept": ("mentor_id", "accepted"),
+    "reject": ("mentor_id", "rejected"),
+    "cancel": ("mentee_id", "cancelled"),
+}
 
-@app.put("/api/match-requests/{request_id}/accept")
-async def accept_request(request_id: int, current_user_id: int = Depends(verify_token)):
-    conn = get_db()
-    cursor = conn.cursor()
 
-    # 요청 확인 및 멘토 권한 확인
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, m.id as mentor_id, me.id as mentee_id, m.user_id
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN mentees me ON mr.mentee_id = me.id
-        WHERE mr.id = ?
-    """,
-        (request_id,),
-    )
+# 상태 변경 결과로 돌려주는 컬럼 (이벤트 수신자인 양쪽 user_id 포함)
+REQUEST_CHANGE_COLUMNS = """
+    id, mentor_id, mentee_id, message, status,
+    (SELECT user_id FROM mentors WHERE mentors.id = match_requests.mentor_id) AS mentor_user_id,
+    (SELECT user_id FROM mentees WHERE mentees.id = match_requests.mentee_id) AS mentee_user_id
+"""
 
-    request_data = cursor.fetchone()
-    if not request_data:
-        raise HTTPException(status_code=404, detail="Request not found")
 
-    if request_data["user_id"] != current_user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+def transition_request(conn, request_id: int, principal: Principal, action: str):
+    """매칭 요청 상태를 한 번의 조건부 UPDATE로 바꾸고 (요청 행, 실제로 바뀐 행 목록)을 반환
 
-    # 상태 업데이트
+    소유자 확인과 pending 확인을 WHERE 절에 넣어 조회와 갱신 사이의 경쟁을 없앤다.
+    이미 목표 상태이면 쓰지 않고 현재 행을 돌려준다 (중복 클릭은 no-op, 바뀐 행 없음).
+    """
+    owner_column, target = REQUEST_TRANSITIONS[action]
+    owner_id = principal.mentor_id if owner_column == "mentor_id" else principal.mentee_id
+    cursor = conn.cursor()
     cursor.execute(
-        "UPDATE match_requests SET status = 'accepted' WHERE id = ?", (request_id,)
+        f"""
+        UPDATE match_requests SET status = ?
+        WHERE id = ? AND {owner_column} = ? AND status = 'pending'
+        RETURNING {REQUEST_CHANGE_COLUMNS}
+    """,
+        (target, request_id, owner_id),
     )
+    # RETURNING 문은 끝까지 읽어야 실행이 완료된다
+    updated = cursor.fetchall()
+    if not updated:
+        # 갱신되지 않은 이유를 구분 (쓰기 없이 조회만)
+        cursor.execute(
+            "SELECT id, mentor_id, mentee_id, message, status FROM match_requests WHERE id = ?",
+            (request_id,),
+        )
+        request_data = cursor.fetchone()
+        if not request_data:
+            raise HTTPException(status_code=404, detail="Request not found")
+        if owner_id is None or request_data[owner_column] != owner_id:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        if request_data["status"] != target:
+            raise HTTPException(
+                status_code=409, detail=f"Request already {request_data['status']}"
+            )
+        return request_data, []
+
+    changes = list(updated)
+    if action == "accept":
+        # 수락과 같은 트랜잭션에서 이 멘티의 다른 pending 요청은 자동 거절
+        cursor.execute(
+            f"""
+            UPDATE match_requests SET status = 'rejected'
+            WHERE mentee_id = ? AND status = 'pending' AND id != ?
+            RETURNING {REQUEST_CHANGE_COLUMNS}
+        """,
+            (updated[0]["mentee_id"], request_id),
+        )
+        changes.extend(cursor.fetchall())
     conn.commit()
-    conn.close()
+    return updated[0], changes
 
-    return {
-        "id": request_data["id"],
-        "mentorId": request_data["mentor_id"],
-        "menteeId": request_data["mentee_id"],
-        "message": request_data["message"],
-        "status": "accepted",
-    }
 
+def transition_requests(conn, items: list, principal: Principal):
+    """여러 매칭 요청의 상태를 한 트랜잭션 / 한 번의 커밋으로 바꾸고 (항목별 결과, 바뀐 행 목록)을 반환
 
-@app.put("/api/match-requests/{request_id}/reject")
-async def reject_request(request_id: int, current_user_id: int = Depends(verify_token)):
-    conn = get_db()
+    대상 요청은 집합 쿼리 한 번으로 읽고 검증은 메모리에서 한다. 쓰기 잠금(BEGIN IMMEDIATE)을
+    먼저 잡으므로 읽은 상태가 커밋까지 바뀌지 않는다. 항목별 규칙은 transition_request와 같다.
+    """
+    actions = {target: action for action, (_, target) in REQUEST_TRANSITIONS.items()}
     cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
 
-    # 요청 확인 및 멘토 권한 확인
+    ids = sorted({item.id for item in items})
+    placeholders = ",".join("?" * len(ids))
     cursor.execute(
-        """
-        SELECT mr.id, mr.message, m.id as mentor_id, me.id as mentee_id, m.user_id
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN mentees me ON mr.mentee_id = me.id
-        WHERE mr.id = ?
+        f"""
+        SELECT {REQUEST_CHANGE_COLUMNS}
+        FROM match_requests WHERE id IN ({placeholders})
     """,
-        (request_id,),
+        ids,
     )
+    requests = {row["id"]: dict(row) for row in cursor.fetchall()}
+
+    results, changed = [], {}
+    for item in items:
+        action = actions.get(item.status)
+        request_data = requests.get(item.id)
+        if action is None:
+            results.append({"id": item.id, "code": 400, "detail": "Invalid status"})
+            continue
+        if request_data is None:
+            results.append({"id": item.id, "code": 404, "detail": "Request not found"})
+            continue
+        owner_column, target = REQUEST_TRANSITIONS[action]
+        owner_id = principal.mentor_id if owner_column == "mentor_id" else principal.mentee_id
+        if owner_id is None or request_data[owner_column] != owner_id:
+            results.append({"id": item.id, "code": 401, "detail": "Unauthorized"})
+            continue
+        if request_data["status"] == "pending":
+            request_data["status"] = target
+            changed[item.id] = target
+        elif request_data["status"] != target:
+            results.append(
+                {"id": item.id, "code": 409, "detail": f"Request already {request_data['status']}"}
+            )
+            continue
+        results.append({"id": item.id, "code": 200, "request": request_response(request_data)})
 
-    request_data = cursor.fetchone()
-    if not request_data:
-        raise HTTPException(status_code=404, detail="Request not found")
-
-    if request_data["user_id"] != current_user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    # 상태 업데이트
-    cursor.execute(
-        "UPDATE match_requests SET status = 'rejected' WHERE id = ?", (request_id,)
-    )
+    # 목표 상태별로 한 번씩 갱신 (쓰기 잠금을 잡고 있으므로 모두 pending 그대로다)
+    for target in ("accepted", "rejected", "cancelled"):
+        targets = [request_id for request_id, status in changed.items() if status == target]
+        if targets:
+            cursor.execute(
+                f"""
+                UPDATE match_requests SET status = ?
+                WHERE id IN ({",".join("?" * len(targets))}) AND status = 'pending'
+            """,
+                [target, *targets],
+            )
+    changes = [requests[request_id] for request_id in changed]
+    for request_id, status in changed.items():
+        if status == "accepted":
+            # transition_request와 마찬가지로 수락된 멘티의 다른 pending 요청은 자동 거절
+            cursor.execute(
+                f"""
+                UPDATE match_requests SET status = 'rejected'
+                WHERE mentee_id = ? AND status = 'pending' AND id != ?
+                RETURNING {REQUEST_CHANGE_COLUMNS}
+            """,
+                (requests[request_id]["mentee_id"], request_id),
+            )
+            changes.extend(cursor.fetchall())
     conn.commit()
-    conn.close()
+    return results, changes
 
+
+def request_response(request_data) -> dict:
     return {
         "id": request_data["id"],
         "mentorId": request_data["mentor_id"],
         "menteeId": request_data["mentee_id"],
         "message": request_data["message"],
-        "status": "rejected",
+        "status": request_data["status"],
     }
 
 
+@app.put("/api/match-requests/{request_id}/accept")
+async def accept_request(request_id: int, principal: Principal = Depends(verify_token)):
+    request_data, changes = await run_db(transition_request, request_id, principal, "accept")
+    publish_request_changes(changes)
+    return request_response(request_data)
+
+
+@app.put("/api/match-requests/{request_id}/reject")
+async def reject_request(request_id: int, principal: Principal = Depends(verify_token)):
+    request_data, changes = await run_db(transition_request, request_id, principal, "reject")
+    publish_request_changes(changes)
+    return request_response(request_data)
+
+
 @app.delete("/api/match-requests/{request_id}")
-async def delete_request(request_id: int, current_user_id: int = Depends(verify_token)):
-    conn = get_db()
-    cursor = conn.cursor()
+async def delete_request(request_id: int, principal: Principal = Depends(verify_token)):
+    request_data, changes = await run_db(transition_request, request_id, principal, "cancel")
+    publish_request_changes(changes)
+    return request_response(request_data)
 
-    # 요청 확인 및 멘티 권한 확인
-    cursor.execute(
-        """
-        SELECT mr.id, mr.message, m.id as mentor_id, me.id as mentee_id, me.user_id
-        FROM match_requests mr
-        JOIN mentors m ON mr.mentor_id = m.id
-        JOIN mentees me ON mr.mentee_id = me.id
-        WHERE mr.id = ?
-    """,
-        (request_id,),
-    )
 
-    request_data = cursor.fetchone()
-    if not request_data:
-        raise HTTPException(status_code=404, detail="Request not found")
+@app.post("/api/events/ticket")
+async def create_event_ticket(principal: Principal = Depends(verify_token)):
+    ticket = await run_db(issue_event_ticket, principal)
+    return {"ticket": ticket, "expires_in": EVENT_TICKET_SECONDS}
 
-    if request_data["user_id"] != current_user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
 
-    # 상태 업데이트
-    cursor.execute(
-        "UPDATE match_requests SET status = 'cancelled' WHERE id = ?", (request_id,)
+@app.get("/api/events")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    last_event_id_param: Optional[str] = Query(None, alias="lastEventId"),
+    principal: Principal = Depends(verify_stream_token),
+):
+    """매칭 요청 변경을 Server-Sent Events로 보낸다 (폴링 대체)
+
+    재연결 시 Last-Event-ID 헤더(브라우저 자동 재연결) 또는 lastEventId 쿼리(티켓을 새로 받아
+    직접 다시 여는 클라이언트) 이후 이벤트부터 이어서 보내고, 큐가 넘쳐 이벤트를 버렸거나
+    이력이 모자라면 resync 이벤트로 목록을 다시 불러오게 한다.
+    토큰이 만료되거나 폐기되면 스트림을 닫는다.
+    """
+    last_event_id = last_event_id or last_event_id_param
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    async def stream():
+        # 본문이 시작되기 전에 연결이 끊기면 finally가 돌지 않으므로 구독도 여기서 한다
+        subscription = event_bus.subscribe(principal.user_id, resume_from)
+        try:
+            yield "retry: 3000\n\n"
+            dropped = 0
+            while time.time() < principal.exp:
+                await token_cache.refresh()
+                if token_cache.is_revoked(principal.jti):
+                    break
+                timeout = min(EVENT_HEARTBEAT_SECONDS, max(principal.exp - time.time(), 0))
+                batch = await subscription.next_batch(timeout)
+                if subscription.dropped != dropped:
+                    dropped = subscription.dropped
+                    batch.insert(0, (batch[0][0] - 1 if batch else 0, "resync", "{}"))
+                if not batch:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield "".join(
+                    f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+                    for event_id, event_type, data in batch
+                )
+        finally:
+            event_bus.unsubscribe(principal.user_id, subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    conn.commit()
-    conn.close()
 
-    return {
-        "id": request_data["id"],
-        "mentorId": request_data["mentor_id"],
-        "menteeId": request_data["mentee_id"],
-        "message": request_data["message"],
-        "status": "cancelled",
-    }
+
+@app.post("/api/match-requests/batch")
+async def batch_transition_requests(
+    batch: MatchRequestBatch, principal: Principal = Depends(verify_token)
+):
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="No items")
+    if len(batch.items) > MAX_BATCH_TRANSITIONS:
+        raise HTTPException(status_code=413, detail="Too many items")
+
+    results, changes = await run_db(transition_requests, batch.items, principal)
+    publish_request_changes(changes)
+    return {"results": results, "updated": len(changes)}
 
 
 if __name__ == "__main__":
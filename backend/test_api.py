@@ -1,11 +1,47 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
 import pytest
 import sqlite3
 import sys
 import os
+import time
 
 # 백엔드 디렉토리를 sys.path에 추가합니다
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """임시 데이터베이스를 사용하는 테스트 클라이언트"""
+    monkeypatch.setattr(main, "DATABASE_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(main, "mentor_catalog", main.MentorCatalog())
+    monkeypatch.setattr(main, "mentor_recommender", main.MentorRecommender())
+    monkeypatch.setattr(main, "blob_store", main.BlobStore(str(tmp_path / "images")))
+    monkeypatch.setattr(main, "token_cache", main.TokenCache(main.TOKEN_CACHE_SIZE))
+    monkeypatch.setattr(main, "PASSWORD_HASH_N", 1024)  # 테스트 속도를 위해 낮은 비용
+    monkeypatch.setattr(main, "metrics_registry", main.MetricsRegistry())
+    monkeypatch.setattr(main, "slow_query_log", main.SlowQueryLog(main.SLOW_QUERY_LOG_SIZE))
+    monkeypatch.setattr(main, "event_bus", main.EventBus(main.EVENT_QUEUE_SIZE, main.EVENT_HISTORY_SIZE))
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def signup_and_login(client, email, role, name="테스터", password="password123"):
+    client.post(
+        "/api/signup",
+        json={"email": email, "password": password, "name": name, "role": role},
+    )
+    response = client.post("/api/login", json={"email": email, "password": password})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
 # 데이터베이스 연결 테스트
 def test_database_connection():
     try:
@@ -18,12 +54,1126 @@ def test_database_connection():
     except Exception as e:
         pytest.fail(f"데이터베이스 연결 실패: {str(e)}")
 
-# 추가적인 테스트를 여기에 작성할 수 있습니다
-# def test_user_authentication():
-#     ...
+def test_connection_pool_uses_wal(client):
+    with main.get_db() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == main.DB_BUSY_TIMEOUT_MS
+
+
+def test_connection_returned_to_pool_after_error(client):
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    # 실패하는 요청이 커넥션을 소모하지 않아야 한다
+    for _ in range(main.DB_POOL_SIZE + 2):
+        response = client.post(
+            "/api/match-requests",
+            json={"mentorId": 1, "menteeId": 1, "message": "hi"},
+            headers=headers,
+        )
+        assert response.status_code == 401
+    assert client.get("/api/me", headers=headers).status_code == 200
+
+
+def test_migrations_are_recorded_and_rerunnable(client):
+    main.init_db()
+    with main.get_db() as conn:
+        versions = [
+            row["version"]
+            for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")
+        ]
+        indexes = {
+            row["name"]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+    assert versions == [version for version, _, _ in main.MIGRATIONS]
+    assert "ux_match_requests_pending_mentee" in indexes
+    assert "ix_match_requests_mentor_created" in indexes
+
+
+def test_one_pending_request_per_mentee(client):
+    with main.get_db() as conn:
+        conn.execute(
+            "INSERT INTO match_requests (mentor_id, mentee_id, message) VALUES (1, 1, 'a')"
+        )
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO match_requests (mentor_id, mentee_id, message) VALUES (2, 1, 'b')"
+            )
+
+
+@pytest.fixture(params=[True, False], ids=["catalog", "sql"])
+def mentor_source(request, monkeypatch):
+    monkeypatch.setattr(main, "MENTOR_CATALOG_ENABLED", request.param)
+
+
+def test_mentor_skill_filter_is_exact(client, mentor_source):
+    mentor_headers = signup_and_login(client, "java@example.com", "mentor", name="Java")
+    client.put("/api/profile", json={"name": "Java", "skills": "Java,Spring"}, headers=mentor_headers)
+    mentor_headers = signup_and_login(client, "js@example.com", "mentor", name="JS")
+    client.put("/api/profile", json={"name": "JS", "skills": ["JavaScript", "React"]}, headers=mentor_headers)
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+
+    def names(**params):
+        response = client.get("/api/mentors", params=params, headers=headers)
+        assert response.status_code == 200
+        return [mentor["profile"]["name"] for mentor in response.json()["items"]]
+
+    assert names(skill="java") == ["Java"]
+    assert names(skill="Java,React") == ["Java", "JS"]
+    assert names(skill="Java,React", skill_match="all") == []
+    assert names(skill="javascript, react", skill_match="all") == ["JS"]
+
+
+def test_mentor_catalog_write_through(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "admin-key")
+    mentor_headers = signup_and_login(client, "mentor@example.com", "mentor", name="Bob")
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+
+    response = client.get("/api/mentors", headers=headers)
+    assert [m["profile"]["name"] for m in response.json()["items"]] == ["Bob"]
+    client.put("/api/profile", json={"name": "Alice", "skills": "Go"}, headers=mentor_headers)
+    signup_and_login(client, "mentor2@example.com", "mentor", name="Carol")
+
+    response = client.get("/api/mentors", params={"order_by": "name", "legacy": True}, headers=headers)
+    assert [m["profile"]["name"] for m in response.json()] == ["Alice", "Carol"]
+    assert response.json()[0]["profile"]["skills"] == ["Go"]
+
+    stats = client.get("/api/admin/cache-stats", headers={"X-Admin-Key": "admin-key"}).json()
+    assert stats["mentor_catalog"]["misses"] == 1
+    assert stats["mentor_catalog"]["hits"] == 1
+    assert client.get("/api/admin/cache-stats").status_code == 403
+
+
+def test_mentor_catalog_picks_up_other_process_writes(client, monkeypatch):
+    monkeypatch.setattr(main, "MENTOR_CATALOG_SYNC_SECONDS", 0)
+    signup_and_login(client, "mentor@example.com", "mentor", name="Bob")
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+
+    def names():
+        response = client.get("/api/mentors", params={"legacy": True}, headers=headers)
+        return [mentor["profile"]["name"] for mentor in response.json()]
+
+    assert names() == ["Bob"]
+    # 다른 워커 프로세스의 쓰기처럼 캐시를 거치지 않고 DB를 직접 수정
+    conn = sqlite3.connect(main.DATABASE_PATH)
+    conn.execute("UPDATE users SET name = 'Robert' WHERE email = 'mentor@example.com'")
+    conn.execute(
+        "INSERT INTO users (email, password_hash, name, role) VALUES ('x@example.com', '', 'Xavier', 'mentor')"
+    )
+    conn.execute("INSERT INTO mentors (user_id) VALUES (last_insert_rowid())")
+    conn.commit()
+    conn.close()
+    assert names() == ["Robert", "Xavier"]
+
+    # 로그는 최근 MENTOR_CHANGE_RETENTION개만 남고, 잘린 구간보다 뒤처진 캐시는 전체를 다시 읽는다
+    monkeypatch.setattr(main, "MENTOR_CHANGE_RETENTION", 2)
+    conn = sqlite3.connect(main.DATABASE_PATH)
+    for name in ["Rob", "Bobby", "Roberto"]:
+        conn.execute("UPDATE users SET name = ? WHERE email = 'mentor@example.com'", (name,))
+        conn.commit()
+    conn.execute("UPDATE users SET name = 'Xav' WHERE email = 'x@example.com'")
+    conn.commit()
+    assert names() == ["Roberto", "Xav"]
+    assert conn.execute("SELECT COUNT(*) FROM mentor_changes").fetchone()[0] == 2
+    conn.close()
+
+
+def test_mentor_list_keyset_pagination(client, mentor_source):
+    for name in ["Dan", "Amy", "Cy", "Bo", "Amy"]:
+        signup_and_login(client, f"{name.lower()}{time.time_ns()}@example.com", "mentor", name=name)
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+
+    def collect(order_by):
+        names, cursor = [], None
+        while True:
+            params = {"order_by": order_by, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            body = client.get("/api/mentors", params=params, headers=headers).json()
+            names += [(m["id"], m["profile"]["name"]) for m in body["items"]]
+            cursor = body["next_cursor"]
+            if not cursor:
+                return names
+
+    assert [name for _, name in collect("name")] == ["Amy", "Amy", "Bo", "Cy", "Dan"]
+    assert [mentor_id for mentor_id, _ in collect("id")] == [1, 2, 3, 4, 5]
+
+    response = client.get("/api/mentors", params={"cursor": "garbage"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_request_list_keyset_pagination(client):
+    signup_and_login(client, "mentor@example.com", "mentor")
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+    with main.get_db() as conn:
+        conn.executemany(
+            "INSERT INTO match_requests (mentor_id, mentee_id, message, status, created_at) VALUES (1, 1, ?, 'rejected', '2025-01-01 00:00:00')",
+            [(str(i),) for i in range(5)],
+        )
+
+    first = client.get("/api/match-requests/outgoing", params={"limit": 3}, headers=headers).json()
+    second = client.get(
+        "/api/match-requests/outgoing",
+        params={"limit": 3, "cursor": first["next_cursor"]},
+        headers=headers,
+    ).json()
+    assert [r["id"] for r in first["items"]] == [5, 4, 3]
+    assert [r["id"] for r in second["items"]] == [2, 1]
+    assert second["next_cursor"] is None
+
+    legacy = client.get("/api/match-requests/outgoing", params={"legacy": True}, headers=headers).json()
+    assert [r["id"] for r in legacy] == [5, 4, 3, 2, 1]
+
+
+def test_mentor_full_text_search(client):
+    mentor_headers = signup_and_login(client, "kim@example.com", "mentor", name="김철수")
+    client.put(
+        "/api/profile",
+        json={"name": "김철수", "bio": "파이썬 백엔드 개발자입니다", "skills": "Python,FastAPI"},
+        headers=mentor_headers,
+    )
+    mentor_headers = signup_and_login(client, "lee@example.com", "mentor", name="Lee")
+    client.put(
+        "/api/profile",
+        json={"name": "Lee", "bio": "Frontend engineer who likes python", "skills": "React"},
+        headers=mentor_headers,
+    )
+    headers = signup_and_login(client, "mentee@example.com", "mentee")
+
+    def search(q):
+        response = client.get("/api/mentors/search", params={"q": q}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    results = search("python")
+    # 스킬에 일치한 멘토가 소개에만 언급된 멘토보다 앞선다
+    assert [r["profile"]["name"] for r in results] == ["김철수", "Lee"]
+    assert "<mark>" in results[0]["snippet"]
+    assert [r["profile"]["name"] for r in search("파이")] == ["김철수"]
+    assert [r["profile"]["name"] for r in search("개발자")] == ["김철수"]
+    assert search("golang") == []
+
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def test_profile_image_stored_by_digest(client):
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    image = base64.b64encode(PNG_BYTES).decode()
+    client.put("/api/profile", json={"name": "M", "image": image}, headers=headers)
+    client.put("/api/profile", json={"name": "M", "image": image}, headers=headers)
+
+    with main.get_db() as conn:
+        user = conn.execute("SELECT * FROM users WHERE id = 1").fetchone()
+    assert "profile_image" not in user.keys()
+    assert user["profile_image_type"] == "image/png"
+    assert main.blob_store.read(user["profile_image_digest"]) == PNG_BYTES
+
+    response = client.get("/images/mentor/1", headers=headers)
+    assert response.content == PNG_BYTES
+    assert response.headers["content-type"] == "image/png"
+
+
+def test_profile_image_caching_and_ranges(client):
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    image = base64.b64encode(PNG_BYTES).decode()
+    image_url = client.put(
+        "/api/profile", json={"name": "M", "image": image}, headers=headers
+    ).json()["profile"]["imageUrl"]
+
+    response = client.get(image_url, headers=headers)
+    etag = response.headers["etag"]
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(image_url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(image_url, headers={**headers, "Range": "bytes=0-7"})
+    assert response.status_code == 206
+    assert response.content == PNG_BYTES[:8]
+    assert response.headers["content-range"] == f"bytes 0-7/{len(PNG_BYTES)}"
+
+    response = client.get(image_url, headers={**headers, "Range": "bytes=1000-"})
+    assert response.status_code == 416
+
+    # 버전의 앞부분만 맞는 URL은 영구 캐시하지 않는다
+    short_url = image_url.split("?")[0] + "?v=" + image_url.split("v=")[1][:1]
+    assert "immutable" not in client.get(short_url, headers=headers).headers["cache-control"]
+
+    # DB 행은 있는데 파일이 없으면 500이 아니라 404
+    with main.get_db() as conn:
+        digest = conn.execute(
+            "SELECT profile_image_digest FROM users WHERE email = ?", ("mentor@example.com",)
+        ).fetchone()["profile_image_digest"]
+    os.remove(main.blob_store.path(digest))
+    assert client.get(image_url, headers=headers).status_code == 404
+
+
+def test_profile_image_multipart_upload(client, monkeypatch):
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    response = client.post(
+        "/api/profile/image",
+        files={"image": ("avatar.png", PNG_BYTES, "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert client.get(response.json()["profile"]["imageUrl"], headers=headers).content == PNG_BYTES
+
+    response = client.post(
+        "/api/profile/image",
+        files={"image": ("avatar.png", b"not an image", "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 415
+
+    monkeypatch.setattr(main, "MAX_IMAGE_BYTES", 16)
+    response = client.post(
+        "/api/profile/image",
+        files={"image": ("avatar.png", PNG_BYTES, "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 413
+    # 거절된 업로드의 임시 파일이 남지 않는다
+    assert not [name for name in os.listdir(main.blob_store.root) if name.endswith(".tmp")]
+
+    # Content-Length 없는 chunked 업로드도 폼 파싱 도중 끊긴다 (저장 단계까지 가지 않음)
+    monkeypatch.setattr(main.blob_store, "put_stream", lambda *args: pytest.fail("not reached"))
+    boundary = "limit-boundary"
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+        "Content-Type: image/png\r\n\r\n".encode(),
+        *[PNG_BYTES * 1024] * 4,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    response = client.post(
+        "/api/profile/image",
+        content=iter(parts),
+        headers={**headers, "Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert response.status_code == 413
+
+    response = client.put("/api/profile", json={"name": "M", "image": "%%%"}, headers=headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(main.Image is None, reason="Pillow not installed")
+def test_profile_image_thumbnails(client):
+    import io
+    from PIL import Image
+
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 200), "red").save(buffer, "PNG")
+    image_url = client.post(
+        "/api/profile/image",
+        files={"image": ("avatar.png", buffer.getvalue(), "image/png")},
+        headers=headers,
+    ).json()["profile"]["imageUrl"]
+    main.stop_image_executor()  # 예약된 썸네일 생성이 끝날 때까지 대기
+
+    response = client.get(image_url, params={"size": 100, "format": "webp"}, headers=headers)
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).size == (128, 128)
+
+    response = client.get(image_url, params={"size": 64}, headers={**headers, "Accept": "image/jpeg"})
+    assert response.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(response.content)).size == (64, 64)
+
+    # 원본보다 큰 썸네일은 없으므로 원본을 준다
+    response = client.get(image_url, params={"size": 512}, headers=headers)
+    assert response.headers["content-type"] == "image/png"
+
+
+@pytest.mark.skipif(main.Image is None, reason="Pillow not installed")
+def test_profile_image_variants_not_rescheduled(client, monkeypatch):
+    import io
+    from PIL import Image
+
+    calls = []
+    generate = main.generate_image_variants
+    monkeypatch.setattr(
+        main, "generate_image_variants", lambda store, digest: calls.append(digest) or generate(store, digest)
+    )
+    headers = signup_and_login(client, "mentor@example.com", "mentor")
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), "red").save(buffer, "PNG")
+    # 작은 이미지와 헤더만 PNG인 디코딩 불가 이미지 모두 한 번만 처리한다
+    for data in (buffer.getvalue(), PNG_BYTES):
+        image_url = client.post(
+            "/api/profile/image", files={"image": ("avatar.png", data, "image/png")}, headers=headers
+        ).json()["profile"]["imageUrl"]
+        main.stop_image_executor()
+        for _ in range(5):
+            response = client.get(image_url, params={"size": 64}, headers=headers)
+            assert response.headers["content-type"] == "image/png"
+            assert response.content == data
+        main.stop_image_executor()
+    assert len(calls) == 2
+
+    # 픽셀 수 상한을 넘는 원본은 디코딩하지 않고 완료로 기록한다
+    monkeypatch.setattr(main, "MAX_IMAGE_PIXELS", 100 * 100 - 1)
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), "blue").save(buffer, "PNG")
+    digest = main.blob_store.put(buffer.getvalue())
+    generate(main.blob_store, digest)
+    assert main.blob_store.exists(digest, main.IMAGE_VARIANTS_DONE)
+    assert not any(main.blob_store.exists(digest, f"64.{fmt}") for fmt in main.IMAGE_VARIANT_FORMATS)
+
+
+def test_profile_image_migration_moves_blobs(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "legacy.db")
+    monkeypatch.setattr(main, "DATABASE_PATH", db_path)
+    monkeypatch.setattr(main, "blob_store", main.BlobStore(str(tmp_path / "images")))
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, "
+        "password_hash TEXT NOT NULL, name TEXT, role TEXT NOT NULL, bio TEXT, "
+        "profile_image BLOB, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.execute(
+        "INSERT INTO users (email, password_hash, role, profile_image) VALUES ('a@b.c', 'x', 'mentee', ?)",
+        (PNG_BYTES,),
+    )
+    conn.commit()
+    conn.close()
+
+    main.init_db()
+
+    conn = sqlite3.connect(db_path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    digest = conn.execute("SELECT profile_image_digest FROM users").fetchone()[0]
+    conn.close()
+    assert "profile_image" not in columns
+    assert main.blob_store.read(digest) == PNG_BYTES
+
+
+def test_run_db_does_not_block_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATABASE_PATH", str(tmp_path / "test.db"))
+
+    async def scenario():
+        main.start_db_executor()
+        try:
+            slow_query = asyncio.ensure_future(
+                main.run_db(lambda conn: time.sleep(0.3))
+            )
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            await slow_query
+            return elapsed
+        finally:
+            main.stop_db_executor()
+            main.close_db_pool()
+
+    assert asyncio.run(scenario()) < 0.2
+
+
+def test_token_cache_and_logout(client):
+    headers = signup_and_login(client, "cached@example.com", "mentee")
+    token = headers["Authorization"].split()[1]
+
+    assert client.get("/api/me", headers=headers).status_code == 200
+    principal = main.token_cache.get(token)
+    assert principal.role == "mentee" and principal.mentee_id is not None
+
+    # 캐시 적중 시 멘토 목록은 SQLite 조회 없이 역할을 확인한다
+    assert client.get("/api/mentors", headers=headers).status_code == 200
+
+    assert client.post("/api/logout", headers=headers).status_code == 200
+    assert client.get("/api/me", headers=headers).status_code == 401
+
+
+def test_logout_revocation_reaches_other_workers(client, monkeypatch):
+    headers = signup_and_login(client, "workers@example.com", "mentee")
+    other_worker = main.TokenCache(main.TOKEN_CACHE_SIZE)
+    monkeypatch.setattr(main, "token_cache", other_worker)
+    assert client.get("/api/me", headers=headers).status_code == 200
+
+    # 다른 워커(캐시)에서 로그아웃하면 이 워커도 다음 동기화 때 토큰을 거절한다
+    monkeypatch.setattr(main, "token_cache", main.TokenCache(main.TOKEN_CACHE_SIZE))
+    assert client.post("/api/logout", headers=headers).status_code == 200
+    monkeypatch.setattr(main, "token_cache", other_worker)
+    monkeypatch.setattr(main, "TOKEN_REVOCATION_SYNC_SECONDS", 0)
+    assert client.get("/api/me", headers=headers).status_code == 401
+
+
+def test_legacy_token_without_profile_claims(client):
+    signup_and_login(client, "legacy@example.com", "mentee")
+    with main.get_db() as conn:
+        user_id = conn.execute(
+            "SELECT id FROM users WHERE email = ?", ("legacy@example.com",)
+        ).fetchone()["id"]
+    token = main.create_access_token(
+        {"user_id": user_id, "email": "legacy@example.com", "role": "mentee"}
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert main.token_cache.get(token) is None
+    assert client.get("/api/me", headers=headers).status_code == 200
+    assert main.token_cache.get(token).mentee_id is not None
+
+
+def test_refresh_token_rotation_and_reuse(client):
+    client.post(
+        "/api/signup",
+        json={"email": "refresh@example.com", "password": "password123", "name": "리프레시", "role": "mentee"},
+    )
+    login = client.post(
+        "/api/login", json={"email": "refresh@example.com", "password": "password123"}
+    ).json()
+    first = login["refresh_token"]
+
+    rotated = client.post("/api/token/refresh", json={"refresh_token": first})
+    assert rotated.status_code == 200
+    second = rotated.json()["refresh_token"]
+    headers = {"Authorization": f"Bearer {rotated.json()['token']}"}
+    assert client.get("/api/me", headers=headers).json()["email"] == "refresh@example.com"
+
+    # 회전된 토큰을 다시 쓰면 family 전체가 폐기된다
+    reused = client.post("/api/token/refresh", json={"refresh_token": first})
+    assert reused.status_code == 401
+    assert client.post("/api/token/refresh", json={"refresh_token": second}).status_code == 401
+
+    bad = client.post("/api/token/refresh", json={"refresh_token": "nope"})
+    assert bad.status_code == 401
+
+
+def test_logout_revokes_refresh_token(client):
+    client.post(
+        "/api/signup",
+        json={"email": "bye@example.com", "password": "password123", "name": "로그아웃", "role": "mentor"},
+    )
+    login = client.post(
+        "/api/login", json={"email": "bye@example.com", "password": "password123"}
+    ).json()
+    headers = {"Authorization": f"Bearer {login['token']}"}
+
+    response = client.post(
+        "/api/logout", headers=headers, json={"refresh_token": login["refresh_token"]}
+    )
+    assert response.status_code == 200
+    refreshed = client.post(
+        "/api/token/refresh", json={"refresh_token": login["refresh_token"]}
+    )
+    assert refreshed.status_code == 401
+
+
+def test_password_hash_format_and_verify():
+    hashed = main.hash_password("secret", n=1024)
+    assert hashed.startswith("scrypt$1024$8$1$")
+    assert main.verify_password("secret", hashed)
+    assert not main.verify_password("wrong", hashed)
+    assert main.hash_password("secret", n=1024) != hashed  # 솔트
+
+
+def test_legacy_password_hash_upgraded_on_login(client):
+    signup_and_login(client, "old@example.com", "mentor")
+    legacy = hashlib.sha256(b"legacy-pass").hexdigest()
+    with main.get_db() as conn:
+        conn.execute(
+            "UPDATE users SET password_hash = ? WHERE email = ?",
+            (legacy, "old@example.com"),
+        )
+
+    credentials = {"email": "old@example.com", "password": "legacy-pass"}
+    assert client.post("/api/login", json=credentials).status_code == 200
+    with main.get_db() as conn:
+        upgraded = conn.execute(
+            "SELECT password_hash FROM users WHERE email = ?", ("old@example.com",)
+        ).fetchone()["password_hash"]
+    assert upgraded.startswith("scrypt$1024$")
+    assert client.post("/api/login", json=credentials).status_code == 200
+    wrong = {"email": "old@example.com", "password": "nope"}
+    assert client.post("/api/login", json=wrong).status_code == 401
+
+
+def test_password_hashing_sheds_load_when_saturated(client, monkeypatch):
+    signup_and_login(client, "busy@example.com", "mentee")
+    # 해시 대기열이 가득 차면 기다리지 않고 바로 503
+    monkeypatch.setattr(main, "_hash_semaphore", asyncio.Semaphore(0))
+    response = client.post(
+        "/api/login", json={"email": "busy@example.com", "password": "password123"}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    # 없는 이메일도 같은 503 (가입 여부가 드러나지 않는다)
+    response = client.post(
+        "/api/login", json={"email": "nobody@example.com", "password": "password123"}
+    )
+    assert response.status_code == 503
+
+
+def test_login_unknown_email_runs_dummy_verify(client, monkeypatch):
+    signup_and_login(client, "known@example.com", "mentee")
+    calls = []
+    hash_in_executor = main.hash_in_executor
+
+    async def recording(func, *args):
+        calls.append((func, args[1]))
+        return await hash_in_executor(func, *args)
+
+    monkeypatch.setattr(main, "hash_in_executor", recording)
+    response = client.post(
+        "/api/login", json={"email": "nobody@example.com", "password": "password123"}
+    )
+    assert response.status_code == 401
+    assert calls == [(main.verify_password, main._dummy_password_hash)]
+    assert main._dummy_password_hash.startswith("scrypt$1024$")
+
+
+def test_bulk_data_generator_is_deterministic(tmp_path, monkeypatch):
+    import create_test_accounts
+
+    def generate(name):
+        path = str(tmp_path / name)
+        args = argparse.Namespace(
+            database=path, mentors=20, mentees=50, requests=500, seed=7, images=0,
+            image_ratio=0.0, korean_ratio=0.7, pending_ratio=0.2, accepted_ratio=0.3,
+            rejected_ratio=0.5, batch_size=64,
+        )
+        create_test_accounts.generate_bulk_data(args)
+        conn = sqlite3.connect(path)
+        rows = conn.execute(
+            "SELECT mentor_id, mentee_id, status, created_at FROM match_requests ORDER BY id"
+        ).fetchall()
+        pending = conn.execute(
+            "SELECT MAX(c) FROM (SELECT COUNT(*) AS c FROM match_requests "
+            "WHERE status = 'pending' GROUP BY mentee_id)"
+        ).fetchone()[0]
+        skills = conn.execute("SELECT COUNT(*) FROM mentor_skills").fetchone()[0]
+        indexes = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'match_requests'"
+            )
+        }
+        conn.close()
+        return rows, pending, skills, indexes
+
+    first, pending, skills, indexes = generate("a.db")
+    second, *_ = generate("b.db")
+    assert len(first) == 500
+    assert [row[:3] for row in first] == [row[:3] for row in second]
+    assert pending == 1
+    assert skills >= 20
+    # 적재 후 보조 인덱스가 다시 만들어졌는지
+    assert "ux_match_requests_pending_mentee" in indexes
+    assert "ix_match_requests_mentor_created" in indexes
+
+    # 요청 적재가 중간에 실패해도 인덱스는 복구된다
+    monkeypatch.setattr(create_test_accounts, "MESSAGES", [])
+    with pytest.raises(IndexError):
+        generate("c.db")
+    conn = sqlite3.connect(str(tmp_path / "c.db"))
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert "ux_match_requests_pending_mentee" in indexes
+    assert "ix_match_request_events_mentor" in indexes
+
+
+def test_benchmark_regression_check():
+    import benchmark_api
+
+    assert benchmark_api.percentile([0.1, 0.2, 0.3, 0.4], 0.5) == 0.2
+    assert benchmark_api.percentile([0.1, 0.2, 0.3, 0.4], 0.99) == 0.4
+
+    def result(p95, rps, errors=0):
+        return {
+            "scenarios": {
+                "me": {"p95_ms": p95, "throughput_rps": rps, "errors": errors}
+            }
+        }
+
+    baseline = result(10.0, 100.0)
+    assert benchmark_api.find_regressions(result(11.0, 95.0), baseline, 0.2) == []
+    assert len(benchmark_api.find_regressions(result(13.0, 100.0), baseline, 0.2)) == 1
+    assert len(benchmark_api.find_regressions(result(10.0, 70.0, 1), baseline, 0.2)) == 2
+
+
+def test_metrics_endpoint(client):
+    headers = signup_and_login(client, "metrics@example.com", "mentor")
+    assert client.get("/api/me", headers=headers).status_code == 200
+    assert client.get("/api/match-requests/received/999999", headers=headers).status_code == 403
+    client.get("/no-such-route")
+
+    me = main.metrics_registry.routes[("GET", "/api/me")]
+    assert me.statuses == {200: 1}
+    assert me.sql_queries >= 1 and me.sql_seconds > 0
+    assert me.size_sum > 0 and me.in_flight == 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/me",status="200"} 1' in body
+    assert 'route="/api/match-requests/received/{user_id}",status="403"} 1' in body
+    assert 'route="unmatched",status="404"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/me",le="+Inf"} 1' in body
+    assert "# TYPE http_request_sql_queries_total counter" in body
+
+
+def test_slow_query_log(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "admin-key")
+    monkeypatch.setattr(main, "SQL_TRACE_ENABLED", True)
+    monkeypatch.setattr(main, "SLOW_QUERY_MS", 0.0)
+    main.close_db_pool()  # progress 핸들러가 설치된 커넥션으로 다시 연다
+
+    with main.get_db() as conn:
+        conn.execute("SELECT * FROM users WHERE bio = ?", ("secret bio",)).fetchall()
+        conn.execute("SELECT * FROM users WHERE email = ?", ("a@example.com",)).fetchone()
+
+    response = client.get("/api/admin/slow-queries", headers={"X-Admin-Key": "admin-key"})
+    assert response.status_code == 200
+    body = response.json()
+    by_sql = {entry["sql"]: entry for entry in body["queries"]}
+
+    scan = by_sql["SELECT * FROM users WHERE bio = ?"]
+    assert scan["full_scan"] is True
+    assert scan["params"] == ["<str len=10>"]
+    assert "secret" not in response.text
+    assert "SELECT * FROM users WHERE bio = ?" in body["full_scan_statements"]
+
+    lookup = by_sql["SELECT * FROM users WHERE email = ?"]
+    assert lookup["full_scan"] is False
+    assert any("INDEX" in detail for detail in lookup["plan"])
+
+    assert client.get("/api/admin/slow-queries").status_code == 403
+
+
+def test_request_profiling(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "admin-key")
+    monkeypatch.setattr(main, "PROFILE_DIR", str(tmp_path / "profiles"))
+    headers = signup_and_login(client, "profiled@example.com", "mentor")
+
+    # 미들웨어는 PROFILING=1일 때만 설치되므로 여기서는 직접 감싼다
+    profiled = TestClient(main.ProfilingMiddleware(main.app))
+    response = profiled.get("/api/me", headers=headers)
+    assert "x-profile-id" not in response.headers
+
+    # DB 스레드에서 시간이 걸리는 쿼리를 흉내 낸다
+    run_db = main.run_db
+
+    async def slow_run_db(func, *args):
+        def slow(conn, *inner_args):
+            time.sleep(0.05)
+            return func(conn, *inner_args)
+
+        return await run_db(slow, *args)
+
+    monkeypatch.setattr(main, "run_db", slow_run_db)
+    response = profiled.get("/api/me", headers={**headers, "X-Profile": "admin-key"})
+    assert response.status_code == 200
+    profile_path = tmp_path / "profiles" / f"{response.headers['x-profile-id']}.collapsed"
+    lines = profile_path.read_text().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("db;") and "test_api:slow" in line for line in lines)
+
+    # 용량 제한을 넘으면 오래된 프로파일부터 지운다
+    main.prune_profiles(str(tmp_path / "profiles"), 0)
+    assert list((tmp_path / "profiles").iterdir()) == []
+
+
+def test_mentor_recommendations(client, monkeypatch):
+    mentors = {}
+    for email, skills in [
+        ("ml@example.com", "Python,Machine Learning"),
+        ("web@example.com", "React,TypeScript"),
+        ("py@example.com", "Python,Django"),
+    ]:
+        headers = signup_and_login(client, email, "mentor")
+        client.put("/api/profile", headers=headers, json={"name": email, "skills": skills})
+        mentors[email] = (client.get("/api/me", headers=headers).json()["id"], headers)
+    mentee = signup_and_login(client, "learner@example.com", "mentee")
+    client.put(
+        "/api/profile",
+        headers=mentee,
+        json={"name": "learner", "interests": ["Machine Learning", "Python Programming"]},
+    )
+
+    response = client.get("/api/mentors/recommended", headers=mentee)
+    assert response.status_code == 200
+    ranked = [mentor["id"] for mentor in response.json()]
+    assert ranked[0] == mentors["ml@example.com"][0]
+    assert ranked[-1] == mentors["web@example.com"][0]
+    assert response.json()[0]["score"] > response.json()[1]["score"] > 0
+
+    # 프로필 변경은 행렬을 다시 만들지 않고 증분 반영
+    web_id, web_headers = mentors["web@example.com"]
+    client.put(
+        "/api/profile",
+        headers=web_headers,
+        json={"name": "web", "skills": "Machine Learning,Python,TypeScript"},
+    )
+    assert main.mentor_recommender.stats()["delta_rows"] == 1
+    response = client.get(
+        "/api/mentors/recommended", params={"interests": "typescript", "limit": 1}, headers=mentee
+    )
+    assert [mentor["id"] for mentor in response.json()] == [web_id]
+
+    # 다른 프로세스가 바꾼 스킬도 mentor_changes 로그로 반영
+    monkeypatch.setattr(main, "MENTOR_CATALOG_SYNC_SECONDS", 0)
+    conn = sqlite3.connect(main.DATABASE_PATH)
+    conn.execute("UPDATE mentors SET skills = 'Rust' WHERE user_id = ?", (web_id,))
+    conn.commit()
+    conn.close()
+    response = client.get(
+        "/api/mentors/recommended", params={"interests": "rust", "limit": 1}, headers=mentee
+    )
+    assert [mentor["id"] for mentor in response.json()] == [web_id]
+    assert response.json()[0]["score"] > 0
+
+    mentor_headers = mentors["ml@example.com"][1]
+    assert client.get("/api/mentors/recommended", headers=mentor_headers).status_code == 401
+
+
+def test_match_request_transitions(client):
+    mentor = signup_and_login(client, "mentor@example.com", "mentor")
+    mentor_id = client.get("/api/me", headers=mentor).json()["id"]
+    mentees = {}
+    for email in ("a@example.com", "b@example.com"):
+        headers = signup_and_login(client, email, "mentee")
+        mentee_id = client.get("/api/me", headers=headers).json()["id"]
+        response = client.post(
+            "/api/match-requests",
+            headers=headers,
+            json={"mentorId": mentor_id, "menteeId": mentee_id, "message": "hi"},
+        )
+        mentees[email] = (response.json()["id"], headers)
+
+    accepted_id, mentee_a = mentees["a@example.com"]
+    assert client.put(f"/api/match-requests/{accepted_id}/accept", headers=mentee_a).status_code == 401
+    for _ in range(2):  # 중복 클릭은 같은 결과
+        response = client.put(f"/api/match-requests/{accepted_id}/accept", headers=mentor)
+        assert response.status_code == 200
+        assert response.json()["status"] == "accepted"
+    response = client.put(f"/api/match-requests/{accepted_id}/reject", headers=mentor)
+    assert response.status_code == 409
+    assert client.delete(f"/api/match-requests/{accepted_id}", headers=mentee_a).status_code == 409
+
+    cancelled_id, mentee_b = mentees["b@example.com"]
+    assert client.delete(f"/api/match-requests/{cancelled_id}", headers=mentor).status_code == 401
+    for _ in range(2):
+        response = client.delete(f"/api/match-requests/{cancelled_id}", headers=mentee_b)
+        assert response.json()["status"] == "cancelled"
+    assert client.put(f"/api/match-requests/{cancelled_id}/accept", headers=mentor).status_code == 409
+    assert client.put("/api/match-requests/999/accept", headers=mentor).status_code == 404
+
+
+def test_batch_match_request_transitions(client):
+    mentor = signup_and_login(client, "mentor@example.com", "mentor")
+    mentor_id = client.get("/api/me", headers=mentor).json()["id"]
+    other_mentor = signup_and_login(client, "other@example.com", "mentor")
+    request_ids = []
+    for index in range(4):
+        headers = signup_and_login(client, f"mentee{index}@example.com", "mentee")
+        mentee_id = client.get("/api/me", headers=headers).json()["id"]
+        response = client.post(
+            "/api/match-requests",
+            headers=headers,
+            json={"mentorId": mentor_id, "menteeId": mentee_id, "message": "hi"},
+        )
+        request_ids.append(response.json()["id"])
+    first, second, third, fourth = request_ids
+    client.put(f"/api/match-requests/{fourth}/reject", headers=mentor)
+
+    items = [
+        {"id": first, "status": "accepted"},
+        {"id": second, "status": "rejected"},
+        {"id": first, "status": "accepted"},
+        {"id": fourth, "status": "accepted"},
+        {"id": third, "status": "cancelled"},
+        {"id": 999, "status": "accepted"},
+        {"id": third, "status": "pending"},
+    ]
+    response = client.post("/api/match-requests/batch", json={"items": items}, headers=mentor)
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["code"] for result in body["results"]] == [200, 200, 200, 409, 401, 404, 400]
+    assert body["results"][0]["request"]["status"] == "accepted"
+    assert body["updated"] == 2
+
+    response = client.post(
+        "/api/match-requests/batch", json={"items": items[:2]}, headers=other_mentor
+    )
+    assert [result["code"] for result in response.json()["results"]] == [401, 401]
+    response = client.get("/api/match-requests/incoming", params={"legacy": True}, headers=mentor)
+    statuses = {request["id"]: request["status"] for request in response.json()}
+    assert statuses == {first: "accepted", second: "rejected", third: "pending", fourth: "rejected"}
+    assert client.post("/api/match-requests/batch", json={"items": []}, headers=mentor).status_code == 400
+
+
+def test_event_bus_backpressure_and_resume():
+    bus = main.EventBus(queue_size=2, history_size=3)
+    live = bus.subscribe(1)
+    for index in range(4):
+        bus.publish((1, 2), "match_request.created", {"id": index})
+    bus.publish((2,), "match_request.created", {"id": 99})
+    # 큐가 넘치면 오래된 이벤트부터 버린다
+    assert [event[2] for event in live.events] == ['{"id": 2}', '{"id": 3}']
+    assert live.dropped == 2
+
+    first_id = bus._history[0][0]
+    resumed = bus.subscribe(1, last_event_id=first_id)
+    assert [event[2] for event in resumed.events] == ['{"id": 3}']
+    # 이력보다 오래된 id로 재연결하면 resync부터 보낸다
+    stale = bus.subscribe(1, last_event_id=first_id - 5)
+    assert [event[1] for event in stale.events] == ["resync"]
+    bus.unsubscribe(1, live)
+    assert bus.stats()["subscribers"] == 2
+
+
+def test_match_request_events_stream(client, monkeypatch):
+    mentor = signup_and_login(client, "mentor@example.com", "mentor")
+    mentor_id = client.get("/api/me", headers=mentor).json()["id"]
+    mentee = signup_and_login(client, "mentee@example.com", "mentee")
+    mentee_id = client.get("/api/me", headers=mentee).json()["id"]
+    request_id = client.post(
+        "/api/match-requests",
+        headers=mentee,
+        json={"mentorId": mentor_id, "menteeId": mentee_id, "message": "hi"},
+    ).json()["id"]
+    client.put(f"/api/match-requests/{request_id}/accept", headers=mentor)
+    client.put(f"/api/match-requests/{request_id}/accept", headers=mentor)  # no-op은 이벤트 없음
+
+    assert client.get("/api/events").status_code == 401
+    # 곧 만료되는 토큰이면 스트림이 스스로 닫힌다
+    monkeypatch.setattr(main, "ACCESS_TOKEN_EXPIRE_HOURS", 2 / 3600)
+
+    def read_events(last_event_id, via_query=False):
+        token = client.post(
+            "/api/login", json={"email": "mentee@example.com", "password": "password123"}
+        ).json()["token"]
+        ticket = client.post(
+            "/api/events/ticket", headers={"Authorization": f"Bearer {token}"}
+        ).json()["ticket"]
+        if via_query:
+            # 티켓을 새로 받아 다시 여는 클라이언트는 마지막 id를 쿼리로 보낸다
+            response = client.get("/api/events", params={"ticket": ticket, "lastEventId": last_event_id})
+        else:
+            response = client.get(
+                "/api/events", params={"ticket": ticket}, headers={"Last-Event-ID": last_event_id}
+            )
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+            if "event" in fields:
+                events.append(fields)
+        return events
+
+    # 이 프로세스가 알지 못하는 오래된 id면 놓친 이벤트 대신 resync 하나만
+    assert [event["event"] for event in read_events("0")] == ["resync"]
+    events = read_events(str(main.event_bus._history[0][0] - 1))
+    assert [event["event"] for event in events] == [
+        "match_request.created",
+        "match_request.accepted",
+    ]
+    assert '"status": "accepted"' in events[1]["data"]
+    # 생성 이벤트도 상태 변경 이벤트와 같은 id(mentors.id / mentees.id)를 싣는다
+    assert json.loads(events[0]["data"]) == {**json.loads(events[1]["data"]), "status": "pending"}
+    assert [event["event"] for event in read_events(events[0]["id"])] == ["match_request.accepted"]
+    assert [event["event"] for event in read_events(events[0]["id"], via_query=True)] == [
+        "match_request.accepted"
+    ]
+    assert main.event_bus.stats()["subscribers"] == 0
+
+    # 티켓은 한 번만 쓸 수 있고, 액세스 토큰을 쿼리로 보내는 방식은 받지 않는다
+    tickets = [client.post("/api/events/ticket", headers=mentee).json()["ticket"] for _ in range(2)]
+    with main.get_db() as conn:
+        assert main.redeem_event_ticket(conn, tickets[0])["role"] == "mentee"
+        assert main.redeem_event_ticket(conn, tickets[0]) is None
+        conn.execute("UPDATE event_tickets SET expires_at = 0")
+        conn.commit()
+    assert client.get("/api/events", params={"ticket": tickets[1]}).status_code == 401
+    token = mentee["Authorization"].split()[1]
+    assert client.get("/api/events", params={"token": token}).status_code == 401
+
+
+def test_request_lists_delta_sync(client):
+    mentor = signup_and_login(client, "mentor@example.com", "mentor")
+    mentor_id = client.get("/api/me", headers=mentor).json()["id"]
+    request_ids = {}
+    for email in ("a@example.com", "b@example.com", "c@example.com"):
+        headers = signup_and_login(client, email, "mentee")
+        mentee_id = client.get("/api/me", headers=headers).json()["id"]
+        request_ids[email] = client.post(
+            "/api/match-requests",
+            headers=headers,
+            json={"mentorId": mentor_id, "menteeId": mentee_id, "message": "hi"},
+        ).json()["id"]
+
+    body = client.get("/api/match-requests/incoming", headers=mentor).json()
+    assert len(body["items"]) == 3
+    since = body["next_since"]
+    assert client.get(
+        "/api/match-requests/incoming", params={"since": since}, headers=mentor
+    ).json() == {"items": [], "next_cursor": None, "next_since": since}
+
+    # since=0도 페이지로 나누고, next_since는 마지막 페이지에만 준다
+    first = client.get(
+        "/api/match-requests/incoming", params={"since": 0, "limit": 2, "legacy": True}, headers=mentor
+    ).json()
+    assert len(first["items"]) == 2 and first["next_since"] is None
+    last = client.get(
+        "/api/match-requests/incoming",
+        params={"since": 0, "limit": 2, "cursor": first["next_cursor"]},
+        headers=mentor,
+    ).json()
+    assert len(last["items"]) == 1 and last["next_cursor"] is None
+    assert last["next_since"] == since
+
+    client.put(f"/api/match-requests/{request_ids['a@example.com']}/accept", headers=mentor)
+    client.put(f"/api/match-requests/{request_ids['b@example.com']}/reject", headers=mentor)
+    client.put(f"/api/match-requests/{request_ids['b@example.com']}/reject", headers=mentor)
+
+    body = client.get(
+        f"/api/match-requests/received/{mentor_id}",
+        params={"since": since, "legacy": True},
+        headers=mentor,
+    ).json()
+    assert {item["id"]: item["status"] for item in body["items"]} == {
+        request_ids["a@example.com"]: "accepted",
+        request_ids["b@example.com"]: "rejected",
+    }
+    assert body["next_since"] == since + 2  # 중복 거절은 이력을 남기지 않는다
+
+    mentee = signup_and_login(client, "c@example.com", "mentee")
+    body = client.get("/api/match-requests/outgoing", params={"since": since}, headers=mentee).json()
+    assert body["items"] == []
+    client.delete(f"/api/match-requests/{request_ids['c@example.com']}", headers=mentee)
+    body = client.get("/api/match-requests/outgoing", params={"since": since}, headers=mentee).json()
+    assert [item["status"] for item in body["items"]] == ["cancelled"]
+
+
+def test_cohort_match_respects_capacity(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "admin-key")
+    admin = {"X-Admin-Key": "admin-key"}
+    mentor_ids = {}
+    for email, skills, capacity in [
+        ("py@example.com", "Python,Django", 2),
+        ("web@example.com", "React,TypeScript", 1),
+    ]:
+        headers = signup_and_login(client, email, "mentor")
+        response = client.put(
+            "/api/profile", headers=headers, json={"name": email, "skills": skills, "capacity": capacity}
+        )
+        assert response.json()["profile"]["capacity"] == capacity
+        mentor_ids[email] = client.get("/api/me", headers=headers).json()["id"]
+    assert (
+        client.put("/api/profile", headers=headers, json={"name": "web", "capacity": -1}).status_code
+        == 400
+    )
+
+    mentees = {}
+    for email, interests in [
+        ("busy@example.com", "Python"),
+        ("py1@example.com", "Python"),
+        ("react@example.com", "React"),
+        ("py2@example.com", "Django,Python"),
+        ("other@example.com", "Cooking"),
+    ]:
+        headers = signup_and_login(client, email, "mentee")
+        client.put("/api/profile", headers=headers, json={"name": email, "interests": interests})
+        mentees[email] = headers
+    # 이미 요청을 보낸 멘티는 대상에서 빠지고, 그 요청은 멘토 정원을 차지한다
+    me = client.get("/api/me", headers=mentees["busy@example.com"]).json()
+    client.post(
+        "/api/match-requests",
+        headers=mentees["busy@example.com"],
+        json={"mentorId": mentor_ids["py@example.com"], "menteeId": me["id"], "message": "hi"},
+    )
+
+    assert client.post("/api/admin/cohort-match").status_code == 403
+    summary = client.post("/api/admin/cohort-match", params={"dry_run": True}, headers=admin).json()
+    assert (summary["mentees"], summary["capacity"], summary["assigned"]) == (4, 2, 2)
+    assert summary["inserted"] == 0
+
+    summary = client.post("/api/admin/cohort-match", headers=admin).json()
+    assert summary["inserted"] == 2
+    with main.get_db() as conn:
+        pairs = {
+            (row["mentor"], row["mentee"])
+            for row in conn.execute(
+                """
+                SELECT mu.email AS mentor, eu.email AS mentee
+                FROM match_requests mr
+                JOIN mentors m ON m.id = mr.mentor_id JOIN users mu ON mu.id = m.user_id
+                JOIN mentees e ON e.id = mr.mentee_id JOIN users eu ON eu.id = e.user_id
+                WHERE mr.message = '코호트 자동 매칭'
+            """
+            )
+        }
+    assert ("web@example.com", "react@example.com") in pairs
+    assert {mentor for mentor, _ in pairs} == {"py@example.com", "web@example.com"}
+
+    # 정원이 모두 찼으므로 다시 실행해도 새 요청이 없다
+    summary = client.post("/api/admin/cohort-match", headers=admin).json()
+    assert (summary["mentors"], summary["inserted"]) == (0, 0)
+
+
+
+def test_cohort_match_rechecks_capacity_before_insert(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "admin-key")
+    headers = signup_and_login(client, "solo@example.com", "mentor")
+    client.put("/api/profile", headers=headers, json={"name": "solo", "skills": "Python", "capacity": 1})
+    for email in ["late@example.com", "direct@example.com"]:
+        headers = signup_and_login(client, email, "mentee")
+        client.put("/api/profile", headers=headers, json={"name": email, "interests": "Python"})
+    # match_requests는 users.id가 아니라 mentors.id / mentees.id를 가리킨다
+    with main.get_db() as conn:
+        mentor_id = conn.execute(
+            "SELECT m.id FROM mentors m JOIN users u ON u.id = m.user_id WHERE u.email = ?",
+            ("solo@example.com",),
+        ).fetchone()["id"]
+        direct_id = conn.execute(
+            "SELECT me.id FROM mentees me JOIN users u ON u.id = me.user_id WHERE u.email = ?",
+            ("direct@example.com",),
+        ).fetchone()["id"]
+
+    # 배정을 계산하는 사이 다른 요청이 멘토의 마지막 정원을 가져간다
+    assign_cohort = main.assign_cohort
+
+    def racing_assign(*args):
+        with main.get_db() as conn:
+            conn.execute(
+                "INSERT INTO match_requests (mentor_id, mentee_id, message) VALUES (?, ?, 'hi')",
+                (mentor_id, direct_id),
+            )
+        return assign_cohort(*args)
+
+    monkeypatch.setattr(main, "assign_cohort", racing_assign)
+    summary = client.post("/api/admin/cohort-match", headers={"X-Admin-Key": "admin-key"}).json()
+    assert (summary["assigned"], summary["inserted"]) == (1, 0)
+    with main.get_db() as conn:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM match_requests WHERE mentor_id = ? AND status = 'pending'",
+            (mentor_id,),
+        ).fetchone()[0]
+    assert count == 1
+
+
+
+def test_cohort_solver_fills_capacity_when_possible():
+    # 스킬별로 멘토 20명 × 정원 5 = 멘티 100명씩, 완전 배정이 존재한다
+    mentors, mentees = [], []
+    for skill in ["Python", "React", "Go"]:
+        for i in range(20):
+            mentors.append(
+                {
+                    "id": len(mentors) + 1,
+                    "skills": skill,
+                    "experience_years": i,
+                    "rating": 3 + i % 3,
+                    "remaining": 5,
+                }
+            )
+        mentees.extend({"id": len(mentees) + 1, "interests": skill} for _ in range(100))
 
-# def test_match_request():
-#     ...
+    summary, pairs = main.solve_cohort(mentors, mentees, top_k=32)
+    assert summary["assigned"] == len(pairs) == 300
+    skills = {row["id"]: row["skills"] for row in mentors}
+    interests = {row["id"]: row["interests"] for row in mentees}
+    assert all(skills[mentor_id] == interests[mentee_id] for mentor_id, mentee_id in pairs)
 
 if __name__ == "__main__":
     pytest.main(["-xvs", __file__])
@@ -17,12 +17,22 @@ export async function GET(
     }
     
     const { role, id } = params;
-    const response = await axios.get(`${BACKEND_URL}/images/${role}/${id}`, {
-      headers: {
-        Authorization: `Bearer ${token}`
-      },
-      responseType: 'arraybuffer'
-    });
+    // 조건부 요청/Range/Accept와 버전·썸네일 쿼리를 그대로 백엔드에 넘긴다
+    const forwardHeaders: Record<string, string> = { Authorization: `Bearer ${token}` };
+    for (const name of ['if-none-match', 'range', 'accept']) {
+      const value = request.headers.get(name);
+      if (value) {
+        forwardHeaders[name] = value;
+      }
+    }
+    const response = await axios.get(
+      `${BACKEND_URL}/images/${role}/${id}${request.nextUrl.search}`,
+      {
+        headers: forwardHeaders,
+        responseType: 'arraybuffer',
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304 || status === 416,
+      }
+    );
     
     // Handle case where backend returns a URL string
     const contentType = response.headers['content-type'];
@@ -34,14 +44,25 @@ export async function GET(
       }
     }
     
-    // Otherwise, assume it's an image
-    return new NextResponse(response.data, {
-      status: 200,
-      headers: {
-        'Content-Type': contentType || 'image/jpeg',
-        'Cache-Control': 'public, max-age=86400'
+    // Otherwise, assume it's an image. 캐시/검증 헤더는 백엔드 값을 바꾸지 않고 전달한다
+    // (인증된 사용자별 응답이므로 백엔드가 private으로 내려 준다)
+    const headers = new Headers();
+    for (const name of [
+      'content-type',
+      'content-length',
+      'cache-control',
+      'etag',
+      'content-range',
+      'accept-ranges',
+      'vary',
+    ]) {
+      const value = response.headers[name];
+      if (value) {
+        headers.set(name, String(value));
       }
-    });
+    }
+    const body = response.status === 304 ? null : response.data;
+    return new NextResponse(body, { status: response.status, headers });
   } catch (error: any) {
     console.error('Get image error:', error.response?.data || error.message);
     
@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from 'react';
 import { useAuth } from '@/hooks/useAuth';
-import { matchRequestAPI } from '@/lib/api';
+import { eventsAPI, matchRequestAPI } from '@/lib/api';
 import { MatchRequest } from '@/types';
 import Navigation from '@/components/Navigation';
 import { Button } from '@/components/ui/button';
@@ -21,6 +21,12 @@ export default function RequestsPage() {
     }
   }, [user, activeTab]);
 
+  // 요청이 바뀌면 서버가 알려 주므로 그때만 다시 불러온다
+  useEffect(() => {
+    if (!user) return;
+    return eventsAPI.subscribe(() => fetchRequests());
+  }, [user, activeTab]);
+
   const fetchRequests = async () => {
     if (!user) return;
     
@@ -49,7 +49,12 @@ export function AuthProvider({ children }: { children: ReactNode }) {
   };
 
   const logout = () => {
+    const token = Cookies.get('token');
+    if (token) {
+      authAPI.logout(token, Cookies.get('refresh_token')).catch(() => {});
+    }
     Cookies.remove('token');
+    Cookies.remove('refresh_token');
     setUser(null);
   };
 
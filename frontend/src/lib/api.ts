@@ -18,13 +18,41 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// 동시에 401이 여러 개 나도 리프레시는 한 번만 수행
+let refreshing: Promise<string> | null = null;
+
+async function refreshAccessToken(): Promise<string> {
+  const refreshToken = Cookies.get('refresh_token');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+  const response = await axios.post(`${api.defaults.baseURL}/token/refresh`, {
+    refresh_token: refreshToken,
+  });
+  Cookies.set('token', response.data.token, { expires: 1 });
+  Cookies.set('refresh_token', response.data.refresh_token, { expires: 30 });
+  return response.data.token;
+}
+
 // Response interceptor to handle auth errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      Cookies.remove('token');
-      window.location.href = '/login';
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried) {
+      original._retried = true;
+      try {
+        refreshing = refreshing ?? refreshAccessToken().finally(() => {
+          refreshing = null;
+        });
+        const token = await refreshing;
+        original.headers.Authorization = `Bearer ${token}`;
+        return api(original);
+      } catch {
+        Cookies.remove('token');
+        Cookies.remove('refresh_token');
+        window.location.href = '/login';
+      }
     }
     return Promise.reject(error);
   }
@@ -37,6 +65,7 @@ export const authAPI = {
 
   async login(credentials: AuthCredentials): Promise<string> {
     const response = await api.post('/login', credentials);
+    Cookies.set('refresh_token', response.data.refresh_token, { expires: 30 });
     return response.data.token;
   },
 
@@ -44,6 +73,13 @@ export const authAPI = {
     const response = await api.get('/me');
     return response.data;
   },
+
+  async logout(token: string, refreshToken?: string): Promise<void> {
+    // 쿠키가 먼저 지워져도 폐기할 토큰을 그대로 보낸다
+    await api.post('/logout', refreshToken ? { refresh_token: refreshToken } : null, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+  },
 };
 
 export const profileAPI = {
@@ -69,7 +105,8 @@ export const profileAPI = {
 
 export const mentorAPI = {
   async getMentors(filters?: { skill?: string; order_by?: string }): Promise<Mentor[]> {
-    const response = await api.get('/mentors', { params: filters });
+    // legacy=true: 페이지네이션 없이 기존 배열 형태로 전체 목록을 받는다
+    const response = await api.get('/mentors', { params: { ...filters, legacy: true } });
     return response.data;
   },
 };
@@ -81,12 +118,12 @@ export const matchRequestAPI = {
   },
 
   async getIncomingRequests(): Promise<MatchRequest[]> {
-    const response = await api.get('/match-requests/incoming');
+    const response = await api.get('/match-requests/incoming', { params: { legacy: true } });
     return response.data;
   },
 
   async getOutgoingRequests(): Promise<MatchRequest[]> {
-    const response = await api.get('/match-requests/outgoing');
+    const response = await api.get('/match-requests/outgoing', { params: { legacy: true } });
     return response.data;
   },
 
@@ -116,12 +153,85 @@ export const matchRequestAPI = {
   },
 
   async getReceivedRequests(userId: number): Promise<MatchRequest[]> {
-    const response = await api.get(`/match-requests/received/${userId}`);
+    const response = await api.get(`/match-requests/received/${userId}`, { params: { legacy: true } });
     return response.data;
   },
 
   async getSentRequests(userId: number): Promise<MatchRequest[]> {
-    const response = await api.get(`/match-requests/sent/${userId}`);
+    const response = await api.get(`/match-requests/sent/${userId}`, { params: { legacy: true } });
     return response.data;
   },
-};
\ No newline at end of file
+};
+
+// 연속으로 이만큼 연결에 실패하면 (티켓 발급 실패, 스트림이 열리기 전에 닫힘) 재연결을 멈춘다
+const MAX_EVENT_FAILURES = 5;
+
+export const eventsAPI = {
+  // 매칭 요청 변경 알림 (Server-Sent Events). 반환된 함수를 호출하면 구독 해제
+  subscribe(onChange: () => void): () => void {
+    const types = [
+      'match_request.created',
+      'match_request.accepted',
+      'match_request.rejected',
+      'match_request.cancelled',
+      'resync',
+    ];
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let failures = 0;
+    let closed = false;
+    let lastEventId = '';
+
+    const handleEvent = (event: Event) => {
+      lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+      onChange();
+    };
+
+    const scheduleReconnect = () => {
+      failures += 1;
+      if (!closed && failures < MAX_EVENT_FAILURES) {
+        retry = setTimeout(() => connect(true), 3000 * failures);
+      }
+    };
+
+    const connect = async (reconnecting: boolean) => {
+      // EventSource는 헤더를 못 붙이므로 일회용 티켓을 발급받아 쿼리로 보낸다.
+      // api 인스턴스를 거치므로 액세스 토큰이 만료됐으면 리프레시 후 다시 요청한다
+      let ticket: string;
+      try {
+        const response = await api.post('/events/ticket');
+        ticket = response.data.ticket;
+      } catch {
+        scheduleReconnect();
+        return;
+      }
+      if (closed) return;
+
+      // 새 EventSource는 Last-Event-ID 헤더를 보내지 않으므로 마지막으로 받은 id를 쿼리로 넘긴다.
+      // 서버가 그 뒤 이벤트를 이어서 보내고, 이어갈 수 없으면 resync를 보낸다
+      const params = new URLSearchParams({ ticket });
+      if (lastEventId) params.set('lastEventId', lastEventId);
+      source = new EventSource(`${api.defaults.baseURL}/events?${params}`);
+      types.forEach((type) => source?.addEventListener(type, handleEvent));
+      source.onopen = () => {
+        failures = 0;
+        // 받은 이벤트가 없어 이어받을 기준이 없으면 목록을 한 번 다시 불러온다
+        if (reconnecting && !lastEventId) onChange();
+      };
+      source.onerror = () => {
+        // 티켓은 한 번만 쓸 수 있어 브라우저 자동 재연결은 실패하므로, 닫히면 새 티켓으로 다시 연결
+        if (source?.readyState !== EventSource.CLOSED) {
+          source?.close();
+        }
+        scheduleReconnect();
+      };
+    };
+
+    connect(false);
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  },
+};